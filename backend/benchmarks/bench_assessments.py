@@ -0,0 +1,69 @@
+"""
+Benchmark of reading assessments from upstream pages, run from the backend directory.
+
+    python benchmarks/bench_assessments.py
+    python benchmarks/bench_assessments.py --repeat 50
+
+Times find_ecp_url over the checked-in course page and parse_assessments over the checked-in ECP, with the targeted
+parse the backend uses and with a full parse of each page, and reports the peak memory of each parse.
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRONTEND_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "frontend")
+sys.path.insert(0, os.path.join(BACKEND_DIR, "flaskr"))
+
+import assessments
+
+from timing import best_time
+
+
+def peak_memory(function) -> int:
+    """Run function once and return the most memory it held at once in bytes."""
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(os.path.join(FRONTEND_DIR, "course-offering.html"), encoding="utf-8") as file:
+        course_page = file.read()
+    with open(os.path.join(FRONTEND_DIR, "ecp.html"), encoding="utf-8") as file:
+        ecp = file.read()
+
+    pages = {
+        "course page": (len(course_page), lambda: assessments.find_ecp_url(course_page, "S2", "STLUC")),
+        "ecp": (len(ecp), lambda: assessments.parse_assessments(ecp, "CSSE2002")),
+    }
+    strainers = (assessments.COURSE_PAGE_STRAINER, assessments.ECP_STRAINER)
+
+    print(f"{'page':12} {'bytes':>8} {'parse':>9} {'ms':>8} {'peak KiB':>9}")
+    for name, (size, parse) in pages.items():
+        results = {}
+        for parse_name, (course_page_strainer, ecp_strainer) in (
+            ("full", (None, None)),
+            ("targeted", strainers),
+        ):
+            assessments.COURSE_PAGE_STRAINER = course_page_strainer
+            assessments.ECP_STRAINER = ecp_strainer
+            results[parse_name] = parse()
+            seconds = best_time(parse, args.repeat)
+            print(f"{name:12} {size:8} {parse_name:>9} {seconds * 1000:8.2f} {peak_memory(parse) / 1024:9.0f}")
+
+        if results["full"] != results["targeted"]:
+            print(f"{name}: targeted parse differs from the full parse")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
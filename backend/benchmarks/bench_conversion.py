@@ -0,0 +1,82 @@
+"""
+Micro-benchmark of turning upstream course timetables into Classes for the recommendation algorithm, run from the
+backend directory.
+
+    python benchmarks/bench_conversion.py
+    python benchmarks/bench_conversion.py --scales 1 10 100 --repeat 20
+
+Each scale copies the MATH1051 fixture's activities that many times, then times parse_course_timetable and
+convertForAlgorithmCourses together, and a memoized lookup through course_classes. It also reports the memory the
+converted classes hold on to per activity, which is what the conversion memo keeps for each course.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "flaskr"))
+
+import timetable
+from conversion import convertForAlgorithmCourses
+from timetable import course_classes, parse_course_timetable
+
+from timing import best_time
+
+
+def scaled_timetable(timetable_json: dict, scale: int) -> dict:
+    """Copy a course's activities scale times, with each copy in new subclasses (e.g. APP1 becomes APP1_2)."""
+    subject_code, subject = next(iter(timetable_json.items()))
+    activities = {}
+    for copy in range(scale):
+        for key, activity in subject["activities"].items():
+            subject_key, subclass, code = key.split("|")
+            activities[f"{subject_key}|{subclass}_{copy}|{code}"] = activity
+    return {subject_code: dict(subject, activities=activities)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(os.path.join(BACKEND_DIR, "timetable.json")) as file:
+        timetable_json = json.load(file)
+
+    for scale in args.scales:
+        course_json = scaled_timetable(timetable_json, scale)
+        activity_count = len(next(iter(course_json.values()))["activities"])
+
+        def convert():
+            course_info = parse_course_timetable(course_json, "MATH1051")
+            return convertForAlgorithmCourses(course_info, retrieveLectures=True)
+
+        # Serve course_classes from the scaled timetable, so only the first lookup converts
+        timetable.course_details_many = lambda course_codes, options: {
+            course_code: course_json for course_code in course_codes
+        }
+        timetable.course_classes_memo.clear()
+        options = {"semester": "S2", "location": "STLUC"}
+        course_classes(["MATH1051"], options, True)
+
+        course_info = parse_course_timetable(course_json, "MATH1051")
+        tracemalloc.start()
+        classes = convertForAlgorithmCourses(course_info, retrieveLectures=True)
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        convert_time = best_time(convert, args.repeat)
+        memo_time = best_time(lambda: course_classes(["MATH1051"], options, True), args.repeat)
+        print(
+            f"{activity_count:6} activities, {len(classes):4} classes: "
+            f"convert {convert_time * 1000:8.3f} ms ({convert_time / activity_count * 1e6:.2f} us/activity), "
+            f"memoized {memo_time * 1e6:8.2f} us, "
+            f"retained {retained / activity_count:6.1f} B/activity"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Benchmark suite for solve_timetable and the conversion stage feeding it, run from the backend directory.
+
+    python benchmarks/bench_solver.py
+    python benchmarks/bench_solver.py --save benchmarks/baseline.json
+    python benchmarks/bench_solver.py --compare benchmarks/baseline.json
+
+Synthetic cases are generated from (courses, classes per course, candidates per class, preference density), and real
+cases are built from the MATH1051 timetable.json fixture. Every case reports its best wall time, the nodes the search
+visited and the peak memory traced while solving. --save writes the results as a JSON baseline, and --compare reports
+each case against one, exiting with status 1 when any case is slower than the tolerance allows, visits more nodes or
+finds a different best score.
+
+--workers N solves every case with N processes instead, and reports the nodes visited against a serial solve, as a
+parallel search does extra work in subtrees that run before the best schedules are known. Measured with
+--filter synthetic --repeat 1, before and after the parallel search kept one heap per chunk of subtrees and seeded
+the chunks from a short serial probe:
+
+    case                           serial    2 workers before -> after    4 workers before -> after
+    synthetic-5x3x12-d0.9          214056        938050 ->   263358          1140642 ->   371263
+    synthetic-7x2x14-d0.4 (*)      153178        726172 ->   154509           726150 ->   190167
+    synthetic-6x2x16-d0.5 (*)      172332        365923 ->   201039           378505 ->   264455
+
+(*) Not among the cases below, generated with synthetic_problem. Parallel node counts vary a little between runs,
+as they depend on when each process sees the others' bound.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "flaskr"))
+
+from conversion import convertForAlgorithmCourses, convertForAlgorithmTimeSlots
+from models.Class import Class
+from models.constants import *
+from models.SearchStats import SearchStats
+from models.Time import Time
+from recommendation.algorithm import solve_timetable
+from timetable import parse_course_timetable
+
+# (courses, classes per course, candidates per class, preference density)
+SYNTHETIC_CASES = [
+    (2, 2, 8, 0.3),
+    (4, 2, 10, 0.3),
+    (4, 3, 12, 0.6),
+    (6, 2, 12, 0.3),
+    (5, 3, 12, 0.9),
+    (8, 1, 16, 0.5),
+]
+# (copies of MATH1051, attend lectures, preference density)
+REAL_CASES = [
+    (1, True, 0.3),
+    (2, True, 0.5),
+    (3, False, 0.5),
+    (2, True, 0.9),
+]
+
+# Seconds a case must slow down by, on top of the tolerance, to count as a regression
+MIN_WALL_CHANGE = 0.0005
+
+
+def synthetic_problem(
+    courses: int, classes_per_course: int, candidates: int, density: float, seed: int = 0
+) -> tuple[dict, list[Class]]:
+    """
+    Generate a random problem.
+
+    Args:
+        courses (int): The number of courses.
+        classes_per_course (int): The number of classes (e.g. LEC1, TUT1) each course has.
+        candidates (int): The number of times each class runs at.
+        density (float): The fraction of half-hour slots between 8am and 10pm given a preference.
+        seed (int): The random seed, so a case is the same problem on every run.
+
+    Returns:
+        tuple: The preference grid and the classes.
+    """
+    rng = random.Random(seed)
+    classes = []
+    for course in range(courses):
+        course_code = f"SYNT{course + 1000}"
+        for index in range(classes_per_course):
+            times = [
+                Time(
+                    f"{number + 1:02d}",
+                    rng.choice(DAYS),
+                    8 + rng.randrange(24) / 2,
+                    rng.choice([1.0, 1.0, 1.5, 2.0]),
+                    50,
+                )
+                for number in range(candidates)
+            ]
+            classes.append(Class(course_code, "TUT", f"TUT{index + 1}", times))
+
+    time_slots = {day: [0] * NUMBER_OF_TIME_SLOTS for day in DAYS}
+    for day in DAYS:
+        for slot in range(16, 44):
+            if rng.random() < density:
+                time_slots[day][slot] = rng.choice(STANDARD_LEVELS)
+    return time_slots, classes
+
+
+def real_courses(timetable_json: dict, copies: int) -> list[dict]:
+    """
+    Parse the fixture as several courses, each copy keeping the real times under another course code.
+
+    Returns:
+        list[dict]: The parsed activities of every copy, as parse_course_timetable returns them.
+    """
+    return [
+        activity
+        for copy in range(copies)
+        for activity in parse_course_timetable(timetable_json, f"MATH{1051 + copy}")
+    ]
+
+
+def real_preferences(rng: random.Random, density: float) -> dict:
+    """Generate frontend style timetable preferences covering a fraction of the weekday slots."""
+    preferences = {}
+    for day in ("MON", "TUE", "WED", "THU", "FRI"):
+        for hour in range(8, 22):
+            for minute in ("00", "30"):
+                if rng.random() < density:
+                    if rng.random() < 0.2:
+                        preference = {"preference": "unavailable", "rank": 5}
+                    else:
+                        preference = {"preference": "preferred", "rank": rng.choice(list(JSON_TO_RANK))}
+                    preferences[f"{day}-{hour}:{minute}"] = preference
+    return preferences
+
+
+def build_cases(timetable_json: dict) -> list[dict]:
+    """
+    Build every benchmark case.
+
+    Returns:
+        list[dict]: Each case's "name", "convert" function returning (time_slots, classes), and whether it is "real".
+    """
+    cases = []
+    for courses, classes_per_course, candidates, density in SYNTHETIC_CASES:
+        cases.append(
+            {
+                "name": f"synthetic-{courses}x{classes_per_course}x{candidates}-d{density}",
+                "convert": lambda args=(
+                    courses,
+                    classes_per_course,
+                    candidates,
+                    density,
+                ): synthetic_problem(*args),
+                "real": False,
+            }
+        )
+
+    rng = random.Random(0)
+    for copies, attend_lectures, density in REAL_CASES:
+        activities = real_courses(timetable_json, copies)
+        preferences = real_preferences(rng, density)
+
+        def convert(activities=activities, preferences=preferences, attend_lectures=attend_lectures):
+            return (
+                convertForAlgorithmTimeSlots(preferences),
+                convertForAlgorithmCourses(activities, retrieveLectures=attend_lectures),
+            )
+
+        lectures = "lectures" if attend_lectures else "no-lectures"
+        cases.append(
+            {"name": f"real-math1051x{copies}-{lectures}-d{density}", "convert": convert, "real": True}
+        )
+    return cases
+
+
+def run_case(case: dict, repeat: int, workers: int = 1) -> dict:
+    """
+    Time a case.
+
+    Args:
+        case (dict): The case, from build_cases.
+        repeat (int): The number of times to solve it.
+        workers (int): The number of processes to solve with.
+
+    Returns:
+        dict: The best and median "wall" seconds of solving, the best "convert" seconds for real cases, the "nodes"
+        visited, the "serial_nodes" a single process visits when solving with several, the "peak_kib" of memory
+        traced while solving, and the best "score".
+    """
+    convert_times = []
+    solve_times = []
+    for _ in range(repeat):
+        before = time.perf_counter()
+        time_slots, classes = case["convert"]()
+        convert_times.append(time.perf_counter() - before)
+
+        stats = SearchStats()
+        before = time.perf_counter()
+        schedules = solve_timetable(time_slots, classes, workers=workers, stats=stats)
+        solve_times.append(time.perf_counter() - before)
+
+    serial_nodes = None
+    if workers > 1:
+        serial_stats = SearchStats()
+        solve_timetable(time_slots, classes, stats=serial_stats)
+        serial_nodes = serial_stats.nodes
+
+    # Traced separately, as tracemalloc slows allocation down too much to time the same run
+    tracemalloc.start()
+    solve_timetable(time_slots, classes)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "wall": min(solve_times),
+        "wall_median": statistics.median(solve_times),
+        "convert": min(convert_times) if case["real"] else None,
+        "nodes": stats.nodes,
+        "serial_nodes": serial_nodes,
+        "peak_kib": round(peak / 1024, 1),
+        "score": schedules[0]["score"],
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Print each case's change against a baseline.
+
+    Returns:
+        bool: Whether any case regressed, by being more than tolerance slower or visiting more nodes.
+    """
+    regressed = False
+    print(f"\nAgainst baseline {baseline.get('commit', 'unknown')}:")
+    for name, result in results.items():
+        before = baseline["cases"].get(name)
+        if before is None:
+            print(f"{name:40} new case")
+            continue
+
+        ratio = result["wall"] / before["wall"] if before["wall"] else 1.0
+        flags = []
+        # Sub-millisecond cases jitter by more than any tolerance, so they must also be noticeably slower
+        if ratio > 1 + tolerance and result["wall"] - before["wall"] > MIN_WALL_CHANGE:
+            flags.append("SLOWER")
+        if result["nodes"] > before["nodes"]:
+            flags.append("MORE NODES")
+        if result["score"] != before["score"]:
+            flags.append("SCORE CHANGED")
+        regressed = regressed or bool(flags)
+        print(
+            f"{name:40} wall x{ratio:5.2f}  nodes {before['nodes']:>8} -> {result['nodes']:<8} "
+            f"peak {before['peak_kib']:>8} -> {result['peak_kib']:<8} KiB {' '.join(flags)}"
+        )
+    return regressed
+
+
+def current_commit() -> str:
+    """Get the commit being benchmarked, or "unknown" outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, the best is reported")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--save", help="write the results to this JSON baseline")
+    parser.add_argument("--compare", help="compare the results to this JSON baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="fraction slower than the baseline allowed"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="processes to solve with, reporting nodes against a serial solve"
+    )
+    args = parser.parse_args()
+
+    with open(os.path.join(BACKEND_DIR, "timetable.json")) as file:
+        timetable_json = json.load(file)
+
+    results = {}
+    serial = f" {'serial':>9} {'ratio':>6}" if args.workers > 1 else ""
+    print(
+        f"{'case':40} {'wall ms':>10} {'median ms':>10} {'convert ms':>10} {'nodes':>9}{serial} {'peak KiB':>9}"
+    )
+    for case in build_cases(timetable_json):
+        if args.filter not in case["name"]:
+            continue
+        result = run_case(case, args.repeat, args.workers)
+        results[case["name"]] = result
+        convert = f"{result['convert'] * 1000:10.3f}" if result["convert"] is not None else f"{'-':>10}"
+        serial = ""
+        if result["serial_nodes"] is not None:
+            serial = f" {result['serial_nodes']:9} {result['nodes'] / result['serial_nodes']:6.2f}"
+        print(
+            f"{case['name']:40} {result['wall'] * 1000:10.3f} {result['wall_median'] * 1000:10.3f} "
+            f"{convert} {result['nodes']:9}{serial} {result['peak_kib']:9}"
+        )
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(
+                {"commit": current_commit(), "python": sys.version.split()[0], "cases": results},
+                file,
+                indent=2,
+            )
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark of the recommendation response formats, run from the backend directory.
+
+    python benchmarks/bench_wire_format.py
+
+Solves a few copies of the MATH1051 fixture, then compares the size and serialisation time of the default grid
+response against the compact format, with and without gzip.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "flaskr"))
+
+import timetable
+from conversion import convertForAlgorithmCourses, convertForAlgorithmTimeSlots
+from models.SearchStats import SearchStats
+from recommendation.algorithm import solve_timetable
+from timetable import finish_recommendation
+
+from bench_solver import real_courses
+from timing import best_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--copies", type=int, default=2, help="copies of MATH1051 to recommend for")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with open(os.path.join(BACKEND_DIR, "timetable.json")) as file:
+        timetable_json = json.load(file)
+    classes = convertForAlgorithmCourses(real_courses(timetable_json, args.copies))
+    timeslots = convertForAlgorithmTimeSlots({})
+    best_timetables = solve_timetable(timeslots, classes)
+
+    # Build the responses without touching the result cache
+    timetable.result_cache.set = lambda *args, **kwargs: None
+    stats = SearchStats()
+    serialisers = {
+        "grid (json)": (False, lambda payload: json.dumps(payload).encode()),
+        "compact (json)": (True, lambda payload: json.dumps(payload, separators=(",", ":")).encode()),
+    }
+    if timetable.orjson is not None:
+        serialisers["compact (orjson)"] = (True, timetable.orjson.dumps)
+
+    print(f"{len(best_timetables)} recommendations for {len(classes)} classes")
+    print(f"{'format':18} {'bytes':>9} {'gzipped':>9} {'build+serialise ms':>19}")
+    for name, (compact, dumps) in serialisers.items():
+        problem = {"compact": compact, "cache_key": None}
+
+        def respond():
+            return dumps(finish_recommendation(problem, best_timetables, stats, {"solve": 0}))
+
+        data = respond()
+        seconds = best_time(respond, args.repeat)
+        print(f"{name:18} {len(data):9} {len(gzip.compress(data)):9} {seconds * 1000:19.3f}")
+
+
+if __name__ == "__main__":
+    main()
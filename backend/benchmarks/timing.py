@@ -0,0 +1,13 @@
+"""Timing helpers shared by the benchmark scripts, which import it from this directory."""
+
+import time
+
+
+def best_time(function, repeat: int) -> float:
+    """Run function repeat times and return the fastest run in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        before = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - before)
+    return best
@@ -1,9 +1,66 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from cache import CACHE_PATH, SQLiteCache
+from course_interface import FETCH_CONCURRENCY, UPSTREAM_TIMEOUT, session
 from flask import Blueprint, request
 
 assessment_api = Blueprint("assessment", __name__)
 
+COURSE_PAGE_URL = "https://programs-courses.uq.edu.au/course.html?course_code={course_code}"
+
+SEMESTER_NAMES = {"S1": "Semester 1", "S2": "Semester 2"}
+LOCATION_NAMES = {"STLUC": "St Lucia", "GATTN": "Gatton", "HERST": "Herston"}
+
+
+def is_assessment_region(name: str, attrs: dict) -> bool:
+    """Whether a tag of an ECP is one parse_assessments reads, the title or the assessment section."""
+    return name == "h1" or (name == "section" and attrs.get("id") == "assessment--section")
+
+
+# Only the parts of each page that are read are built into a tree, the rest is skipped as it is parsed
+COURSE_PAGE_STRAINER = SoupStrainer(
+    "table", id=["course-current-offerings", "course-archived-offerings"]
+)
+ECP_STRAINER = SoupStrainer(is_assessment_region)
+
+# Course pages and ECPs change a few times a semester. Lookups are answered from the cache for ASSESSMENT_FRESH_TTL,
+# then from the cache while upstream is asked in the background whether the pages changed, until the entry expires
+# after ASSESSMENT_CACHE_TTL
+ASSESSMENT_FRESH_TTL = float(os.environ.get("ASSESSMENT_FRESH_TTL", 6 * 60 * 60))
+ASSESSMENT_CACHE_TTL = float(os.environ.get("ASSESSMENT_CACHE_TTL", 30 * 24 * 60 * 60))
+ASSESSMENT_CACHE_SIZE = int(os.environ.get("ASSESSMENT_CACHE_SIZE", 2000))
+
+assessment_cache = SQLiteCache(
+    CACHE_PATH, "assessments", ASSESSMENT_CACHE_SIZE, ASSESSMENT_CACHE_TTL
+)
+
+# The most courses one batch lookup may ask for
+ASSESSMENT_BATCH_MAX_COURSES = int(os.environ.get("ASSESSMENT_BATCH_MAX_COURSES", 20))
+
+# The cache keys being revalidated by this process, so a busy course is only revalidated once at a time
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+class AssessmentError(Exception):
+    """
+    Raised when a course's assessments cannot be looked up.
+
+    Attributes:
+        status (int): The HTTP status to answer with.
+    """
+
+    def __init__(self, message: str, status: int) -> None:
+        super().__init__(message)
+        self.status = status
+
 
 def parse_and_format_date(date_str):
     # Check for weekly recurring format
@@ -70,31 +127,55 @@ def map_assessment_type(category_str):
     return "assignment"
 
 
-@assessment_api.route("/assessment/<course_code>", methods=["GET"])
-def assessment_for_course(course_code):
-    semester = request.args.get("semester")  # e.g., S1
-    location = request.args.get("location")  # e.g., STLUC
-
-    semester_map = {"S1": "Semester 1", "S2": "Semester 2"}
-    location_map = {"STLUC": "St Lucia", "GATTN": "Gatton", "HERST": "Herston"}
-    target_semester_str = semester_map.get(semester)
-    target_location_str = location_map.get(location)
-
-    if not target_semester_str or not target_location_str:
-        return "Invalid or missing semester/location parameter.", 400
-
-    try:
-        course_offering_url = (
-            f"https://programs-courses.uq.edu.au/course.html?course_code={course_code}"
-        )
-        response = requests.get(course_offering_url)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        return f"Error fetching course page: {e}", 500
-
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    ecp_url = None
+def fetch_page(url: str, validators: dict = None) -> tuple[str, dict]:
+    """
+    Fetch an upstream page, conditionally if it was fetched before.
+
+    Args:
+        url (str): The page to fetch.
+        validators (dict, optional): The "etag" and "last_modified" headers from an earlier fetch of the page, sent
+        as If-None-Match and If-Modified-Since.
+
+    Returns:
+        tuple: The page's HTML, or None if upstream answered that it has not changed, and its validators to send
+        with the next fetch.
+
+    Raises:
+        requests.exceptions.RequestException: If upstream could not be reached or answered with an error.
+    """
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    response = session.get(url, headers=headers, timeout=UPSTREAM_TIMEOUT)
+    if validators and response.status_code == 304:
+        return None, validators
+    response.raise_for_status()
+    return response.text, {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+def find_ecp_url(course_page: str, semester: str, location: str) -> str:
+    """
+    Find the link to a course's ECP (electronic course profile) for an offering on its course page.
+
+    Args:
+        course_page (str): The HTML of the course page.
+        semester (str): The semester, such as "S1".
+        location (str): The campus, such as "STLUC".
+
+    Returns:
+        str: The ECP's URL, or None if the course page does not link one for the offering. Current offerings are
+        checked before archived ones.
+    """
+    target_semester_str = SEMESTER_NAMES[semester]
+    target_location_str = LOCATION_NAMES[location]
+    soup = BeautifulSoup(course_page, "html.parser", parse_only=COURSE_PAGE_STRAINER)
 
     def find_ecp_in_table(table):
         if not table or not table.find("tbody"):
@@ -126,16 +207,22 @@ def assessment_for_course(course_code):
         archived_offerings_table = soup.find("table", id="course-archived-offerings")
         ecp_url = find_ecp_in_table(archived_offerings_table)
 
-    if not ecp_url:
-        return "ECP link not found for specified semester and location.", 404
+    return ecp_url
 
-    try:
-        ecp_response = requests.get(ecp_url)
-        ecp_response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        return f"Error fetching ECP page: {e}", 500
 
-    ecp_soup = BeautifulSoup(ecp_response.text, "html.parser")
+def parse_assessments(ecp: str, course_code: str) -> list[dict]:
+    """
+    Read the assessment summary table of a course's ECP.
+
+    Args:
+        ecp (str): The HTML of the ECP.
+        course_code (str): The course code, e.g. "CSSE2002".
+
+    Returns:
+        list[dict]: An assessment per row of the summary table, with its "id", "courseCode", "courseName",
+        "assessmentName", "dueDate", "weighting", "notes" and "type".
+    """
+    ecp_soup = BeautifulSoup(ecp, "html.parser", parse_only=ECP_STRAINER)
 
     course_name = ""
     h1 = ecp_soup.find("h1")
@@ -180,3 +267,251 @@ def assessment_for_course(course_code):
                     )
 
     return assessments
+
+
+def refresh_assessments(
+    course_code: str,
+    semester: str,
+    location: str,
+    entry: dict = None,
+) -> dict:
+    """
+    Look up a course's assessments upstream and store them in the cache.
+
+    When an earlier entry is given, both pages are fetched conditionally, and a page that has not changed is neither
+    downloaded nor parsed again.
+
+    Args:
+        course_code (str): The course code, e.g. "CSSE2002".
+        semester (str): The semester, such as "S1".
+        location (str): The campus, such as "STLUC".
+        entry (dict, optional): The cached entry to revalidate.
+
+    Returns:
+        dict: The new cache entry, with the "ecp_url", the "assessments", the validators of the "course_page" and
+        the "ecp", and the time it was "fetched_at".
+
+    Raises:
+        AssessmentError: If a page could not be fetched, or the course page has no ECP for the offering.
+    """
+    course_code = course_code.upper()
+    try:
+        course_page, course_page_validators = fetch_page(
+            COURSE_PAGE_URL.format(course_code=course_code),
+            entry["course_page"] if entry else None,
+        )
+    except requests.exceptions.RequestException as e:
+        raise AssessmentError(f"Error fetching course page: {e}", 500)
+
+    if course_page is None:
+        assessment_cache.increment("not_modified")
+        ecp_url = entry["ecp_url"]
+    else:
+        ecp_url = find_ecp_url(course_page, semester, location)
+    if not ecp_url:
+        raise AssessmentError(
+            "ECP link not found for specified semester and location.", 404
+        )
+
+    try:
+        ecp, ecp_validators = fetch_page(
+            ecp_url, entry["ecp"] if entry and entry["ecp_url"] == ecp_url else None
+        )
+    except requests.exceptions.RequestException as e:
+        raise AssessmentError(f"Error fetching ECP page: {e}", 500)
+
+    if ecp is None:
+        assessment_cache.increment("not_modified")
+        assessments = entry["assessments"]
+    else:
+        assessments = parse_assessments(ecp, course_code)
+
+    entry = {
+        "ecp_url": ecp_url,
+        "assessments": assessments,
+        "course_page": course_page_validators,
+        "ecp": ecp_validators,
+        "fetched_at": time.time(),
+    }
+    assessment_cache.set((course_code, semester, location), entry)
+    return entry
+
+
+def revalidate_in_background(
+    course_code: str, semester: str, location: str, entry: dict
+) -> threading.Thread:
+    """
+    Refresh a stale cache entry in a background thread, unless it is already being refreshed.
+
+    If upstream cannot be reached the stale entry is kept, and the next lookup tries again.
+
+    Returns:
+        threading.Thread: The thread refreshing the entry, or None if one was already running.
+    """
+    key = (course_code.upper(), semester, location)
+    with _revalidating_lock:
+        if key in _revalidating:
+            return None
+        _revalidating.add(key)
+
+    def revalidate() -> None:
+        try:
+            refresh_assessments(course_code, semester, location, entry)
+        except AssessmentError:
+            pass
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(key)
+
+    thread = threading.Thread(target=revalidate, daemon=True)
+    thread.start()
+    return thread
+
+
+def course_assessments(course_code: str, semester: str, location: str) -> list[dict]:
+    """
+    Look up a course's assessments, from the cache when possible.
+
+    A fresh cache entry is returned without contacting upstream. An entry older than ASSESSMENT_FRESH_TTL is still
+    returned straight away, while it is revalidated in the background.
+
+    Args:
+        course_code (str): The course code, e.g. "CSSE2002".
+        semester (str): The semester, such as "S1".
+        location (str): The campus, such as "STLUC".
+
+    Returns:
+        list[dict]: The course's assessments, as parse_assessments returns them.
+
+    Raises:
+        AssessmentError: If the assessments are not cached and could not be looked up.
+    """
+    assessments = cached_assessments(course_code, semester, location)
+    if assessments is None:
+        assessments = refresh_assessments(course_code, semester, location)["assessments"]
+    return assessments
+
+
+def cached_assessments(course_code: str, semester: str, location: str) -> list[dict]:
+    """
+    Look up a course's assessments in the cache, revalidating them in the background once they are stale.
+
+    Returns:
+        list[dict]: The cached assessments, or None if the course is not cached.
+    """
+    entry = assessment_cache.get((course_code.upper(), semester, location))
+    if entry is None:
+        return None
+    if time.time() - entry["fetched_at"] >= ASSESSMENT_FRESH_TTL:
+        revalidate_in_background(course_code, semester, location, entry)
+    return entry["assessments"]
+
+
+def course_assessments_many(
+    course_codes: list[str], semester: str, location: str
+) -> tuple[dict, dict]:
+    """
+    Look up the assessments of several courses, fetching the pages of the ones that are not cached concurrently.
+
+    Up to FETCH_CONCURRENCY courses are fetched at once, each parsed in the thread that fetched it, so the lookup
+    takes about as long as the slowest course.
+
+    Args:
+        course_codes (list[str]): The course codes to look up.
+        semester (str): The semester, such as "S1".
+        location (str): The campus, such as "STLUC".
+
+    Returns:
+        tuple: The assessments of each course found, and the AssessmentError of each course that was not, both keyed
+        by course code. A course whose lookup failed unexpectedly has an AssessmentError with status 500, so one
+        course cannot fail the others.
+    """
+    found, errors = {}, {}
+    missing = []
+    for course_code in course_codes:
+        assessments = cached_assessments(course_code, semester, location)
+        if assessments is None:
+            missing.append(course_code)
+        else:
+            found[course_code] = assessments
+    if not missing:
+        return found, errors
+
+    with ThreadPoolExecutor(max_workers=min(FETCH_CONCURRENCY, len(missing))) as executor:
+        lookups = {
+            course_code: executor.submit(refresh_assessments, course_code, semester, location)
+            for course_code in missing
+        }
+        for course_code, lookup in lookups.items():
+            try:
+                found[course_code] = lookup.result()["assessments"]
+            except AssessmentError as e:
+                errors[course_code] = e
+            except Exception as e:
+                errors[course_code] = AssessmentError(f"Error looking up assessments: {e}", 500)
+    return found, errors
+
+
+@assessment_api.route("/assessment/<course_code>", methods=["GET"])
+def assessment_for_course(course_code):
+    semester = request.args.get("semester")  # e.g., S1
+    location = request.args.get("location")  # e.g., STLUC
+
+    if semester not in SEMESTER_NAMES or location not in LOCATION_NAMES:
+        return "Invalid or missing semester/location parameter.", 400
+
+    try:
+        return course_assessments(course_code, semester, location)
+    except AssessmentError as e:
+        return str(e), e.status
+
+
+@assessment_api.route("/batch", methods=["POST"])
+def assessments_for_courses():
+    """
+    Look up the assessments of several courses at once, such as every course in the workload view.
+
+    data: {
+        semester: e.g. S1,
+        location: e.g. STLUC,
+        courses: a list of up to ASSESSMENT_BATCH_MAX_COURSES course codes
+    }
+
+    Returns the "assessments" of every course found, in the order of courses, and the "errors" of the others keyed by
+    course code, each with the "error" message and the "status" the single course lookup would answer with. Each
+    assessment's "id" is prefixed with its course code, e.g. "CSSE2002-1", so the ids are unique across courses.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return "Request body must be a JSON object.", 400
+    semester = body.get("semester")
+    location = body.get("location")
+    if semester not in SEMESTER_NAMES or location not in LOCATION_NAMES:
+        return "Invalid or missing semester/location parameter.", 400
+
+    course_codes = body.get("courses")
+    if (
+        not isinstance(course_codes, list)
+        or not 0 < len(course_codes) <= ASSESSMENT_BATCH_MAX_COURSES
+        or not all(isinstance(course_code, str) for course_code in course_codes)
+    ):
+        return f"courses must list 1 to {ASSESSMENT_BATCH_MAX_COURSES} course codes.", 400
+    course_codes = list(dict.fromkeys(course_code.upper() for course_code in course_codes))
+
+    found, errors = course_assessments_many(course_codes, semester, location)
+    return {
+        "assessments": [
+            dict(assessment, id=f"{course_code}-{assessment['id']}")
+            for course_code in course_codes
+            for assessment in found.get(course_code, [])
+        ],
+        "errors": {
+            course_code: {"error": str(error), "status": error.status}
+            for course_code, error in errors.items()
+        },
+    }
+
+
+@assessment_api.route("/cache/stats", methods=["GET"])
+def assessment_cache_stats():
+    return assessment_cache.stats()
@@ -0,0 +1,317 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# One SQLite file shared by every worker process, so restarts and all workers see the same warm cache
+CACHE_PATH = os.environ.get("CACHE_PATH", os.path.join(BASE_DIR, "cache.sqlite3"))
+
+# Every course lookup is appended to this file as a line of JSON, which manage.py warm reads to find popular courses.
+# It is kept with the cache's data rather than in the source tree. Set to an empty string to turn the log off
+REQUEST_LOG_PATH = os.environ.get(
+    "REQUEST_LOG_PATH", os.path.join(os.path.dirname(CACHE_PATH), "requests.log")
+)
+# Once the log grows past this many bytes it is moved to REQUEST_LOG_PATH + ".1", replacing the one before, so the log
+# and the warm command reading it stay bounded
+REQUEST_LOG_MAX_BYTES = int(os.environ.get("REQUEST_LOG_MAX_BYTES", 16 * 1024 * 1024))
+
+# Cache hits should not need SQLite's single write lock, which every worker shares. An entry's accessed_at is only
+# rewritten once it is CACHE_ACCESS_RESOLUTION seconds old, which is all the precision LRU eviction needs, and counters
+# are added up in memory and written at most every CACHE_COUNTER_FLUSH_INTERVAL seconds
+CACHE_ACCESS_RESOLUTION = float(os.environ.get("CACHE_ACCESS_RESOLUTION", 60))
+CACHE_COUNTER_FLUSH_INTERVAL = float(os.environ.get("CACHE_COUNTER_FLUSH_INTERVAL", 5))
+
+
+class SQLiteStore:
+    """
+    A store kept in an SQLite database file that several processes can use at once.
+
+    Each thread of each process gets its own connection, opened on first use, and subclasses create their tables
+    in create_tables.
+
+    Attributes:
+        path (str): The SQLite database file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it and creating the tables on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.create_tables(connection)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def create_tables(self, connection: sqlite3.Connection) -> None:
+        """Create the tables the store needs if they do not exist yet."""
+
+
+class SQLiteCache(SQLiteStore):
+    """
+    A size-bounded, time-to-live cache of JSON values stored in SQLite.
+
+    Entries expire after their time to live, and once a namespace holds more than max_entries the least recently
+    used entries are evicted. Several caches can share one database file under different namespaces, and hit and
+    miss counters are kept per namespace in the database so they cover every process using it. Each process adds
+    its counts up in memory and writes them every counter_flush_interval seconds, when stats is called, and at exit.
+
+    Attributes:
+        path (str): The SQLite database file.
+        namespace (str): The name separating this cache's entries from other caches in the same file.
+        max_entries (int): The number of entries kept before the least recently used are evicted.
+        ttl (float): The default number of seconds an entry stays fresh.
+        access_resolution (float): How many seconds old an entry's last access must be before a hit records it.
+        counter_flush_interval (float): The most seconds counts are held in memory before being written.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        max_entries: int,
+        ttl: float,
+        access_resolution: float = CACHE_ACCESS_RESOLUTION,
+        counter_flush_interval: float = CACHE_COUNTER_FLUSH_INTERVAL,
+    ) -> None:
+        super().__init__(path)
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.access_resolution = access_resolution
+        self.counter_flush_interval = counter_flush_interval
+        self._pending = {}
+        self._pending_pid = os.getpid()
+        self._flushed_at = time.monotonic()
+        self._pending_lock = threading.Lock()
+        atexit.register(self.flush_counters)
+
+    def create_tables(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        connection.execute(
+            """CREATE INDEX IF NOT EXISTS cache_entries_accessed
+            ON cache_entries (namespace, accessed_at)"""
+        )
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS cache_counters (
+                namespace TEXT NOT NULL,
+                name TEXT NOT NULL,
+                value REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (namespace, name)
+            )"""
+        )
+
+    @staticmethod
+    def _key(key) -> str:
+        """Serialise a key, so tuples and strings can both be used."""
+        return json.dumps(key, separators=(",", ":"))
+
+    def get(self, key, default=None):
+        """
+        Get a fresh value from the cache, counting a hit or a miss. A hit only writes to the database when the entry
+        was last accessed over access_resolution seconds ago.
+
+        Args:
+            key: A JSON serialisable key, such as a tuple of strings.
+            default: The value returned when the key is missing or expired.
+
+        Returns:
+            The cached value, or default.
+        """
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            """SELECT value, accessed_at FROM cache_entries
+            WHERE namespace = ? AND key = ? AND expires_at > ?""",
+            (self.namespace, self._key(key), now),
+        ).fetchone()
+
+        if row is None:
+            self.increment("misses")
+            return default
+
+        value, accessed_at = row
+        if now - accessed_at >= self.access_resolution:
+            connection.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, self._key(key)),
+            )
+        self.increment("hits")
+        return json.loads(value)
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """
+        Store a value in the cache, evicting expired and least recently used entries.
+
+        Args:
+            key: A JSON serialisable key, such as a tuple of strings.
+            value: A JSON serialisable value.
+            ttl (float, optional): The number of seconds the value stays fresh, defaults to the cache's ttl.
+        """
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        connection = self._connection()
+        connection.execute(
+            """INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?)""",
+            (
+                self.namespace,
+                self._key(key),
+                json.dumps(value, separators=(",", ":")),
+                now + ttl,
+                now,
+            ),
+        )
+        connection.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, now),
+        )
+        connection.execute(
+            """DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                SELECT key FROM cache_entries WHERE namespace = ?
+                ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+    def delete(self, key) -> None:
+        """Remove a value from the cache."""
+        self._connection().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, self._key(key)),
+        )
+
+    def clear(self) -> None:
+        """Remove every value and counter of this cache."""
+        with self._pending_lock:
+            self._pending = {}
+        connection = self._connection()
+        connection.execute(
+            "DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        )
+        connection.execute(
+            "DELETE FROM cache_counters WHERE namespace = ?", (self.namespace,)
+        )
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        """Add to one of the cache's counters, writing the counts held in memory once they are due."""
+        with self._pending_lock:
+            if self._pending_pid != os.getpid():
+                # Counts inherited from the parent of a forked worker are the parent's to write
+                self._pending, self._pending_pid = {}, os.getpid()
+            self._pending[name] = self._pending.get(name, 0) + amount
+            due = time.monotonic() - self._flushed_at >= self.counter_flush_interval
+        if due:
+            self.flush_counters()
+
+    def flush_counters(self) -> None:
+        """Write the counts held in memory by this process to the database."""
+        with self._pending_lock:
+            if self._pending_pid != os.getpid():
+                self._pending, self._pending_pid = {}, os.getpid()
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                """INSERT INTO cache_counters (namespace, name, value) VALUES (?, ?, ?)
+                ON CONFLICT (namespace, name) DO UPDATE SET value = value + excluded.value""",
+                [(self.namespace, name, amount) for name, amount in pending.items()],
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def stats(self) -> dict:
+        """
+        Get the cache's counters and size.
+
+        Returns:
+            dict: The "entries" currently stored, the "hits" and "misses" so far, their "hit_rate", and any other
+            counters added with increment, including this process's counts not yet written.
+        """
+        self.flush_counters()
+        connection = self._connection()
+        stats = {"hits": 0, "misses": 0}
+        for name, value in connection.execute(
+            "SELECT name, value FROM cache_counters WHERE namespace = ?",
+            (self.namespace,),
+        ):
+            stats[name] = int(value) if value == int(value) else value
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["entries"] = connection.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, time.time()),
+        ).fetchone()[0]
+        return stats
+
+
+class MemoryCache:
+    """
+    A size-bounded, time-to-live cache of Python objects held in this process.
+
+    Used for values that are cheap to rebuild from the shared caches but expensive to serialise, such as converted
+    Class objects. Values are returned as is, so callers must not modify them.
+
+    Attributes:
+        max_entries (int): The number of entries kept before the least recently used are evicted.
+        ttl (float): The number of seconds an entry stays fresh.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get a fresh value from the cache, or default when the key is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value) -> None:
+        """Store a value in the cache, evicting the least recently used entries beyond max_entries."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every value from the cache."""
+        with self._lock:
+            self._entries.clear()
@@ -1,5 +1,13 @@
+import base64
+import binascii
+import functools
+import itertools
+import sys
+
 import requests
-from models import Class
+from models.Class import Class
+from models.constants import *
+from models.Time import Time
 
 
 def convertForAlgorithmCourses(
@@ -28,55 +36,47 @@ def convertForAlgorithmCourses(
         list[Class]: List of Class objects, each containing associated Time objects for grouped activities.
 
     Notes:
-        - Activities are grouped by course_code, class_type, and subclass_type.
+        - Activities are grouped by course_code and subclass_type (which determines class_type) through a dictionary
+          index, so conversion takes linear time in the number of activities.
         - Time objects are created for each activity and added to the corresponding Class.
         - If no existing Class matches the activity, a new Class is instantiated.
-        - The function prints each activity_code during processing for debugging.
+        - Classes are returned in the order their first activity appears.
     """
 
-    classes = []
+    classes = {}
 
     # Creates the Class instances, with the Time instances inside
     for course in courses_activities:
-        # Create time class
+        class_type = getClassType(course["class_type"])
+
+        # prevent lectures from being instantiated if retrieveLectures is false. Below code for dealing with class instances
+        # are ignored
+        if retrieveLectures == False and class_type == "LEC":
+            continue
+
+        # Create time class. Codes repeat across courses and requests, so the memoized classes share one copy
         time = Time(
-            convertActivityNumber(course["activity_code"]),
+            sys.intern(course["activity_code"]),
             JSON_TO_DAY[course["day"]],
             convertTime(course["start"]),
             convertMinToHours(course["duration"]),
             50,
         )
 
-        # prevent lectures from being instantiated if retrieveLectures is false. Below code for dealing with class instances
-        # are ignored
-        if retrieveLectures == False and getClassType(course["class_type"]) == "LEC":
-            continue
-
-        # if existing class exists, add time to it
-        foundClassInstance = False
-        for classInstance in classes:
-            if (
-                classInstance.course_code == course["course_code"]
-                and classInstance.class_type == getClassType(course["class_type"])
-                and classInstance.subclass_type == course["class_type"]
-            ):
-                classInstance.add_time(time)
-                foundClassInstance = True
-                break
-
-        # if not, create new class and append to classes
-        if foundClassInstance == False:
-            times = [time]
-            classes.append(
-                Class(
-                    course["course_code"],
-                    getClassType(course["class_type"]),
-                    course["class_type"],
-                    times,
-                )
+        # if existing class exists, add time to it, if not, create new class
+        key = (course["course_code"], course["class_type"])
+        classInstance = classes.get(key)
+        if classInstance is not None:
+            classInstance.add_time(time)
+        else:
+            classes[key] = Class(
+                sys.intern(course["course_code"]),
+                class_type,
+                sys.intern(course["class_type"]),
+                [time],
             )
 
-    return classes
+    return list(classes.values())
 
 
 def convertForAlgorithmTimeSlots(preferences: dict) -> dict[list[int]]:
@@ -122,36 +122,141 @@ def convertForAlgorithmTimeSlots(preferences: dict) -> dict[list[int]]:
     return timeslots
 
 
-def convertTime(time: str) -> float:
+def convertForAlgorithmUnavailableSlots(preferences: dict) -> dict[list[bool]]:
     """
-    Converts a time string in "HH:MM" format to a float representing hours.
+    Converts user time slot preferences into the slots the user cannot attend at all.
 
     Args:
-        time (str): Time string in "HH:MM" format.
+        preferences (dict): Dictionary where keys are date strings (e.g., "MON-9:00") and values are dictionaries with:
+            - "preference": str, "unavailable" for slots that must stay free
 
     Returns:
-        float: Time as a float, where minutes are represented as a fraction of an hour. For example, "13:30" becomes 13.5.
+        dict[list[bool]]: Dictionary with weekdays as keys (MON, TUE, WED, THU, FRI) and lists of booleans, True for
+                          each time slot marked as unavailable.
     """
-    hours, minutes = time.split(":")
-    return int(hours) + (int(minutes) / 60)
 
+    unavailable_slots = {day: [False] * NUMBER_OF_TIME_SLOTS for day in DAYS}
+
+    for date, preference in preferences.items():
+        if preference["preference"] == "unavailable":
+            unavailable_slots[getDay(date)][getTimeIndex(date)] = True
+
+    return unavailable_slots
 
-def convertActivityNumber(activityNum: str) -> int:
+
+# Translation tables from packed preference codes to preference levels, and to 1 for unavailable slots
+PACKED_LEVELS = bytes(
+    [0]
+    + [JSON_TO_RANK[rank] for rank in range(1, PACKED_UNAVAILABLE)]
+    + [JSON_TO_PREFERENCE["unavailable"]]
+    + [0] * (256 - PACKED_UNAVAILABLE - 1)
+)
+PACKED_UNAVAILABLE_FLAGS = bytes(
+    [1 if code == PACKED_UNAVAILABLE else 0 for code in range(256)]
+)
+PACKED_CODES = bytes(range(PACKED_UNAVAILABLE + 1))
+
+
+def decodePackedPreferences(packed) -> bytes:
     """
-    Extracts and converts the first two characters of an activity code to an integer.
+    Validates a packed preference grid and decodes it into one code per time slot.
 
     Args:
-        activityNum (str): Activity code string.
+        packed (str | list[list[int]]): Either a base64 string of PACKED_GRID_SIZE bytes, or one list of
+            NUMBER_OF_TIME_SLOTS codes per weekday from Monday to Friday.
 
     Returns:
-        int: Integer representation of the activity number.
+        bytes: The PACKED_GRID_SIZE codes, Monday 0:00 first.
+
+    Raises:
+        ValueError: If the grid has the wrong size or holds a code other than 0 to PACKED_UNAVAILABLE.
     """
-    return int(activityNum[:2])
+    try:
+        if isinstance(packed, str):
+            codes = base64.b64decode(packed, validate=True)
+        elif isinstance(packed, list) and len(packed) == len(DAYS):
+            if any(not isinstance(day, list) or len(day) != NUMBER_OF_TIME_SLOTS for day in packed):
+                raise ValueError()
+            codes = bytes(itertools.chain.from_iterable(packed))
+        else:
+            raise ValueError()
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError(
+            f"timetableGrid must be base64 of {PACKED_GRID_SIZE} bytes or {len(DAYS)} lists of "
+            f"{NUMBER_OF_TIME_SLOTS} codes."
+        )
+
+    if len(codes) != PACKED_GRID_SIZE:
+        raise ValueError(f"timetableGrid must hold {PACKED_GRID_SIZE} codes, not {len(codes)}.")
+    # Deleting every valid code leaves only the invalid ones
+    if codes.translate(None, PACKED_CODES):
+        raise ValueError(f"timetableGrid codes must be between 0 and {PACKED_UNAVAILABLE}.")
+    return codes
+
 
+def convertPackedPreferences(codes: bytes) -> tuple[dict[list[int]], dict[list[bool]]]:
+    """
+    Converts a decoded packed preference grid into the preference levels and unavailable slots, like
+    convertForAlgorithmTimeSlots and convertForAlgorithmUnavailableSlots do for the keyed format.
+
+    Args:
+        codes (bytes): The codes from decodePackedPreferences.
 
+    Returns:
+        tuple: The preference levels and the unavailable slots, each with weekdays as keys.
+    """
+    levels = codes.translate(PACKED_LEVELS)
+    flags = codes.translate(PACKED_UNAVAILABLE_FLAGS)
+    timeslots = {}
+    unavailable_slots = {}
+    for index, day in enumerate(DAYS):
+        start = index * NUMBER_OF_TIME_SLOTS
+        timeslots[day] = list(levels[start : start + NUMBER_OF_TIME_SLOTS])
+        unavailable_slots[day] = list(map(bool, flags[start : start + NUMBER_OF_TIME_SLOTS]))
+    return timeslots, unavailable_slots
+
+
+def packPreferenceLevels(timeslots: dict[list[int]], unavailable_slots: dict[list[bool]] = None) -> bytes:
+    """
+    Packs converted preferences into bytes, one per time slot and then one per unavailable flag.
+
+    Both request formats pack to the same bytes for the same preferences, so they can key caches.
+
+    Args:
+        timeslots (dict[list[int]]): The preference levels of each weekday.
+        unavailable_slots (dict[list[bool]], optional): The slots that must stay free, if any.
+
+    Returns:
+        bytes: PACKED_GRID_SIZE levels, followed by PACKED_GRID_SIZE flags when unavailable_slots is given.
+    """
+    packed = bytes(itertools.chain.from_iterable(timeslots[day] for day in DAYS))
+    if unavailable_slots is not None:
+        packed += bytes(itertools.chain.from_iterable(unavailable_slots[day] for day in DAYS))
+    return packed
+
+
+@functools.lru_cache(maxsize=CONVERSION_CACHE_SIZE)
+def convertTime(time: str) -> float:
+    """
+    Converts a time string in "HH:MM" format to a float representing hours.
+
+    Results are cached, as the same few start times repeat across every activity, and the Times converted share one
+    float per distinct value.
+
+    Args:
+        time (str): Time string in "HH:MM" format.
+
+    Returns:
+        float: Time as a float, where minutes are represented as a fraction of an hour. For example, "13:30" becomes 13.5.
+    """
+    hours, minutes = time.split(":")
+    return int(hours) + (int(minutes) / 60)
+
+
+@functools.lru_cache(maxsize=CONVERSION_CACHE_SIZE)
 def convertMinToHours(duration: str) -> float:
     """
-    Converts a duration in minutes to hours as a float.
+    Converts a duration in minutes to hours as a float, cached like convertTime.
 
     Args:
         duration (str): Duration in minutes.
@@ -220,6 +325,49 @@ def convertTimetableToGrid(timetable_dict):
     return grid
 
 
+def convertTimetablesToCompact(timetables: list[dict]) -> tuple[list[str], list[list[list]]]:
+    """
+    Convert schedules from the algorithm into assignments sharing one string table.
+
+    Args:
+        timetables (list[dict]): Schedules from solve_timetable, each with its "assignments".
+
+    Returns:
+        tuple: The string table, and for each timetable a list of
+        [course, subclass, activity, day, start, duration, backups] assignments, where course, subclass, activity
+        and each backup activity are indices into the string table, day is an index into Monday to Friday, and
+        start and duration are in half-hour slots from midnight.
+    """
+    strings = []
+    indices = {}
+
+    def intern(value: str) -> int:
+        index = indices.get(value)
+        if index is None:
+            index = indices[value] = len(strings)
+            strings.append(value)
+        return index
+
+    assignments = [
+        [
+            [
+                intern(course_code),
+                intern(subclass_type),
+                intern(activity_code),
+                DAY_INDEX[day],
+                start_slot,
+                end_slot - start_slot,
+                [intern(backup) for backup in backups],
+            ]
+            for course_code, subclass_type, activity_code, day, start_slot, end_slot, backups in timetable[
+                "assignments"
+            ]
+        ]
+        for timetable in timetables
+    ]
+    return strings, assignments
+
+
 # For time slots
 def getDay(date: str) -> str:
     """
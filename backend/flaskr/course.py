@@ -1,5 +1,5 @@
 import requests
-from course_interface import course_details
+from course_interface import course_cache, course_details
 from flask import Blueprint, request
 
 course_api = Blueprint("course", __name__)
@@ -25,3 +25,8 @@ def course(course_code):
         return "Course not found", 400
 
     return course_timetable
+
+
+@course_api.route("/cache/stats", methods=["GET"])
+def course_cache_stats():
+    return course_cache.stats()
@@ -1,8 +1,127 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from cache import CACHE_PATH, SQLiteCache
+from requests.adapters import HTTPAdapter
+from snapshot import SNAPSHOT_MAX_AGE, catalog_snapshot
+from urllib3.util.retry import Retry
+
+TIMETABLE_URL = os.environ.get(
+    "TIMETABLE_URL", "https://timetable.my.uq.edu.au/odd/rest/timetable/subjects"
+)
+
+# How long upstream course lookups are reused for, and how many are kept
+COURSE_CACHE_TTL = float(os.environ.get("COURSE_CACHE_TTL", 6 * 60 * 60))
+COURSE_NOT_FOUND_TTL = float(os.environ.get("COURSE_NOT_FOUND_TTL", 15 * 60))
+COURSE_CACHE_SIZE = int(os.environ.get("COURSE_CACHE_SIZE", 2000))
+
+course_cache = SQLiteCache(
+    CACHE_PATH, "course_details", COURSE_CACHE_SIZE, COURSE_CACHE_TTL
+)
+
+# Upstream lookups for one request run in parallel, each bounded by a timeout and a few retries
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", 8))
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", 10))
+UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", 2))
+
+
+def create_session() -> requests.Session:
+    """
+    Create an HTTP session that keeps connections to upstream alive between lookups.
+
+    The timetable search is a read-only POST, so it is retried on connection errors and gateway errors.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=UPSTREAM_RETRIES,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=FETCH_CONCURRENCY, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared by every request this worker serves, so the TLS handshake is only paid once per connection
+session = create_session()
+
+
+def course_details(course_code, options, refresh=False):
+    """
+    Look up a course's timetable, from the local snapshot or the shared cache when possible.
+
+    A course in the catalog snapshot is answered from it while the snapshot is younger than SNAPSHOT_MAX_AGE, after
+    which it is refreshed from upstream. A stale snapshot is still served if upstream cannot be reached. Other courses
+    go through the shared cache, where courses that upstream does not know about are cached for COURSE_NOT_FOUND_TTL
+    rather than COURSE_CACHE_TTL, so a course that is added to the timetable late is picked up sooner.
+
+    Args:
+        course_code (str): The course code, e.g. "MATH1051".
+        options (dict): The "semester" (e.g. "S2") and "location" (e.g. "STLUC") to look up.
+        refresh (bool, optional): Whether to fetch the course from upstream even if it is cached or in a fresh
+        snapshot, storing it like any other lookup. Used to warm the cache.
 
+    Returns:
+        dict: The upstream timetable response, empty if the course was not found.
 
-def course_details(course_code, options):
-    timetable_url = "https://timetable.my.uq.edu.au/odd/rest/timetable/subjects"
+    Raises:
+        requests.exceptions.RequestException: If upstream could not be reached after retrying.
+    """
+    snapshot = catalog_snapshot.get(
+        course_code, options["semester"], options["location"]
+    )
+    if (
+        not refresh
+        and snapshot is not None
+        and time.time() - snapshot[1] < SNAPSHOT_MAX_AGE
+    ):
+        return snapshot[0]
+
+    cache_key = (course_code.upper(), options["semester"], options["location"])
+    cached = None if refresh else course_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        timetable_response = fetch_course_details(course_code, options)
+        course_json = timetable_response.json()
+    except requests.exceptions.RequestException:
+        if snapshot is not None:
+            return snapshot[0]
+        raise
+
+    if not timetable_response.ok:
+        return snapshot[0] if snapshot is not None else course_json
+
+    course_cache.set(
+        cache_key,
+        course_json,
+        ttl=COURSE_CACHE_TTL if course_json else COURSE_NOT_FOUND_TTL,
+    )
+    if snapshot is not None and course_json:
+        catalog_snapshot.put(
+            course_code, options["semester"], options["location"], course_json
+        )
+
+    return course_json
+
+
+def fetch_course_details(course_code, options) -> requests.Response:
+    """
+    Search upstream for a course's timetable.
+
+    Args:
+        course_code (str): The course code, e.g. "MATH1051".
+        options (dict): The "semester" (e.g. "S2") and "location" (e.g. "STLUC") to look up.
+
+    Returns:
+        requests.Response: The upstream response.
+    """
     course_body = {
         "search-term": course_code,
         "semester": options["semester"],
@@ -14,6 +133,30 @@ def course_details(course_code, options):
         "end-time": "23:00",
     }
 
-    timetable_response = requests.post(timetable_url, data=course_body)
+    return session.post(TIMETABLE_URL, data=course_body, timeout=UPSTREAM_TIMEOUT)
+
+
+def course_details_many(course_codes, options):
+    """
+    Look up the timetables of several courses at once, fetching the ones that are not cached in parallel.
+
+    Args:
+        course_codes (list[str]): The course codes to look up.
+        options (dict): The "semester" and "location" to look up.
+
+    Returns:
+        dict: The timetable response of each course code, as returned by course_details.
+
+    Raises:
+        requests.exceptions.RequestException: If upstream could not be reached for one of the courses.
+    """
+    if len(course_codes) <= 1:
+        return {code: course_details(code, options) for code in course_codes}
 
-    return timetable_response.json()
+    with ThreadPoolExecutor(
+        max_workers=min(FETCH_CONCURRENCY, len(course_codes))
+    ) as executor:
+        timetables = executor.map(
+            lambda code: course_details(code, options), course_codes
+        )
+        return dict(zip(course_codes, timetables))
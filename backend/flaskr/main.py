@@ -1,8 +1,11 @@
 import datetime
+import json
 import os
+import time
 from datetime import datetime
 
 from assessments import assessment_api
+from cache import REQUEST_LOG_MAX_BYTES, REQUEST_LOG_PATH
 from course import course_api
 from flask import Flask, request, send_from_directory
 from flask_cors import CORS
@@ -18,14 +21,58 @@ cors = CORS(
     ],
 )
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-logger_path = os.path.join(BASE_DIR, "logger.json")
-
 app.register_blueprint(course_api, url_prefix="/course")
 app.register_blueprint(timetable_api, url_prefix="/timetable")
 app.register_blueprint(assessment_api, url_prefix="/assessment")
 
 
+def requested_courses() -> list[str]:
+    """Get the course codes the current request looks up, from its URL or its JSON body."""
+    if request.view_args and "course_code" in request.view_args:
+        return [request.view_args["course_code"].upper()]
+    body = request.get_json(silent=True) if request.is_json else None
+    if isinstance(body, dict) and isinstance(body.get("courses"), list):
+        return [course.upper() for course in body["courses"] if isinstance(course, str)]
+    return []
+
+
+@app.after_request
+def log_course_request(response):
+    """
+    Append the courses, semester and location of each successful course lookup to the request log, rotating it once
+    it passes REQUEST_LOG_MAX_BYTES.
+    """
+    if not REQUEST_LOG_PATH or response.status_code >= 400:
+        return response
+    course_codes = requested_courses()
+    if not course_codes:
+        return response
+
+    body = request.get_json(silent=True) if request.is_json else None
+    if not isinstance(body, dict):
+        body = {}
+    entry = {
+        "time": time.time(),
+        "endpoint": request.endpoint,
+        "courses": course_codes,
+        "semester": request.args.get("semester") or body.get("semester"),
+        "location": request.args.get("location") or body.get("location"),
+    }
+    try:
+        # One short append per line, so lines from several workers do not interleave
+        with open(REQUEST_LOG_PATH, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+            full = file.tell() >= REQUEST_LOG_MAX_BYTES
+        if full:
+            # Another worker may rotate first, in which case this one finds the log gone and leaves it
+            os.replace(REQUEST_LOG_PATH, REQUEST_LOG_PATH + ".1")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        app.logger.warning("Could not write the request log: %s", e)
+    return response
+
+
 @app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
 def serve(path):
@@ -0,0 +1,215 @@
+"""
+Management commands for the UQCourseCraft backend, run from the flaskr directory.
+
+    python manage.py ingest ../timetable.json
+    python manage.py refresh --semester S2 --campus STLUC
+    python manage.py warm --semester S2 --campus STLUC MATH1051 CSSE2002
+    python manage.py warm --semester S2 --campus STLUC --top 100
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+
+import requests
+from assessments import (
+    LOCATION_NAMES,
+    SEMESTER_NAMES,
+    AssessmentError,
+    assessment_cache,
+    refresh_assessments,
+)
+from cache import REQUEST_LOG_PATH
+from course_interface import course_details, fetch_course_details
+from snapshot import catalog_snapshot
+
+
+def ingest(args: argparse.Namespace) -> None:
+    """Load upstream timetable dumps into the catalog snapshot."""
+    for path in args.dumps:
+        before = time.time()
+        with open(path) as file:
+            dump = json.load(file)
+
+        courses = catalog_snapshot.ingest(dump)
+        after = time.time()
+        print(
+            f"{path}: stored {len(courses)} courses from {len(dump)} subjects in {after - before:.2f} seconds"
+        )
+
+
+def refresh(args: argparse.Namespace) -> None:
+    """Fetch every course in the catalog snapshot for a semester and campus from upstream again."""
+    options = {"semester": args.semester, "location": args.campus}
+    course_codes = catalog_snapshot.courses(args.semester, args.campus)
+
+    refreshed = 0
+    for course_code in course_codes:
+        try:
+            timetable_response = fetch_course_details(course_code, options)
+            timetable_response.raise_for_status()
+            course_json = timetable_response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"{course_code}: kept snapshot, upstream failed: {e}")
+            continue
+
+        if not course_json:
+            print(f"{course_code}: kept snapshot, upstream no longer lists it")
+            continue
+
+        catalog_snapshot.put(course_code, args.semester, args.campus, course_json)
+        refreshed += 1
+
+    print(f"Refreshed {refreshed} of {len(course_codes)} courses")
+
+
+def popular_courses(
+    log_path: str, semester: str, campus: str, count: int, since: float
+) -> list[str]:
+    """
+    Find the most looked up courses in the request log and the one it last rotated out.
+
+    Args:
+        log_path (str): The request log, a line of JSON per request.
+        semester (str): Only count lookups for this semester, e.g. "S2".
+        campus (str): Only count lookups for this campus, e.g. "STLUC".
+        count (int): The number of courses to return.
+        since (float): Only count lookups made after this time.
+
+    Returns:
+        list[str]: Up to count course codes, the most looked up first.
+    """
+    lookups = Counter()
+    for path in (log_path + ".1", log_path):
+        try:
+            file = open(path)
+        except FileNotFoundError:
+            continue
+        with file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # A line cut short while it was being written
+                if (
+                    entry.get("time", 0) >= since
+                    and entry.get("semester") == semester
+                    and entry.get("location") == campus
+                ):
+                    lookups.update(entry.get("courses", []))
+    return [course_code for course_code, _ in lookups.most_common(count)]
+
+
+def warm(args: argparse.Namespace) -> None:
+    """
+    Fetch courses' timetables and assessments from upstream into the app's caches, such as before enrolment opens.
+
+    Courses are warmed one at a time, starting no more often than every --interval seconds, so upstream is not
+    flooded. Assessments already cached are revalidated with conditional requests, and are skipped for semesters and
+    campuses the assessment lookup does not know, such as summer semesters.
+    """
+    options = {"semester": args.semester, "location": args.campus}
+    skip_assessments = args.skip_assessments
+    if not skip_assessments and (
+        args.semester not in SEMESTER_NAMES or args.campus not in LOCATION_NAMES
+    ):
+        print(f"Skipping assessments, they cannot be looked up for {args.semester} at {args.campus}")
+        skip_assessments = True
+    course_codes = [course_code.upper() for course_code in args.courses]
+    if args.top:
+        course_codes += popular_courses(
+            args.log,
+            args.semester,
+            args.campus,
+            args.top,
+            time.time() - args.days * 24 * 60 * 60,
+        )
+    course_codes = list(dict.fromkeys(course_codes))
+    if not course_codes:
+        print("No courses to warm")
+        return
+
+    started = time.time()
+    warmed = 0
+    next_start = started
+    for course_code in course_codes:
+        time.sleep(max(0, next_start - time.time()))
+        next_start = time.time() + args.interval
+        results = []
+
+        before = time.time()
+        try:
+            course_json = course_details(course_code, options, refresh=True)
+        except requests.exceptions.RequestException as e:
+            print(f"{course_code}: upstream failed: {e}")
+            continue
+        if not course_json:
+            print(f"{course_code}: not offered in {args.semester} at {args.campus}")
+            continue
+        results.append(f"timetable {time.time() - before:.2f}s")
+
+        if not skip_assessments:
+            before = time.time()
+            entry = assessment_cache.get((course_code, args.semester, args.campus))
+            try:
+                refresh_assessments(course_code, args.semester, args.campus, entry)
+                results.append(f"assessments {time.time() - before:.2f}s")
+            except AssessmentError as e:
+                results.append(f"assessments failed: {e}")
+
+        warmed += 1
+        print(f"{course_code}: {', '.join(results)}")
+
+    print(
+        f"Warmed {warmed} of {len(course_codes)} courses in {time.time() - started:.2f} seconds"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser(
+        "ingest", help="load upstream timetable dumps into the catalog snapshot"
+    )
+    ingest_parser.add_argument(
+        "dumps", nargs="+", help="JSON files of upstream subjects keyed by subject code"
+    )
+    ingest_parser.set_defaults(handler=ingest)
+
+    refresh_parser = commands.add_parser(
+        "refresh", help="refetch the snapshot courses of a semester and campus"
+    )
+    refresh_parser.add_argument("--semester", required=True, help="e.g. S2")
+    refresh_parser.add_argument("--campus", required=True, help="e.g. STLUC")
+    refresh_parser.set_defaults(handler=refresh)
+
+    warm_parser = commands.add_parser(
+        "warm",
+        help="fetch courses' timetables and assessments into the app's caches",
+    )
+    warm_parser.add_argument("courses", nargs="*", help="course codes to warm, e.g. MATH1051")
+    warm_parser.add_argument("--semester", required=True, help="e.g. S2")
+    warm_parser.add_argument("--campus", required=True, help="e.g. STLUC")
+    warm_parser.add_argument(
+        "--top", type=int, default=0, help="also warm the N most looked up courses in the request log"
+    )
+    warm_parser.add_argument(
+        "--days", type=float, default=14, help="how many days of the request log to count"
+    )
+    warm_parser.add_argument("--log", default=REQUEST_LOG_PATH, help="the request log to read")
+    warm_parser.add_argument(
+        "--interval", type=float, default=1.0, help="seconds between starting each course"
+    )
+    warm_parser.add_argument(
+        "--skip-assessments", action="store_true", help="only warm the timetables"
+    )
+    warm_parser.set_defaults(handler=warm)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import bisect
+import threading
+
+# Upper bounds of the histogram buckets, values above the last bound go in an overflow bucket
+SECONDS_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+COUNT_BUCKETS = [0, 1, 10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+
+class Histogram:
+    """
+    Counts how many observed values fell into each of a fixed set of buckets.
+
+    Attributes:
+        buckets (list[float]): The sorted upper bound of each bucket, inclusive.
+        counts (list[int]): The number of values in each bucket, with one more for values above the last bound.
+        count (int): The number of values observed.
+        total (float): The sum of the values observed.
+        maximum (float): The largest value observed, None before any.
+    """
+
+    def __init__(self, buckets: list[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.maximum = None
+
+    def observe(self, value: float) -> None:
+        """Add a value to its bucket."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def as_dict(self) -> dict:
+        """
+        Get the histogram as a JSON serialisable dictionary.
+
+        Returns:
+            dict: The "count", "sum", "max" and "mean" of the values, and the "buckets" mapping each upper bound
+            (with "+inf" for the overflow bucket) to its count.
+        """
+        bounds = [str(bound) for bound in self.buckets] + ["+inf"]
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.maximum,
+            "mean": self.total / self.count if self.count else None,
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+
+class Metrics:
+    """
+    A named set of histograms kept in this process.
+
+    Every worker process keeps its own metrics, which start empty when it starts, so they are a cheap view of recent
+    behaviour rather than a complete record.
+    """
+
+    def __init__(self) -> None:
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, buckets: list[float] = SECONDS_BUCKETS) -> None:
+        """
+        Add a value to a histogram, creating it with the given buckets on first use.
+
+        Args:
+            name (str): The histogram's name, such as "stage.solve".
+            value (float): The value observed.
+            buckets (list[float], optional): The bucket bounds used if the histogram is new, defaults to seconds.
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def as_dict(self) -> dict:
+        """Get every histogram by name, as Histogram.as_dict returns them."""
+        with self._lock:
+            return {
+                name: histogram.as_dict()
+                for name, histogram in sorted(self._histograms.items())
+            }
+
+    def clear(self) -> None:
+        """Remove every histogram."""
+        with self._lock:
+            self._histograms.clear()
@@ -13,6 +13,8 @@ class Class:
         times (list[Time]): A list of Time objects representing when the class occurs.
     """
 
+    __slots__ = ("course_code", "class_type", "subclass_type", "times")
+
     def __init__(
         self, course_code: str, class_type: str, subclass_type: str, times: list[Time]
     ) -> None:
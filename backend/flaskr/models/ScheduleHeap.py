@@ -1,42 +1,72 @@
 import heapq
-
-from ComparableSchedule import ComparableSchedule
+from collections.abc import Callable
 
 
 class ScheduleHeap:
+    """
+    A min-heap of the best schedules found by the search, holding at most capacity entries.
+
+    Schedules are stored as the tuple of candidate indices chosen for each class rather than as day-slot
+    dictionaries, which are only built for the final entries in getBestSchedules. Each entry is a plain
+    (score, -sequence, schedule) tuple, so entries compare without calling back into Python code, and among equal
+    scores the entry added first ranks higher. The search adds schedules in depth-first order, so ties go to the
+    schedule found first.
+
+    Attributes:
+        capacity (int): The number of schedules kept.
+        heap (list[tuple]): The (score, -sequence, schedule) entries, worst first.
+        insertions (int): The number of entries added so far, which is also the next entry's sequence number.
+        evictions (int): The number of entries pushed out by better ones so far.
+    """
+
     def __init__(self, capacity: int) -> None:
         """
-        Initialize a min-heap with a given capacity.
+        Initialize a min-heap with a given capacity, counting the entries inserted and evicted.
         """
         self.capacity = capacity
         self.heap = []
+        self.insertions = 0
+        self.evictions = 0
 
-    def newEntry(self, score: int, schedule: dict) -> None:
+    def newEntry(self, score: int, schedule: tuple[int]) -> bool:
         """
-        Add a new entry to the heap with a given score and schedule. If the heap is not full or the
-        new entry has a higher score than the smallest entry, it is added to the heap.
+        Add a new entry to the heap with a given score and schedule of candidate indices. If the heap is not full
+        or the new entry scores higher than the lowest entry, it is added to the heap. An equal score loses to the
+        entries added before it. Returns whether the entry was added.
         """
-        if len(self.heap) < self.capacity or score > self.heap[0].score:
-            heapq.heappush(self.heap, ComparableSchedule(score, schedule))
+        if len(self.heap) < self.capacity:
+            heapq.heappush(self.heap, (score, -self.insertions, schedule))
+            self.insertions += 1
+            return True
+        if score <= self.heap[0][0]:
+            return False  # Rejected without building an entry
 
-            if len(self.heap) > self.capacity:
-                heapq.heappop(self.heap)
+        heapq.heapreplace(self.heap, (score, -self.insertions, schedule))
+        self.insertions += 1
+        self.evictions += 1
+        return True
 
-    def getBestSchedules(self) -> list[dict]:
+    def getBestEntries(self) -> list[tuple[int, tuple[int]]]:
         """
-        Get the best schedules from the heap, sorted by score in descending order.
+        Get the (score, schedule) entries from the heap, sorted by rank in descending order.
+        """
+        output = sorted(self.heap, reverse=True)  # Sort by score in descending order
+        return [(score, schedule) for score, _, schedule in output]
+
+    def getBestSchedules(self, build: Callable[[int, tuple[int]], dict]) -> list[dict]:
+        """
+        Build the best schedules from the heap, sorted by score in descending order.
+
+        Args:
+            build (Callable): Builds the schedule dictionary for a score and schedule of candidate indices.
         """
-        output = self.heap.copy()
-        output.sort(
-            reverse=True, key=lambda x: x.score
-        )  # Sort by score in descending order
         return [
-            comparable_schedule.schedule for comparable_schedule in output
+            build(score, schedule) for score, schedule in self.getBestEntries()
         ]  # Return in descending order of score
 
-    def getBestSchedule(self) -> dict:
+    def getBestSchedule(self, build: Callable[[int, tuple[int]], dict]) -> dict:
         """
-        Get the best schedule from the heap.
+        Build the best schedule from the heap, or None if it is empty.
         """
-        print(self.heap)
-        return self.heap[0].schedule if self.heap else None
+        entries = self.getBestEntries()
+        return build(*entries[0]) if entries else None
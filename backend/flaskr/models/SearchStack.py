@@ -0,0 +1,47 @@
+class SearchStack:
+    """
+    Where a depth-first search of the timetable classes has got to, kept as an explicit stack rather than in
+    Python call frames so the search can stop and later resume from the same node.
+
+    Level i of the stack is the node allocating class i, below the classes fixed by the starting path.
+
+    Attributes:
+        start (int): The level the search started at, the number of classes fixed by the starting path.
+        depth (int): The level of the node the search is at, below start once the search is done.
+        chosen (list[int]): The candidate index chosen for each class above depth, starting with the path.
+        cursors (list): The iterator over the (index, candidate) pairs of each level's class still to be tried,
+        None for levels not reached yet.
+        scores (list[int]): The score of the candidates chosen above each level, with one more for complete schedules.
+        occupied (list[int]): The week bitmask of the half-hour slots allocated above each level, with one more for
+        complete schedules.
+        entering (bool): Whether the node at depth has been counted but not yet checked against the bound.
+        started (bool): Whether the search has counted the starting node.
+    """
+
+    def __init__(
+        self, class_count: int, path: tuple[int] = (), score: int = 0, occupied: int = 0
+    ) -> None:
+        """
+        Initialize the stack of a search below a partial schedule.
+
+        Args:
+            class_count (int): The number of classes being allocated.
+            path (tuple[int]): The candidate indices already chosen for the first classes.
+            score (int): The score of the candidates already chosen.
+            occupied (int): The week bitmask of the half-hour slots already allocated.
+        """
+        self.start = len(path)
+        self.depth = self.start
+        self.chosen = list(path) + [0] * (class_count - self.start)
+        self.cursors = [None] * class_count
+        self.scores = [0] * (class_count + 1)
+        self.scores[self.start] = score
+        self.occupied = [0] * (class_count + 1)
+        self.occupied[self.start] = occupied
+        self.entering = True
+        self.started = False
+
+    @property
+    def done(self) -> bool:
+        """Whether the search has covered every node below the starting path."""
+        return self.depth < self.start
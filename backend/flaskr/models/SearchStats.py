@@ -0,0 +1,62 @@
+class SearchStats:
+    """
+    Collects what happened during a timetable search.
+
+    Nodes, leaves and heap changes are always counted, as they cost nothing on the paths the search spends its time
+    on. Bound prunes, clash rejections and the maximum depth are only counted when detailed is set.
+
+    Attributes:
+        detailed (bool): Whether to count bound prunes, clash rejections and the maximum depth.
+        nodes (int): The number of partial schedules visited.
+        exhaustive (bool): Whether the whole search space was covered, False when the search stopped at its budget.
+        leaves (int): The number of complete schedules reached.
+        heap_insertions (int): The number of complete schedules that made it into the best schedules at the time.
+        heap_evictions (int): The number of best schedules pushed out by better ones.
+        bound_prunes (int): The number of times the bound cut off a subtree or the rest of a class's candidates.
+        clash_rejections (int): The number of candidates skipped because they clash with the partial schedule.
+        max_depth (int): The most classes allocated in any partial schedule.
+    """
+
+    COUNTERS = [
+        "nodes",
+        "leaves",
+        "heap_insertions",
+        "heap_evictions",
+        "bound_prunes",
+        "clash_rejections",
+    ]
+
+    def __init__(self, detailed: bool = False) -> None:
+        self.detailed = detailed
+        self.nodes = 0
+        self.exhaustive = True
+        self.leaves = 0
+        self.heap_insertions = 0
+        self.heap_evictions = 0
+        self.bound_prunes = 0
+        self.clash_rejections = 0
+        self.max_depth = 0
+
+    def merge(self, other: "SearchStats") -> None:
+        """Add the counts of a search over another part of the same problem, such as one search process."""
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.exhaustive = self.exhaustive and other.exhaustive
+        self.max_depth = max(self.max_depth, other.max_depth)
+
+    def as_dict(self) -> dict:
+        """
+        Get the counts as a JSON serialisable dictionary.
+
+        Returns:
+            dict: Every counter, "exhaustive", and "max_depth". The detailed counters are None unless detailed is set.
+        """
+        counts = {name: getattr(self, name) for name in self.COUNTERS}
+        counts["max_depth"] = self.max_depth
+        if not self.detailed:
+            counts.update(bound_prunes=None, clash_rejections=None, max_depth=None)
+        counts["exhaustive"] = self.exhaustive
+        return counts
+
+    def __repr__(self) -> str:
+        return f"SearchStats(nodes={self.nodes}, exhaustive={self.exhaustive}, leaves={self.leaves})"
@@ -1,4 +1,37 @@
+import functools
+
+from models.constants import DAY_INDEX, NUMBER_OF_TIME_SLOTS
+
+
 class Time:
+    """
+    Represents one time a class runs at, such as a single tutorial.
+
+    Times are created for every activity of every course converted, and are kept in the conversion memo, so they
+    use slots rather than an instance dictionary.
+
+    Attributes:
+        activity_code (str): The code of the activity (e.g., '01').
+        day (str): The day of the week the class is scheduled.
+        start_time (float): The start time of the class in military format (e.g., 13.5 for 1:30 PM).
+        duration (float): The duration of the class in hours.
+        percent_booked (int): The percentage of people that booked into the class compared to its capacity.
+        start_slot (int): The first half-hour slot of the day occupied.
+        end_slot (int): The half-hour slot after the last one occupied.
+        mask (int): The week bitmask of the half-hour slots occupied, from week_mask.
+    """
+
+    __slots__ = (
+        "activity_code",
+        "day",
+        "start_time",
+        "duration",
+        "percent_booked",
+        "start_slot",
+        "end_slot",
+        "mask",
+    )
+
     def __init__(
         self,
         activity_code: str,
@@ -8,10 +41,10 @@ class Time:
         percent_booked: int,
     ) -> None:
         """
-        Initialize a class with the activity number, day, start time, duration, and percentage booked.
+        Initialize a class with the activity code, day, start time, duration, and percentage booked.
 
         Args:
-            activity_number (int): The index of the activity in the schedule.
+            activity_code (str): The code of the activity (e.g., '01').
             day (str): The day of the week the class is scheduled.
             start_time (float): The start time of the class in military format (e.g., 13.5 for 1:30 PM).
             duration (int): The duration of the class in hours.
@@ -23,19 +56,43 @@ class Time:
         self.duration = duration
         self.percent_booked = percent_booked
 
+        # Precompiled half-hour slot range and week occupancy bitmask, so the solver can check
+        # clashes with a single AND instead of scanning the day slot by slot.
+        self.start_slot = int(start_time * 2)
+        self.end_slot = int((start_time + duration) * 2)
+        self.mask = week_mask(day, self.start_slot, self.end_slot)
+
     def __repr__(self) -> str:
-        return f"""Time(activity_number={self.activity_code}, 
-            day={self.day}, 
-            start_time={self.start_time}, 
-            duration={self.duration}, 
-            percent_booked={self.percent_booked})
-        """
+        return f"""Time(activity_code={self.activity_code}, day={self.day}, start_time={self.start_time}, duration={self.duration}, percent_booked={self.percent_booked})"""
 
     def __eq__(self, other) -> bool:
+        if not isinstance(other, Time):
+            return NotImplemented
         return (
-            self.activity_number == other.activity_number
+            self.activity_code == other.activity_code
             and self.day == other.day
             and self.start_time == other.start_time
             and self.duration == other.duration
             and self.percent_booked == other.percent_booked
         )
+
+
+@functools.lru_cache(maxsize=None)
+def week_mask(day: str, start_slot: int, end_slot: int) -> int:
+    """
+    Build the occupancy bitmask of a time range within the week.
+
+    Each weekday owns NUMBER_OF_TIME_SLOTS consecutive bits, starting from Monday at bit 0, so two
+    ranges clash exactly when their masks share a bit. There are only a few thousand ranges in a week, so masks
+    are cached and Times at the same slots share one.
+
+    Args:
+        day (str): The day of the week (one of DAYS).
+        start_slot (int): The first half-hour slot occupied.
+        end_slot (int): The half-hour slot after the last one occupied.
+
+    Returns:
+        int: The bitmask with one bit set per occupied half-hour slot.
+    """
+    offset = DAY_INDEX[day] * NUMBER_OF_TIME_SLOTS
+    return ((1 << (end_slot - start_slot)) - 1) << (offset + start_slot)
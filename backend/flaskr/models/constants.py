@@ -10,6 +10,8 @@ FRI = "Friday"
 
 DAYS = [MON, TUE, WED, THU, FRI]
 
+DAY_INDEX = {day: index for index, day in enumerate(DAYS)}
+
 JSON_TO_DAY = {
     "Mon": MON,
     "Tue": TUE,
@@ -28,6 +30,8 @@ JSON_TO_DAY2 = {
 
 NUMBER_OF_TIME_SLOTS = 48  # 24 hours * 2 (half-hour increments)
 
+CONVERSION_CACHE_SIZE = 1024  # Number of distinct start times and durations whose conversions are kept
+
 IDEAL = 4
 OKAY = 3
 BAD = 2
@@ -41,6 +45,12 @@ ALWAYS_AVAILABLE = {
 
 RETURN_FIRST_MATCH = False
 
+RECOMMENDATION_COUNT = 5  # Number of best schedules kept by the solver
+
+BUDGET_CHECK_INTERVAL = 1024  # Number of search nodes between checks of the time and node budget
+SUBTREE_CHUNKS_PER_WORKER = 4  # Number of chunks of subtrees each search process is sent in a parallel search
+PARALLEL_PROBE_NODES = 1024  # Number of nodes a parallel search visits on its own, after the heap fills, to seed the chunks
+
 JSON_TO_PREFERENCE = {
     "preferred": IDEAL,
     "default": UNAVAILABLE,
@@ -53,3 +63,8 @@ JSON_TO_RANK = {
     3: BAD,
     4: UNAVAILABLE
 }
+
+# Codes of the packed preference grid, one byte per half-hour slot from Monday 0:00 to Friday 23:30:
+# 0 for no preference, 1 to 4 for the preferred ranks of JSON_TO_RANK and PACKED_UNAVAILABLE
+PACKED_UNAVAILABLE = 5
+PACKED_GRID_SIZE = len(DAYS) * NUMBER_OF_TIME_SLOTS
@@ -1,9 +1,17 @@
+import multiprocessing
+import threading
 import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from heapq import heapify, heappop, heappush
 
 from models.Class import Class
 from models.constants import *
-from models.Time import Time
+from models.ScheduleHeap import ScheduleHeap
+from models.SearchStack import SearchStack
+from models.SearchStats import SearchStats
+from models.Time import Time, week_mask
 
 # test
 """
@@ -15,7 +23,7 @@ Course Data: A dictionary mapping course codes to a list of class types, each co
 
 Output: A dictionary mapping the course code and class type to the ideal preferences.
 
-Current algorithm: recursive backtracking to find the first valid timetable. Only takes into account the time slots.
+Current algorithm: depth-first branch and bound over an explicit stack, keeping the best scoring timetables. Only takes into account the time slots.
 """
 
 
@@ -23,6 +31,14 @@ def solve_timetable(
     time_slots: dict[list[int]],
     classes: list[Class],
     preference_levels: list[int] = STANDARD_LEVELS,
+    unavailable_slots: dict[list[bool]] = None,
+    workers: int = 1,
+    time_limit: float = None,
+    node_limit: int = None,
+    stats: SearchStats = None,
+    on_improvement: Callable[[dict], None] = None,
+    groups: list[list[tuple]] = None,
+    scores: list[list[int]] = None,
 ) -> list[dict]:
     """
     Solve the timetabling problem by finding the best fit for course classes into user preferences.
@@ -32,146 +48,797 @@ def solve_timetable(
         0 represents unavailable, 1 represents poor time, 2 represents good time, and 3 represents ideal time. The index of the list is
         the 30 minute increment of the day, starting from 00:00.
         classes (list[Class]): A list of Class objects representing each class the student must take.
+        unavailable_slots (dict, optional): A dictionary mapping days of the week to a list of booleans, True where the
+        user cannot attend. When given, no class is allocated over these slots.
+        workers (int, optional): The number of processes to split the search across. The result is the same as with one.
+        time_limit (float, optional): The number of seconds the search may run for before returning the best schedules so far.
+        node_limit (int, optional): The number of partial schedules the search may visit before returning the best schedules so far.
+        stats (SearchStats, optional): Filled with the search counters and whether the search was exhaustive.
+        on_improvement (Callable, optional): Called with each schedule, built like the returned ones, as soon as it
+        enters the best schedules found so far. A parallel search reports them as each subtree finishes.
+        groups (list[list[tuple]], optional): The footprint groups of each class from group_by_footprint, when
+        already built for another search of the same classes.
+        scores (list[list[int]], optional): The preference score of each footprint group of each class, aligned
+        with groups, such as from score_groups. When given, time_slots is not read.
 
     Returns:
         dict: A dictionary of lists where the key is the day of the week and the value is a list of strings representing the
         allocated classes in each half-hour slot, empty classes are represented by an empty string.
 
     Raises:
-        ValueError: If no valid timetable can be found or if there are classes that cannot be allocated before running the algorithm.
+        ValueError: If no valid timetable can be found or if there are classes that cannot be allocated before running the algorithm,
+        including classes whose only remaining times clash with each other, or if the budget ran out before any timetable was found.
     """
-    ideal = max(preference_levels)
+    # Score every candidate once up front, so the search only adds constants. Times of a class with the same
+    # footprint are interchangeable, so each footprint is searched once with the other times kept as backups.
+    # With hard constraints, candidates touching a slot the user marked unavailable are dropped before the search
+    if groups is None:
+        groups = [group_by_footprint(class_.times) for class_ in classes]
+    if scores is None:
+        prefix_sums = preference_prefix_sums(time_slots)
+        scores = [
+            [time_score(prefix_sums, times[0]) for times, _ in class_groups]
+            for class_groups in groups
+        ]
+    blocked = blocked_mask(unavailable_slots) if unavailable_slots else 0
+    candidates = [
+        [
+            (times, mask, score)
+            for (times, mask), score in zip(class_groups, class_scores)
+            if not mask & blocked
+        ]
+        for class_groups, class_scores in zip(groups, scores)
+    ]
+
     # Check if there are any classes that cannot be allocated
-    # trim_classes(time_slots, classes)
     invalid_classes = [
         class_.course_code + class_.subclass_type
-        for class_ in classes
-        if not class_.times
+        for class_, class_candidates in zip(classes, candidates)
+        if not class_candidates
     ]
     if invalid_classes:
         message = f"Cannot allocate: {', '.join(invalid_classes)}. No fitting time slots available."
         raise ValueError(message)
 
-    # Prune search space: order classes by number of available times (most constrained first)
-    classes.sort(key=lambda c: len(c.times))
+    propagate_forced_times(classes, candidates)
 
-    # Initialize the schedule with empty strings for each time slot
-    schedule = {day: [""] * NUMBER_OF_TIME_SLOTS for day in DAYS}
-    schedule_heap = ScheduleHeap(5)
+    # Prune search space: order classes by number of available times (most constrained first). Candidates
+    # are tried best first, so good schedules fill the heap early and the bound cuts sooner
+    order = sorted(range(len(classes)), key=lambda i: len(candidates[i]))
+    classes = [classes[i] for i in order]
+    candidates = [
+        sorted(candidates[i], key=lambda candidate: -candidate[2]) for i in order
+    ]
 
-    def backtrack(i: int, score: int, hours_remaining: int) -> bool:
-        """
-        Recursively attempts to assign class times to the schedule using backtracking.
-        Tries to find a valid arrangement of all classes without conflicts.
-        If a valid arrangement is found, it is added to the valid_schedules list.
+    best_remaining = best_remaining_scores(candidates)
+
+    budget = None
+    if time_limit is not None or node_limit is not None:
+        budget = SearchBudget(time_limit, node_limit)
+
+    def build(score: int, found: tuple[int]) -> dict:
+        return build_schedule(classes, [candidates[i][j] for i, j in enumerate(found)], score)
+
+    report = None
+    if on_improvement is not None:
+
+        def report(score: int, found: tuple[int]) -> None:
+            on_improvement(build(score, found))
+
+    if stats is None:
+        stats = SearchStats()
+    if workers > 1 and len(classes) > 1:
+        schedule_heap = parallel_search(
+            candidates, best_remaining, workers, budget, stats, report
+        )
+    else:
+        schedule_heap = ScheduleHeap(RECOMMENDATION_COUNT)
+        branch_and_bound(
+            candidates,
+            best_remaining,
+            schedule_heap,
+            budget=budget,
+            stats=stats,
+            on_improvement=report,
+        )
 
-        Args:
-            i (int): The index of the class currently being considered.
-        """
-        if i == len(classes):
-            copy = {}  # Calculate the score of the current schedule
-            copy["score"] = score
-            for day in DAYS:
-                copy[day] = schedule[day].copy()  # Copy the current schedule to output
-            schedule_heap.newEntry(score, copy)  # Add the current schedule to the heap
-            return True
+    if not schedule_heap.heap:
+        if not stats.exhaustive:
+            raise ValueError("No timetable found within the search budget.")
+        raise ValueError("No valid timetable found.")
+    return schedule_heap.getBestSchedules(build)
+
+
+def branch_and_bound(
+    candidates: list[list[tuple]],
+    best_remaining: list[int],
+    schedule_heap: ScheduleHeap,
+    path: tuple[int] = (),
+    score: int = 0,
+    occupied: int = 0,
+    shared_bound=None,
+    budget: "SearchBudget" = None,
+    stats: SearchStats = None,
+    on_improvement: Callable[[int, tuple[int]], None] = None,
+    stack: SearchStack = None,
+) -> SearchStack:
+    """
+    Search for the best schedules below a partial schedule, adding every complete schedule that improves the heap.
+
+    Complete schedules are stored as the tuple of candidate indices chosen for each class, and reach the heap in
+    depth-first order. Ties in score go to the entry added first, so the schedule found first in depth-first order
+    always wins and the result does not depend on how the search is split up.
+
+    The search runs over an explicit stack with a candidate cursor per class rather than recursing, so it costs no
+    Python call per node, has no recursion limit, and can stop at any node and pick up where it left off.
+
+    Args:
+        candidates (list[list[tuple]]): The scored (times, mask, score) candidates of each class, best first.
+        best_remaining (list[int]): The upper bound on the score each class index onwards can still add.
+        schedule_heap (ScheduleHeap): The heap of the best schedules found so far.
+        path (tuple[int]): The candidate indices already chosen for the first classes.
+        score (int): The score of the candidates already chosen.
+        occupied (int): The week bitmask of the half-hour slots already allocated.
+        shared_bound (multiprocessing.RawValue, optional): The worst score in the best schedules found by any
+        search process, used to prune subtrees that cannot make it into the merged result.
+        budget (SearchBudget, optional): The time and node budget, the search stops cleanly when it runs out.
+        stats (SearchStats, optional): Incremented with the nodes visited and the other search counters, and marked
+        not exhaustive if the budget ran out.
+        on_improvement (Callable, optional): Called with the score and candidate indices of each complete schedule
+        that enters the heap. It may raise SearchInterrupted to stop the search early.
+        stack (SearchStack, optional): The stack of an earlier search that stopped early, to resume it with the
+        same heap. The path, score and occupied arguments are ignored when given.
 
-        # IF the current schedule cannot make it onto the top 5 schedules, return False
-        if (
-            len(schedule_heap.heap) == schedule_heap.capacity
-            and score + (hours_remaining) * 2 * ideal < schedule_heap.heap[0].score
-        ):
-            return False
-
-        class_ = classes[i]
-        for time in class_.times:
-            score_added = allocate_class(schedule, time_slots, class_, time)
-            if score_added:
+    Returns:
+        SearchStack: Where the search stopped, done unless the budget ran out or the search was interrupted.
+    """
+    if stack is None:
+        stack = SearchStack(len(candidates), path, score, occupied)
+    heap = schedule_heap.heap
+    capacity = schedule_heap.capacity
+    # The lowest score kept once the heap is full, the only one bounds are compared against
+    worst = heap[0][0] if len(heap) == capacity else float("-inf")
+    insertions = schedule_heap.insertions
+    evictions = schedule_heap.evictions
+    # The detailed counters are only touched behind this flag, on the rarer prune and clash branches
+    detailed = stats is not None and stats.detailed
+    nodes = leaves = bound_prunes = clash_rejections = 0
+    max_depth = stack.depth
+
+    last = len(candidates) - 1
+    start = stack.start
+    chosen = stack.chosen
+    cursors = stack.cursors
+    scores = stack.scores
+    occupieds = stack.occupied
+    i = stack.depth
+    entering = stack.entering
+    if not stack.started:
+        stack.started = True
+        nodes += 1  # The starting node, later nodes are counted as the search steps down to them
+
+    try:
+        if budget is not None and budget.spent():
+            raise SearchInterrupted()
+
+        if entering:
+            # Only the starting node, or the node an earlier search stopped at, is checked here. Every other node is
+            # checked as its class's candidates are tried below, without stepping down to it
+            entering = False
+            if detailed and i > max_depth:
+                max_depth = i
+            if i > last:
+                leaves += 1
+                score = scores[i]
+                found = tuple(chosen)
+                added = schedule_heap.newEntry(score, found)
+                if added and len(heap) == capacity:
+                    worst = heap[0][0]
+                    if shared_bound is not None and worst > shared_bound.value:
+                        shared_bound.value = worst
+                # Step back up before reporting, so an interrupted search resumes after this schedule
+                i = start - 1 if RETURN_FIRST_MATCH else i - 1
+                if added and on_improvement is not None:
+                    on_improvement(score, found)
+            elif scores[i] + best_remaining[i] <= worst or (
+                shared_bound is not None
+                and scores[i] + best_remaining[i] < shared_bound.value
+            ):
+                if detailed:
+                    bound_prunes += 1
+                i -= 1
+            else:
+                cursors[i] = enumerate(candidates[i])
+
+        while i >= start:
+            score = scores[i]
+            occupied = occupieds[i]
+            remaining = best_remaining[i + 1]
+            # A candidate must add more than this to beat the heap
+            limit = worst - score - remaining
+            for j, (_, mask, time_added) in cursors[i]:
+                if occupied & mask:
+                    if detailed:
+                        clash_rejections += 1
+                    continue  # Clashes with a class that is already allocated
+
+                # Candidates are sorted by score, so once one cannot beat the heap none of the rest can
+                if time_added <= limit:
+                    if detailed:
+                        bound_prunes += 1
+                    i -= 1
+                    break
+
+                chosen[i] = j
+                nodes += 1
+                if detailed and i >= max_depth:
+                    max_depth = i + 1
+                if budget is not None and not nodes % BUDGET_CHECK_INTERVAL:
+                    try:
+                        budget.charge(BUDGET_CHECK_INTERVAL)
+                    except SearchInterrupted:
+                        # Stop at the node just counted, so resuming carries on from it
+                        scores[i + 1] = score + time_added
+                        occupieds[i + 1] = occupied | mask
+                        i += 1
+                        entering = True
+                        raise
+
+                if i == last:
+                    # Add the complete schedule to the heap
+                    leaves += 1
+                    found = tuple(chosen)
+                    added = schedule_heap.newEntry(score + time_added, found)
+                    if added and len(heap) == capacity:
+                        worst = heap[0][0]
+                        limit = worst - score
+                        if shared_bound is not None and worst > shared_bound.value:
+                            shared_bound.value = worst
+                    if RETURN_FIRST_MATCH:
+                        i = start - 1
+                    if added and on_improvement is not None:
+                        on_improvement(score + time_added, found)
+                    if RETURN_FIRST_MATCH:
+                        break
+                    continue
+
+                # Schedules from other processes may come earlier in depth-first order, so only a strictly lower
+                # bound is safe
                 if (
-                    backtrack(
-                        i + 1, score + score_added, hours_remaining - time.duration
-                    )
-                    and RETURN_FIRST_MATCH
+                    shared_bound is not None
+                    and score + time_added + remaining < shared_bound.value
                 ):
-                    return True
-                deallocate_class(
-                    schedule, class_, time
-                )  # Backtrack by removing the class from the schedule
+                    if detailed:
+                        bound_prunes += 1
+                    continue
+
+                # Step down to the next class
+                i += 1
+                scores[i] = score + time_added
+                occupieds[i] = occupied | mask
+                cursors[i] = enumerate(candidates[i])
+                break
+            else:
+                i -= 1  # Every candidate of class i has been tried
+    except SearchInterrupted:
+        if stats is not None:
+            stats.exhaustive = False
+    finally:
+        stack.depth = i
+        stack.entering = entering
+
+    if stats is not None:
+        stats.nodes += nodes
+        stats.leaves += leaves
+        stats.heap_insertions += schedule_heap.insertions - insertions
+        stats.heap_evictions += schedule_heap.evictions - evictions
+        if detailed:
+            stats.bound_prunes += bound_prunes
+            stats.clash_rejections += clash_rejections
+            stats.max_depth = max(stats.max_depth, max_depth)
+    return stack
+
+
+def split_search(
+    candidates: list[list[tuple]], depth: int
+) -> list[tuple[tuple[int], int, int]]:
+    """
+    Enumerate the clash-free partial schedules of the first classes, in depth-first order.
+
+    Args:
+        candidates (list[list[tuple]]): The scored (times, mask, score) candidates of each class.
+        depth (int): The number of classes to allocate in each partial schedule.
+
+    Returns:
+        list[tuple]: A (path, score, occupied) starting point for each subtree of the search.
+    """
+    subtrees = [((), 0, 0)]
+    for i in range(depth):
+        subtrees = [
+            (path + (j,), score + time_added, occupied | mask)
+            for path, score, occupied in subtrees
+            for j, (_, mask, time_added) in enumerate(candidates[i])
+            if not occupied & mask
+        ]
+    return subtrees
+
+
+def parallel_search(
+    candidates: list[list[tuple]],
+    best_remaining: list[int],
+    workers: int,
+    budget: "SearchBudget" = None,
+    stats: SearchStats = None,
+    on_improvement: Callable[[int, tuple[int]], None] = None,
+) -> ScheduleHeap:
+    """
+    Search the subtrees below the first classes in a pool of processes and merge their best schedules.
+
+    The first class is split on its own when it has enough candidates to keep every process busy, otherwise the
+    first two are, and the subtrees are searched in chunks of consecutive ones, each keeping one heap.
+
+    Before any chunk starts, the search runs here in depth-first order until the heap is full and for
+    PARALLEL_PROBE_NODES nodes more. Every chunk's heap is seeded with those of its schedules that come before the
+    chunk's first subtree, and with the best schedules of the chunks merged so far. Seeds all come earlier in
+    depth-first order, so they win ties and the chunk can prune against them like a single process search would.
+    Processes also share the worst score of the best schedules found so far, and the merged result is identical to
+    a single process search. The pool is the long-lived one from search_pool, which runs one search at a time.
+
+    Args:
+        candidates (list[list[tuple]]): The scored (times, mask, score) candidates of each class, best first.
+        best_remaining (list[int]): The upper bound on the score each class index onwards can still add.
+        workers (int): The number of processes to search with.
+        budget (SearchBudget, optional): The time and node budget shared by all processes.
+        stats (SearchStats, optional): Incremented with the counters of all processes.
+        on_improvement (Callable, optional): Called with the score and candidate indices of each schedule that enters
+        the merged heap, as the chunks finish in order.
+
+    Returns:
+        ScheduleHeap: The heap of the best schedules found by any process.
+    """
+    detailed = stats is not None and stats.detailed
+    probe = ScheduleHeap(RECOMMENDATION_COUNT)
+    probe_stats = SearchStats(detailed)
+
+    def stop_once_full(score: int, found: tuple[int]) -> None:
+        if len(probe.heap) == probe.capacity:
+            raise SearchInterrupted()
+
+    stack = branch_and_bound(
+        candidates, best_remaining, probe, budget=budget, stats=probe_stats, on_improvement=stop_once_full
+    )
+    if not stack.done and not (budget is not None and budget.spent()):
+        # Carry on a little further, so the seeds give a tighter bound
+        probe_budget = SearchBudget(None, PARALLEL_PROBE_NODES)
+        if budget is not None:
+            probe_budget.deadline = budget.deadline
+        branch_and_bound(
+            candidates, best_remaining, probe, budget=probe_budget, stats=probe_stats, stack=stack
+        )
+        if budget is not None:
+            budget.nodes += probe_budget.nodes
+    if stack.done or (budget is not None and budget.spent()):
+        # The whole search, or all the budget allowed, fitted in the probe
+        if stats is not None:
+            stats.merge(probe_stats)
+        if on_improvement is not None:
+            for score, found in sorted(probe.getBestEntries(), key=lambda entry: entry[1]):
+                on_improvement(score, found)
+        return probe
+    probe_stats.exhaustive = True  # Stopped on purpose, the chunks search the rest
+    if stats is not None:
+        stats.merge(probe_stats)
+    seed = probe.getBestEntries()
+
+    depth = 1 if len(candidates[0]) >= 2 * workers else min(2, len(candidates))
+    subtrees = split_search(candidates, depth)
+
+    # Processes only need the masks and scores, the times stay behind to build the final schedules. The problem is
+    # sent with each chunk of consecutive subtrees, a few per process so a slow chunk does not hold up the rest
+    problem = (
+        [
+            [(None, mask, time_added) for _, mask, time_added in class_candidates]
+            for class_candidates in candidates
+        ],
+        best_remaining,
+        budget,
+        detailed,
+    )
+    chunk_count = min(len(subtrees), workers * SUBTREE_CHUNKS_PER_WORKER)
+    chunks = [
+        subtrees[len(subtrees) * i // chunk_count : len(subtrees) * (i + 1) // chunk_count]
+        for i in range(chunk_count)
+    ]
+
+    pool = search_pool(workers)
+    with pool.lock:
+        pool.shared_bound.value = seed[-1][0] if len(seed) == probe.capacity else -1
+        pool.shared_nodes.value = budget.nodes if budget is not None else 0
+        schedule_heap = ScheduleHeap(RECOMMENDATION_COUNT)
+        futures = []
+        merged = 0
+        broken = False
+        try:
+            while merged < len(chunks):
+                # Chunks are started as processes free up. The first chunk holds the probe's schedules and finds
+                # them again, every later one is seeded with them and the best schedules merged so far, which all
+                # come from earlier chunks and so win ties against the chunk's own
+                while len(futures) < len(chunks) and len(futures) - merged < workers:
+                    # Only schedules before the chunk's first subtree in depth-first order may seed it
+                    first = chunks[len(futures)][0][0]
+                    chunk_seed = best_of(
+                        [entry for entry in seed if entry[1][: len(first)] < first]
+                        + schedule_heap.getBestEntries()
+                    )
+                    futures.append(
+                        pool.executor.submit(search_subtrees, problem, chunks[len(futures)], chunk_seed)
+                    )
+                wait(futures[merged:], return_when=FIRST_COMPLETED)
+
+                # Chunks are merged in depth-first order, adding each one's schedules in index order, so ties go
+                # to the schedule a single process would have found first
+                while merged < len(futures) and futures[merged].done():
+                    entries, chunk_stats = futures[merged].result()
+                    merged += 1
+                    for score, found in sorted(entries, key=lambda entry: entry[1]):
+                        if schedule_heap.newEntry(score, found) and on_improvement is not None:
+                            on_improvement(score, found)
+                    if stats is not None:
+                        stats.merge(chunk_stats)
+        except BrokenProcessPool:
+            # A search process died, such as from running out of memory. The pool is replaced for later searches
+            discard_search_pool(workers, pool)
+            broken = True
+        finally:
+            # The next search resets the shared values, so none of this search's chunks may still be running
+            for future in futures:
+                future.cancel()
+            wait(futures)
+
+    if broken:
+        # The chunks not merged yet all come after the merged ones, so searching them here in order with the merged
+        # heap finishes the search as a single process would
+        if budget is not None:
+            budget.nodes = pool.shared_nodes.value
+        for chunk in chunks[merged:]:
+            for path, score, occupied in chunk:
+                branch_and_bound(
+                    candidates,
+                    best_remaining,
+                    schedule_heap,
+                    path,
+                    score,
+                    occupied,
+                    budget=budget,
+                    stats=stats,
+                    on_improvement=on_improvement,
+                )
+    return schedule_heap
+
+
+def best_of(entries: list[tuple[int, tuple[int]]]) -> list[tuple[int, tuple[int]]]:
+    """Keep the best RECOMMENDATION_COUNT distinct (score, path) entries, ties going to the earlier path."""
+    heap = ScheduleHeap(RECOMMENDATION_COUNT)
+    for score, found in sorted(set(entries), key=lambda entry: entry[1]):
+        heap.newEntry(score, found)
+    return heap.getBestEntries()
+
+
+class SearchPool:
+    """
+    A pool of search processes kept for the life of the server, so searches do not pay to start processes.
+
+    Attributes:
+        executor (ProcessPoolExecutor): The processes.
+        shared_bound (multiprocessing.RawValue): The worst score in the best schedules found by any process.
+        shared_nodes (multiprocessing.Value): The nodes charged by all processes, for a search with a node limit.
+        lock (threading.Lock): Held by the search using the pool, as the shared values belong to one search.
+    """
+
+    def __init__(self, workers: int) -> None:
+        context = multiprocessing.get_context(
+            "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+        )
+        self.shared_bound = context.RawValue("q", -1)
+        self.shared_nodes = context.Value("q", 0)
+        self.lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=init_search_worker,
+            initargs=(self.shared_bound, self.shared_nodes),
+        )
+        # Start the processes now rather than on the first search
+        wait([self.executor.submit(int) for _ in range(workers)])
+
+
+# The long-lived search pools by number of processes, see search_pool
+_search_pools = {}
+_search_pools_lock = threading.Lock()
+
+
+def search_pool(workers: int) -> SearchPool:
+    """
+    Get the pool of search processes of a size, starting it on first use, or again after a search found it broken.
+
+    Servers should call this at startup, before starting any threads, so the processes are not forked from a
+    process with other threads running.
+    """
+    with _search_pools_lock:
+        pool = _search_pools.get(workers)
+        if pool is None:
+            pool = _search_pools[workers] = SearchPool(workers)
+        return pool
+
+
+def discard_search_pool(workers: int, pool: SearchPool) -> None:
+    """Stop using a broken pool of search processes, so the next search_pool call starts a new one."""
+    with _search_pools_lock:
+        if _search_pools.get(workers) is pool:
+            del _search_pools[workers]
+    pool.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# The values shared by the search processes of a pool, set once when each process starts
+_worker_shared = None
+
+
+def init_search_worker(shared_bound, shared_nodes) -> None:
+    """Store the values shared by a pool's processes in each of them, as they can only be passed when it starts."""
+    global _worker_shared
+    _worker_shared = (shared_bound, shared_nodes)
+
+
+def search_subtrees(
+    problem: tuple, subtrees: list[tuple[tuple[int], int, int]], seed: list[tuple[int, tuple[int]]]
+) -> tuple[list, SearchStats]:
+    """
+    Search a chunk of consecutive subtrees of one problem in a search process, keeping one heap across them.
 
+    Args:
+        problem (tuple): The candidates, best_remaining, budget and whether to count detailed stats.
+        subtrees (list[tuple]): The (path, score, occupied) starting points, from split_search, in depth-first order.
+        seed (list[tuple]): The (score, path) of the best schedules of earlier chunks, added to the heap first.
+
+    Returns:
+        tuple: The (score, path) of the chunk's own best schedules, and the counters of the search, including
+        whether the chunk was searched exhaustively.
+    """
+    candidates, best_remaining, budget, detailed = problem
+    shared_bound, shared_nodes = _worker_shared
+    if budget is not None:
+        budget.shared_nodes = shared_nodes
+
+    schedule_heap = ScheduleHeap(RECOMMENDATION_COUNT)
+    for score, found in sorted(seed, key=lambda entry: entry[1]):
+        schedule_heap.newEntry(score, found)
+    stats = SearchStats(detailed)
+    for path, score, occupied in subtrees:
+        branch_and_bound(
+            candidates,
+            best_remaining,
+            schedule_heap,
+            path,
+            score,
+            occupied,
+            shared_bound,
+            budget,
+            stats,
+        )
+
+    seeded = {found for _, found in seed}
+    entries = [entry for entry in schedule_heap.getBestEntries() if entry[1] not in seeded]
+    return entries, stats
+
+
+class SearchInterrupted(Exception):
+    """Raised inside the search to unwind it when the budget runs out."""
+
+
+class SearchBudget:
+    """
+    A limit on how long a search may run, by wall-clock time and by the number of nodes visited.
+
+    Attributes:
+        deadline (float): The time.monotonic() value the search must stop by, None for no time limit.
+        node_limit (int): The number of nodes the search may visit, None for no node limit.
+        nodes (int): The number of nodes charged so far in this process.
+        shared_nodes (multiprocessing.Value): The nodes charged by all search processes, when the search is split up.
+    """
+
+    def __init__(self, time_limit: float = None, node_limit: int = None) -> None:
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.shared_nodes = None
+
+    def spent(self) -> bool:
+        """Check whether the budget has run out."""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        if self.node_limit is not None:
+            nodes = self.nodes if self.shared_nodes is None else self.shared_nodes.value
+            return nodes >= self.node_limit
         return False
 
-    backtrack(0, 0, total_time(classes))
-    if not schedule_heap.heap:
-        raise ValueError("No valid timetable found.")
-    return schedule_heap.getBestSchedules()
+    def charge(self, nodes: int) -> None:
+        """
+        Record nodes visited by the search.
 
+        Raises:
+            SearchInterrupted: If the budget has run out.
+        """
+        if self.shared_nodes is None:
+            self.nodes += nodes
+        else:
+            with self.shared_nodes.get_lock():
+                self.shared_nodes.value += nodes
+        if self.spent():
+            raise SearchInterrupted()
+
+
+def group_by_footprint(times: list[Time]) -> list[tuple[tuple[Time], int]]:
+    """
+    Group the times of a class that occupy exactly the same half-hour slots.
 
-def total_time(classes: list[Class]) -> int:
-    """Calculate the total time required for all classes."""
-    return sum([class_.times[0].duration for class_ in classes])
+    Parallel activities (e.g. tutorials in different rooms at the same time) produce the same timetable, so
+    the search only needs to try one of them.
 
+    Args:
+        times (list[Time]): The times of a class.
 
-def trim_classes(time_slots: dict[list[int]], classes: list[Class]) -> None:
+    Returns:
+        list[tuple]: A (times, mask) pair per distinct footprint, in order of first appearance. The first time of
+        each group is the one allocated, the rest are its backups.
     """
-    Remove all classes at times that the useer marked as unavailable.
+    groups = {}
+    for time in times:
+        groups.setdefault(time.mask, []).append(time)
+    return [(tuple(group), mask) for mask, group in groups.items()]
+
+
+def blocked_mask(unavailable_slots: dict[list[bool]]) -> int:
+    """Build the week bitmask of the half-hour slots the user cannot attend."""
+    mask = 0
+    for day in DAYS:
+        for slot, unavailable in enumerate(unavailable_slots[day]):
+            if unavailable:
+                mask |= week_mask(day, slot, slot + 1)
+    return mask
+
+
+def propagate_forced_times(classes: list[Class], candidates: list[list[tuple]]) -> None:
     """
-    for class_ in classes:
-        working_times = []
-        for time in class_.times:
-            start_time = int(time.start_time) * 2  # Convert to half-hour increments
-            end_time = int(
-                (time.start_time + time.duration) * 2
-            )  # Convert to half-hour increments
+    Remove candidates that clash with a class that has only one time left, until nothing changes.
 
-            if sum(time_slots[time.day][start_time:end_time]) > 0:
-                working_times.append(time)
-        class_.times = working_times
+    A class with a single candidate must take that time, so no other class can use a clashing time. Removing
+    those can leave further classes with a single candidate, which are propagated in turn.
 
+    Args:
+        classes (list[Class]): The classes being allocated.
+        candidates (list[list[tuple]]): The scored (time, mask, score) candidates of each class, updated in place.
 
-def allocate_class(
-    schedule: dict, time_slots: dict[list[int]], class_: Class, time: Time
-) -> int:
-    """ "
-    Attempt to allocate a class to the schedule. Returns the increase in score if successful, otherwise returns 0.
+    Raises:
+        ValueError: If propagation leaves a class without any candidate, naming the class and the forced class it clashes with.
+    """
+    propagated = set()
+    changed = True
+    while changed:
+        changed = False
+        for i, class_candidates in enumerate(candidates):
+            if len(class_candidates) != 1 or i in propagated:
+                continue
+            propagated.add(i)
+
+            forced_mask = class_candidates[0][1]
+            for j, other_candidates in enumerate(candidates):
+                if j == i:
+                    continue
+                remaining = [
+                    candidate
+                    for candidate in other_candidates
+                    if not candidate[1] & forced_mask
+                ]
+                if not remaining:
+                    forced = classes[i].course_code + classes[i].subclass_type
+                    blocked = classes[j].course_code + classes[j].subclass_type
+                    message = f"Cannot allocate: {blocked}. Every available time clashes with {forced}, which has only one available time."
+                    raise ValueError(message)
+                if len(remaining) != len(other_candidates):
+                    candidates[j] = remaining
+                    changed = True
+
+
+def best_remaining_scores(candidates: list[list[tuple]]) -> list[int]:
+    """
+    Calculate an upper bound on the score the classes from each index onwards can still add.
+
+    The bound for index i is the sum of the best candidate score of every class from i onwards, ignoring
+    clashes between them, so it never underestimates what a complete schedule can reach.
+
+    Args:
+        candidates (list[list[tuple]]): The scored (time, mask, score) candidates of each class.
+
+    Returns:
+        list[int]: The bound for every class index, with a trailing 0 for the completed schedule.
+    """
+    best_remaining = [0] * (len(candidates) + 1)
+    for i in range(len(candidates) - 1, -1, -1):
+        best_remaining[i] = best_remaining[i + 1] + max(
+            candidate[2] for candidate in candidates[i]
+        )
+    return best_remaining
+
+
+def preference_prefix_sums(time_slots: dict[list[int]]) -> dict[list[int]]:
+    """
+    Build the prefix sums of the preference grid for each day.
+
+    Args:
+        time_slots (dict): A dictionary mapping days of the week to a list of time slot preferences.
+
+    Returns:
+        dict: A dictionary mapping days of the week to a list of NUMBER_OF_TIME_SLOTS + 1 running totals,
+        where index n holds the sum of the first n time slots of that day.
+    """
+    prefix_sums = {}
+    for day in DAYS:
+        running_total = 0
+        day_sums = [0]
+        for preference in time_slots[day]:
+            running_total += preference
+            day_sums.append(running_total)
+        prefix_sums[day] = day_sums
+    return prefix_sums
+
+
+def time_score(prefix_sums: dict[list[int]], time: Time) -> int:
+    """Calculate the preference score of the half-hour slots covered by a class time."""
+    day_sums = prefix_sums[time.day]
+    return day_sums[time.end_slot] - day_sums[time.start_slot]
+
+
+def build_schedule(classes: list[Class], chosen: tuple[tuple], score: int) -> dict:
+    """
+    Build the labelled schedule for a chosen candidate of each class.
 
     Args:
-        schedule (dict): The current schedule to which the class is being allocated.
-        class_ (Class): The class to be allocated.
-        time (Time): The time slot for the class.
-    """
-    day = time.day
-    start_time = int(time.start_time) * 2  # Convert to half-hour increments
-    end_time = int(
-        (time.start_time + time.duration) * 2
-    )  # Convert to half-hour increments
-    score = 0
-
-    for slot in range(start_time, end_time):
-        if schedule[day][slot] != "":
-            return 0
-
-    # If all slots are available, allocate the class
-    for slot in range(start_time, end_time):
-        schedule[day][
-            slot
-        ] = f"{class_.course_code} {class_.subclass_type} {time.activity_code}"
-        score += time_slots[day][
-            slot
-        ]  # Add the score of the time slot to the total score
-
-    return score  # Successfully allocated the class
-
-
-def deallocate_class(schedule: dict, class_: Class, time: Time) -> None:
-    """Deallocate a class from the schedule."""
-    day = time.day
-    start_time = int(time.start_time) * 2
-    end_time = int(
-        (time.start_time + time.duration) * 2
-    )  # Convert to half-hour increments
-
-    for slot in range(start_time, end_time):
-        schedule[day][slot] = ""  # Remove the class from the schedule
+        classes (list[Class]): The classes in the order they were allocated.
+        chosen (tuple[tuple]): The (times, mask, score) candidate chosen for each class, aligned with classes.
+        score (int): The score of the schedule.
+
+    Returns:
+        dict: A dictionary of lists where the key is the day of the week and the value is a list of strings
+        representing the allocated classes in each half-hour slot, along with the "score" of the schedule, the
+        "backups" mapping each "COURSE SUBCLASS" to the activity codes running at the same time, and the
+        "assignments" as (course_code, subclass_type, activity_code, day, start_slot, end_slot, backups) tuples.
+    """
+    schedule = {"score": score, "backups": {}, "assignments": []}
+    for day in DAYS:
+        schedule[day] = [""] * NUMBER_OF_TIME_SLOTS
+
+    for class_, (times, _, _) in zip(classes, chosen):
+        time = times[0]
+        label = f"{class_.course_code} {class_.subclass_type} {time.activity_code}"
+        for slot in range(time.start_slot, time.end_slot):
+            schedule[time.day][slot] = label
+
+        backups = [backup.activity_code for backup in times[1:]]
+        if backups:
+            schedule["backups"][f"{class_.course_code} {class_.subclass_type}"] = backups
+        schedule["assignments"].append(
+            (
+                class_.course_code,
+                class_.subclass_type,
+                time.activity_code,
+                time.day,
+                time.start_slot,
+                time.end_slot,
+                backups,
+            )
+        )
+
+    return schedule
 
 
 def print_schedule(schedule: dict) -> None:
@@ -0,0 +1,60 @@
+import numpy as np
+from models.constants import *
+
+# Bytes needed to hold a week bitmask of every weekday's half-hour slots
+MASK_BYTES = (len(DAYS) * NUMBER_OF_TIME_SLOTS + 7) // 8
+
+
+def incidence_matrix(groups: list[list[tuple]]) -> np.ndarray:
+    """
+    Build the matrix of which half-hour slots each footprint group covers.
+
+    Args:
+        groups (list[list[tuple]]): The (times, mask) footprint groups of each class, from group_by_footprint.
+
+    Returns:
+        np.ndarray: A (groups, weekdays * NUMBER_OF_TIME_SLOTS) matrix of 0 and 1, one row per group in class order,
+        with the columns in the bit order of the week masks.
+    """
+    masks = b"".join(
+        mask.to_bytes(MASK_BYTES, "little")
+        for class_groups in groups
+        for _, mask in class_groups
+    )
+    bits = np.unpackbits(
+        np.frombuffer(masks, dtype=np.uint8).reshape(-1, MASK_BYTES),
+        axis=1,
+        bitorder="little",
+    )
+    return bits[:, : len(DAYS) * NUMBER_OF_TIME_SLOTS]
+
+
+def score_groups(
+    groups: list[list[tuple]], grids: list[dict[list[int]]]
+) -> list[list[list[int]]]:
+    """
+    Score every footprint group of every class against several preference grids at once.
+
+    The incidence matrix is built once and multiplied by all the grids in one step, so scoring N grids costs little
+    more than scoring one.
+
+    Args:
+        groups (list[list[tuple]]): The (times, mask) footprint groups of each class, from group_by_footprint.
+        grids (list[dict]): The preference grids, each mapping days of the week to NUMBER_OF_TIME_SLOTS levels.
+
+    Returns:
+        list[list[list[int]]]: For each grid, the score of each group of each class, to pass to solve_timetable.
+    """
+    matrix = incidence_matrix(groups)
+    levels = np.array(
+        [[level for day in DAYS for level in grid[day]] for grid in grids],
+        dtype=np.int64,
+    )
+    totals = levels @ matrix.T.astype(np.int64)
+
+    # Split each grid's row of group scores back into classes
+    bounds = np.cumsum([0] + [len(class_groups) for class_groups in groups])
+    return [
+        [row[start:end].tolist() for start, end in zip(bounds[:-1], bounds[1:])]
+        for row in totals
+    ]
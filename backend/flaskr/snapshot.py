@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import time
+
+from cache import BASE_DIR, SQLiteStore
+
+# The local catalog of course timetables, loaded from upstream dumps with manage.py
+SNAPSHOT_PATH = os.environ.get(
+    "SNAPSHOT_PATH", os.path.join(BASE_DIR, "snapshot.sqlite3")
+)
+# How old a snapshot may get before course_details refreshes it from upstream, "inf" to never refresh
+SNAPSHOT_MAX_AGE = float(os.environ.get("SNAPSHOT_MAX_AGE", 24 * 60 * 60))
+
+# The only activity fields parse_course_timetable reads
+SNAPSHOT_ACTIVITY_FIELDS = [
+    "activity_code",
+    "day_of_week",
+    "start_time",
+    "duration",
+    "availability",
+]
+
+
+def compact_course_timetable(course_json: dict) -> dict:
+    """
+    Strip an upstream timetable response down to the fields needed to recommend timetables.
+
+    Args:
+        course_json (dict): The upstream response, mapping subject codes (e.g. "MATH1051_S2_STLUC_IN") to subjects.
+
+    Returns:
+        dict: The same subject codes and activity keys, with only SNAPSHOT_ACTIVITY_FIELDS kept for each activity.
+    """
+    return {
+        subject_code: {
+            "activities": {
+                key: {field: activity[field] for field in SNAPSHOT_ACTIVITY_FIELDS}
+                for key, activity in subject["activities"].items()
+            }
+        }
+        for subject_code, subject in course_json.items()
+    }
+
+
+class CatalogSnapshot(SQLiteStore):
+    """
+    A local copy of upstream course timetables, keyed by course code, semester and campus.
+
+    Attributes:
+        path (str): The SQLite database file.
+    """
+
+    def create_tables(self, connection: sqlite3.Connection) -> None:
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS course_snapshots (
+                course_code TEXT NOT NULL,
+                semester TEXT NOT NULL,
+                campus TEXT NOT NULL,
+                timetable TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (course_code, semester, campus)
+            )"""
+        )
+
+    def get(self, course_code: str, semester: str, campus: str) -> tuple[dict, float]:
+        """
+        Look up a course's timetable.
+
+        Returns:
+            tuple: The compact timetable and the time it was fetched, or None if the course is not in the snapshot.
+        """
+        row = (
+            self._connection()
+            .execute(
+                """SELECT timetable, fetched_at FROM course_snapshots
+                WHERE course_code = ? AND semester = ? AND campus = ?""",
+                (course_code.upper(), semester, campus),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(
+        self,
+        course_code: str,
+        semester: str,
+        campus: str,
+        course_json: dict,
+        fetched_at: float = None,
+    ) -> None:
+        """Store a course's timetable, keeping only the fields needed to recommend timetables."""
+        self._connection().execute(
+            """INSERT OR REPLACE INTO course_snapshots (course_code, semester, campus, timetable, fetched_at)
+            VALUES (?, ?, ?, ?, ?)""",
+            (
+                course_code.upper(),
+                semester,
+                campus,
+                json.dumps(compact_course_timetable(course_json), separators=(",", ":")),
+                time.time() if fetched_at is None else fetched_at,
+            ),
+        )
+
+    def ingest(self, dump: dict, fetched_at: float = None) -> list[tuple[str, str, str]]:
+        """
+        Load an upstream dump covering any number of courses, such as a whole semester and campus.
+
+        Subjects are grouped by their course code, semester and campus, so each course is stored as upstream would
+        answer a lookup for it.
+
+        Args:
+            dump (dict): Upstream subjects keyed by subject code, each with "callista_code", "semester" and "campus".
+            fetched_at (float, optional): When the dump was taken, defaults to now.
+
+        Returns:
+            list[tuple]: The (course_code, semester, campus) of every course stored.
+        """
+        courses = {}
+        for subject_code, subject in dump.items():
+            key = (subject["callista_code"], subject["semester"], subject["campus"])
+            courses.setdefault(key, {})[subject_code] = subject
+
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            for (course_code, semester, campus), course_json in courses.items():
+                self.put(course_code, semester, campus, course_json, fetched_at)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return list(courses)
+
+    def courses(self, semester: str, campus: str) -> list[str]:
+        """List the course codes stored for a semester and campus."""
+        return [
+            row[0]
+            for row in self._connection().execute(
+                """SELECT course_code FROM course_snapshots WHERE semester = ? AND campus = ?
+                ORDER BY course_code""",
+                (semester, campus),
+            )
+        ]
+
+
+catalog_snapshot = CatalogSnapshot(SNAPSHOT_PATH)
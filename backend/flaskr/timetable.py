@@ -1,16 +1,79 @@
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
 import time
 
+import requests
+from cache import CACHE_PATH, MemoryCache, SQLiteCache
 from conversion import (
     convertForAlgorithmCourses,
     convertForAlgorithmTimeSlots,
+    convertForAlgorithmUnavailableSlots,
+    convertPackedPreferences,
+    convertTimetablesToCompact,
     convertTimetableToGrid,
+    decodePackedPreferences,
+    packPreferenceLevels,
 )
-from course_interface import course_details
-from flask import Blueprint, request
-from recommendation.algorithm import solve_timetable
+from course_interface import course_details_many
+from flask import Blueprint, Response, request
+from metrics import COUNT_BUCKETS, Metrics
+from models.Class import Class
+from models.SearchStats import SearchStats
+from recommendation.algorithm import (
+    SearchInterrupted,
+    group_by_footprint,
+    search_pool,
+    solve_timetable,
+)
+from recommendation.batch import score_groups
+
+try:
+    import orjson
+except ImportError:  # The standard library serialises compact responses too, just several times slower
+    orjson = None
 
 timetable_api = Blueprint("timetable", __name__)
 
+# Number of processes each recommendation search is split across
+SOLVER_WORKERS = int(os.environ.get("SOLVER_WORKERS", 1))
+if SOLVER_WORKERS > 1:
+    # Start the search processes while the server process has no other threads, as each server worker imports the
+    # app. With gunicorn's --preload they would be started in the master and not survive its fork
+    search_pool(SOLVER_WORKERS)
+# Longest a recommendation search may run for, requests can only ask for less
+SOLVER_TIME_LIMIT = float(os.environ.get("SOLVER_TIME_LIMIT", 5.0))
+
+# Converted classes per course, so repeat recommendations skip fetching and parsing. Entries expire well within
+# the course cache's time to live, so course data changes are picked up soon after they are fetched
+CONVERSION_MEMO_TTL = float(os.environ.get("CONVERSION_MEMO_TTL", 15 * 60))
+CONVERSION_MEMO_SIZE = int(os.environ.get("CONVERSION_MEMO_SIZE", 500))
+course_classes_memo = MemoryCache(CONVERSION_MEMO_SIZE, CONVERSION_MEMO_TTL)
+
+# Finished recommendations keyed by a hash of the normalised request and the course data it was solved on, so
+# identical requests skip the search and any change to a course's times gives new keys
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 6 * 60 * 60))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 5000))
+result_cache = SQLiteCache(
+    CACHE_PATH, "recommendations", RESULT_CACHE_SIZE, RESULT_CACHE_TTL
+)
+
+# Most preference profiles a batch recommendation may compare, and the search time they share
+BATCH_MAX_PROFILES = int(os.environ.get("BATCH_MAX_PROFILES", 20))
+BATCH_TIME_LIMIT = float(os.environ.get("BATCH_TIME_LIMIT", 30.0))
+
+# Responses at least this many bytes are gzipped for clients that accept it
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", 1024))
+GZIP_LEVEL = 6
+
+# Whether every search counts bound prunes, clash rejections and depth for the metrics, not just debug requests
+SEARCH_COUNTERS = os.environ.get("SEARCH_COUNTERS", "0") == "1"
+# Histograms of stage timings and search counters of recent recommendations in this process
+recommend_metrics = Metrics()
+
 
 def parse_course_timetable(course_json, course_code):
     course_key = next(iter(course_json))
@@ -35,6 +98,384 @@ def parse_course_timetable(course_json, course_code):
     return course_activities
 
 
+def classes_fingerprint(classes: list[Class]) -> str:
+    """
+    Hash the parts of converted classes that recommendations depend on.
+
+    Args:
+        classes (list[Class]): The classes of one or more courses.
+
+    Returns:
+        str: A hex digest that changes whenever an activity is added, removed or moved.
+    """
+    digest = hashlib.sha256()
+    for class_ in classes:
+        digest.update(f"{class_.course_code}|{class_.subclass_type}\n".encode())
+        for time_ in class_.times:
+            digest.update(
+                f"{time_.activity_code}|{time_.day}|{time_.start_time}|{time_.duration}\n".encode()
+            )
+    return digest.hexdigest()
+
+
+def course_classes(
+    course_codes, options, attend_lectures, timings: dict = None
+) -> tuple[list[Class], str]:
+    """
+    Get the classes of several courses ready for the recommendation algorithm.
+
+    The classes of each (course, semester, campus, attend_lectures) are memoized with their fingerprint, so only
+    courses that have not been converted recently are fetched, parsed and converted. The returned classes are shared
+    between requests and must not be modified.
+
+    Args:
+        course_codes (list[str]): The course codes to convert.
+        options (dict): The "semester" and "location" to look the courses up in.
+        attend_lectures (bool): Whether lectures are included.
+        timings (dict, optional): Incremented with the seconds spent in the "fetch", "parse" and "convert" stages.
+
+    Returns:
+        tuple: The classes of every course, in the order of course_codes, and a fingerprint of the course data.
+
+    Raises:
+        requests.exceptions.RequestException: If upstream could not be reached for one of the courses.
+    """
+    memo_keys = {
+        course: (course.upper(), options["semester"], options["location"], attend_lectures)
+        for course in course_codes
+    }
+    converted = {course: course_classes_memo.get(memo_keys[course]) for course in course_codes}
+
+    if timings is None:
+        timings = {}
+    for stage in ("fetch", "parse", "convert"):
+        timings.setdefault(stage, 0.0)
+
+    missing = [course for course in course_codes if converted[course] is None]
+    if missing:
+        before = time.perf_counter()
+        course_timetables = course_details_many(missing, options)
+        timings["fetch"] += time.perf_counter() - before
+
+        for course, course_timetable in course_timetables.items():
+            before = time.perf_counter()
+            course_info = parse_course_timetable(course_timetable, course)
+            parsed = time.perf_counter()
+            classes = convertForAlgorithmCourses(
+                course_info, retrieveLectures=attend_lectures
+            )
+            converted[course] = (classes, classes_fingerprint(classes))
+            course_classes_memo.set(memo_keys[course], converted[course])
+            timings["parse"] += parsed - before
+            timings["convert"] += time.perf_counter() - parsed
+
+    fingerprint = hashlib.sha256(
+        "".join(converted[course][1] for course in course_codes).encode()
+    ).hexdigest()
+    classes = [class_ for course in course_codes for class_ in converted[course][0]]
+    return classes, fingerprint
+
+
+def result_cache_key(
+    body: dict,
+    course_codes: list[str],
+    timeslots: dict,
+    unavailable_slots: dict,
+    fingerprint: str,
+) -> str:
+    """
+    Hash a recommendation request into its result cache key.
+
+    Requests differing only in course order or in how their preferences were sent (keyed or packed, rather than
+    the levels they convert to) share a key, while the response format is part of it. Search limits are left out,
+    as only searches that finished are cached.
+
+    Args:
+        body (dict): The request body.
+        course_codes (list[str]): The sorted, upper case course codes.
+        timeslots (dict): The preference grid from convertForAlgorithmTimeSlots.
+        unavailable_slots (dict): The hard constraint grid, or None.
+        fingerprint (str): The fingerprint of the course data from course_classes.
+
+    Returns:
+        str: A hex digest.
+    """
+    normalised = [
+        course_codes,
+        body.get("semester"),
+        body.get("location"),
+        body.get("attendLectures") != False,
+        body.get("format") == "compact",
+        packPreferenceLevels(timeslots, unavailable_slots).hex(),
+        fingerprint,
+    ]
+    return hashlib.sha256(
+        json.dumps(normalised, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+def convert_preferences(profile: dict, hard_constraints: bool) -> tuple[dict, dict]:
+    """
+    Convert the preferences of a request, sent either as timetablePreferences or as a packed timetableGrid.
+
+    Args:
+        profile (dict): The request body, or one profile of a batch, holding the preferences.
+        hard_constraints (bool): Whether slots marked unavailable must stay free.
+
+    Returns:
+        tuple: The preference levels of each weekday, and the unavailable slots or None without hard constraints.
+
+    Raises:
+        ValueError: If the packed timetableGrid is malformed, or neither it nor timetablePreferences is given.
+    """
+    if profile.get("timetableGrid") is not None:
+        timeslots, unavailable_slots = convertPackedPreferences(
+            decodePackedPreferences(profile["timetableGrid"])
+        )
+        return timeslots, unavailable_slots if hard_constraints else None
+
+    preferences = profile.get("timetablePreferences")
+    if not isinstance(preferences, dict):
+        raise ValueError("Preferences must be given as a timetablePreferences object or a timetableGrid.")
+    timeslots = convertForAlgorithmTimeSlots(preferences)
+    unavailable_slots = None
+    if hard_constraints:
+        unavailable_slots = convertForAlgorithmUnavailableSlots(preferences)
+    return timeslots, unavailable_slots
+
+
+def check_courses(body: dict) -> None:
+    """
+    Check a request lists its courses.
+
+    Raises:
+        ValueError: If courses is not a non-empty list of course codes.
+    """
+    courses = body.get("courses")
+    if (
+        not isinstance(courses, list)
+        or not courses
+        or not all(isinstance(course, str) for course in courses)
+    ):
+        raise ValueError("courses must list at least one course code.")
+
+
+def check_search_limits(body: dict) -> None:
+    """
+    Check the optional timeLimit and nodeLimit of a request are non-negative numbers.
+
+    Raises:
+        ValueError: If either limit is given but is not a non-negative number.
+    """
+    for name in ("timeLimit", "nodeLimit"):
+        limit = body.get(name)
+        if limit is None:
+            continue
+        if isinstance(limit, bool) or not isinstance(limit, (int, float)) or not limit >= 0:
+            raise ValueError(f"{name} must be a non-negative number.")
+
+
+def prepare_recommendation(body: dict, stages: dict) -> dict:
+    """
+    Turn a recommendation request into the problem the algorithm solves.
+
+    Args:
+        body (dict): The request body, as described in recommend_timetable.
+        stages (dict): Filled with the seconds spent in the "fetch", "parse" and "convert" stages.
+
+    Returns:
+        dict: Whether the response should be "compact", the "classes", preference "timeslots" and
+        "unavailable_slots" to solve with, and the request's "cache_key" in the result cache.
+
+    Raises:
+        requests.exceptions.RequestException: If upstream could not be reached for one of the courses.
+        ValueError: If the courses, the search limits or the preferences are malformed.
+    """
+    check_courses(body)
+    check_search_limits(body)
+    before = time.perf_counter()
+    # Preferences are converted first, so malformed ones are rejected before fetching any course
+    timeslots, unavailable_slots = convert_preferences(body, body.get("hardConstraints"))
+    stages["convert"] = time.perf_counter() - before
+
+    course_codes, classes, fingerprint = recommendation_courses(body, stages)
+    return recommendation_problem(
+        body, course_codes, classes, fingerprint, timeslots, unavailable_slots
+    )
+
+
+def recommendation_courses(body: dict, stages: dict) -> tuple[list[str], list[Class], str]:
+    """
+    Get the classes of a request's courses through course_classes.
+
+    Returns:
+        tuple: The sorted, upper case course codes, their classes and the fingerprint of the course data.
+
+    Raises:
+        requests.exceptions.RequestException: If upstream could not be reached for one of the courses.
+    """
+    # Sorted so the same courses in any order are solved, and cached, alike
+    course_codes = sorted({course.upper() for course in body.get("courses")})
+    classes, fingerprint = course_classes(
+        course_codes,
+        options={
+            "semester": body.get("semester"),
+            "location": body.get("location"),
+        },
+        attend_lectures=body.get("attendLectures") != False,
+        timings=stages,
+    )
+    return course_codes, classes, fingerprint
+
+
+def recommendation_problem(
+    body: dict,
+    course_codes: list[str],
+    classes: list[Class],
+    fingerprint: str,
+    timeslots: dict,
+    unavailable_slots: dict,
+) -> dict:
+    """Collect everything needed to solve, cache and respond to one set of preferences, see prepare_recommendation."""
+    return {
+        "compact": body.get("format") == "compact",
+        "classes": classes,
+        "timeslots": timeslots,
+        "unavailable_slots": unavailable_slots,
+        "cache_key": result_cache_key(
+            body, course_codes, timeslots, unavailable_slots, fingerprint
+        ),
+    }
+
+
+def cached_recommendation(problem: dict, stages: dict) -> dict:
+    """Look a problem up in the result cache, counting the search time saved on a hit. Returns None on a miss."""
+    cached = result_cache.get(problem["cache_key"])
+    if cached is None:
+        return None
+    result_cache.increment("time_saved", cached["solve_time"])
+    record_metrics(stages)
+    return cached["response"]
+
+
+def solve_recommendation(
+    problem: dict,
+    body: dict,
+    stats: SearchStats,
+    stages: dict,
+    on_improvement=None,
+    time_limit: float = None,
+) -> list[dict]:
+    """
+    Run the algorithm on a problem within the request's search limits, timing it as the "solve" stage.
+
+    The problem may also carry the footprint "groups" and candidate "scores" precomputed for it, and time_limit
+    overrides the request's limit.
+
+    Raises:
+        ValueError: If no timetable can be found.
+    """
+    if time_limit is None:
+        time_limit = (
+            SOLVER_TIME_LIMIT
+            if body.get("timeLimit") is None
+            else min(body["timeLimit"], SOLVER_TIME_LIMIT)
+        )
+
+    before = time.perf_counter()
+    try:
+        return solve_timetable(
+            problem["timeslots"],
+            problem["classes"],
+            unavailable_slots=problem["unavailable_slots"],
+            workers=SOLVER_WORKERS,
+            time_limit=time_limit,
+            node_limit=body.get("nodeLimit"),
+            stats=stats,
+            on_improvement=on_improvement,
+            groups=problem.get("groups"),
+            scores=problem.get("scores"),
+        )
+    finally:
+        stages["solve"] = time.perf_counter() - before
+
+
+def format_recommendation(timetable: dict) -> dict:
+    """Convert a schedule from the algorithm into the grid the frontend draws, keeping 8:00 to 22:00."""
+    process_timetable = {
+        "Monday": timetable["Monday"][16:44],
+        "Tuesday": timetable["Tuesday"][16:44],
+        "Wednesday": timetable["Wednesday"][16:44],
+        "Thursday": timetable["Thursday"][16:44],
+        "Friday": timetable["Friday"][16:44],
+    }
+    return {
+        "score": timetable["score"],
+        "conflicts": 0,
+        "backups": timetable["backups"],
+        "grid": convertTimetableToGrid(process_timetable),
+    }
+
+
+def finish_recommendation(
+    problem: dict, best_timetables: list[dict], stats: SearchStats, stages: dict
+) -> dict:
+    """
+    Build the response for the best timetables, caching it if the search finished.
+
+    Returns:
+        dict: The ranked "recommendations", whether the search was "exhaustive" and the "nodes" it visited. In the
+        compact format, each recommendation has "assignments" instead of a "grid" and "backups", indexing into the
+        response's "strings" table.
+    """
+    timetable_recommendation_response = {
+        "recommendations": [],
+        "exhaustive": stats.exhaustive,
+        "nodes": stats.nodes,
+    }
+
+    before = time.perf_counter()
+    if problem["compact"]:
+        strings, assignments = convertTimetablesToCompact(best_timetables)
+        timetable_recommendation_response["format"] = "compact"
+        timetable_recommendation_response["strings"] = strings
+        for index, (timetable, timetable_assignments) in enumerate(
+            zip(best_timetables, assignments)
+        ):
+            timetable_recommendation_response["recommendations"].append(
+                {
+                    "id": "rec_{id}".format(id=index + 1),
+                    "name": "Recommendation {no}".format(no=index + 1),
+                    "score": timetable["score"],
+                    "conflicts": 0,
+                    "assignments": timetable_assignments,
+                }
+            )
+    else:
+        for index, timetable in enumerate(best_timetables):
+            timetable_recommendation_response["recommendations"].append(
+                {
+                    "id": "rec_{id}".format(id=index + 1),
+                    "name": "Recommendation {no}".format(no=index + 1),
+                    **format_recommendation(timetable),
+                }
+            )
+    stages["grid"] = time.perf_counter() - before
+
+    # Searches cut short by their budget depend on the limits and machine load, so only finished ones are reused
+    if stats.exhaustive:
+        result_cache.set(
+            problem["cache_key"],
+            {
+                "response": timetable_recommendation_response,
+                "solve_time": stages["solve"],
+            },
+        )
+
+    record_metrics(stages, stats)
+    return timetable_recommendation_response
+
+
 @timetable_api.route("/recommend", methods=["POST"])
 def recommend_timetable():
     """
@@ -42,55 +483,263 @@ def recommend_timetable():
         semester: semester,
                 location: location,
                 courses: courses,
-                timetablePreferences: convertTimetableForAPI()
+                timetablePreferences: convertTimetableForAPI(),
+                attendLectures: attendLectures,
+                hardConstraints: whether slots marked unavailable must stay free (optional),
+                timeLimit: seconds the search may run for, capped by SOLVER_TIME_LIMIT (optional),
+                nodeLimit: number of partial timetables the search may visit (optional),
+                debug: whether to add a "debug" block with the search counters and stage timings (optional),
+                format: "compact" for assignments sharing a string table instead of grids (optional),
+                timetableGrid: the preferences packed as base64 of 240 codes, or 5 lists of 48 codes, replacing
+                    timetablePreferences. Codes are 0 for no preference, 1 to 4 for preferred ranks and 5 for
+                    unavailable, from Monday 0:00 in half hours (optional)
     }
     """
     body = request.get_json()
-    courses_activities = []
-    attend_lectures = body.get("attendLectures")
-
-    for course in body.get("courses"):
-        course_timetable = course_details(
-            course,
-            options={
-                "semester": body.get("semester"),
-                "location": body.get("location"),
-            },
+    debug = bool(body.get("debug"))
+    stages = {}
+
+    try:
+        problem = prepare_recommendation(body, stages)
+    except requests.exceptions.RequestException as e:
+        return f"Error fetching course timetable: {e}", 500
+    except ValueError as e:
+        return str(e), 400
+
+    cached = cached_recommendation(problem, stages)
+    if cached is not None:
+        if debug:
+            cached = dict(cached, debug={"cached": True, "stages": stages})
+        return json_response(cached) if problem["compact"] else cached
+
+    stats = SearchStats(detailed=debug or SEARCH_COUNTERS)
+    try:
+        best_timetables = solve_recommendation(problem, body, stats, stages)
+    except ValueError as e:
+        return str(e), 400
+
+    timetable_recommendation_response = finish_recommendation(
+        problem, best_timetables, stats, stages
+    )
+    if debug:
+        timetable_recommendation_response = dict(
+            timetable_recommendation_response,
+            debug={"cached": False, "stages": stages, "search": stats.as_dict()},
         )
+    if problem["compact"]:
+        return json_response(timetable_recommendation_response)
+    return timetable_recommendation_response
+
+
+@timetable_api.route("/recommend/batch", methods=["POST"])
+def recommend_timetable_batch():
+    """
+    Recommend timetables for one set of courses under several preference profiles, such as early against late
+    starts, sharing the course fetch, conversion and candidate scoring between them.
+
+    data: {
+        semester, location, courses, attendLectures, hardConstraints, timeLimit, nodeLimit, format: as for /recommend,
+        profiles: a list of up to BATCH_MAX_PROFILES profiles, each with timetablePreferences or a timetableGrid
+    }
+
+    Returns one entry per profile in "profiles", either the response /recommend would give for it or an "error".
+    Each profile's search may take up to BATCH_TIME_LIMIT shared evenly between the profiles not already cached.
+    """
+    body = request.get_json()
+    profiles = body.get("profiles")
+    if not isinstance(profiles, list) or not 0 < len(profiles) <= BATCH_MAX_PROFILES:
+        return f"profiles must list 1 to {BATCH_MAX_PROFILES} preference profiles.", 400
+    if not all(isinstance(profile, dict) for profile in profiles):
+        return "Each profile must be an object of preferences.", 400
+
+    stages = {}
+    before = time.perf_counter()
+    try:
+        check_courses(body)
+        check_search_limits(body)
+    except ValueError as e:
+        return str(e), 400
+    preferences = []
+    for index, profile in enumerate(profiles):
+        try:
+            preferences.append(convert_preferences(profile, body.get("hardConstraints")))
+        except ValueError as e:
+            return f"Profile {index}: {e}", 400
+    stages["convert"] = time.perf_counter() - before
 
-        course_info = parse_course_timetable(course_timetable, course)
-        algo_course_compatible = convertForAlgorithmCourses(
-            course_info, retrieveLectures=attend_lectures
+    try:
+        course_codes, classes, fingerprint = recommendation_courses(body, stages)
+    except requests.exceptions.RequestException as e:
+        return f"Error fetching course timetable: {e}", 500
+
+    problems = [
+        recommendation_problem(
+            body, course_codes, classes, fingerprint, timeslots, unavailable_slots
         )
-        courses_activities += algo_course_compatible
+        for timeslots, unavailable_slots in preferences
+    ]
+    responses = [cached_recommendation(problem, {}) for problem in problems]
+    unsolved = [index for index, response in enumerate(responses) if response is None]
 
-    preferences = body.get("timetablePreferences")
-    timeslots = convertForAlgorithmTimeSlots(preferences)
-    before = time.time()
-    best_timetables = solve_timetable(timeslots, courses_activities)
-    after = (
-        time.time()
-    )  # This line was missing in the original code, added for completeness
-
-    timetable_recommendation_response = {"recommendations": []}
-
-    for index, timetable in enumerate(best_timetables):
-        process_timetable = {
-            "Monday": timetable["Monday"][16:44],
-            "Tuesday": timetable["Tuesday"][16:44],
-            "Wednesday": timetable["Wednesday"][16:44],
-            "Thursday": timetable["Thursday"][16:44],
-            "Friday": timetable["Friday"][16:44],
-        }
-
-        timetable_recommendation_response["recommendations"].append(
-            {
-                "id": "rec_{id}".format(id=index + 1),
-                "name": "Recommendation {no}".format(no=index + 1),
-                "score": timetable["score"],
-                "conflicts": 0,
-                "grid": convertTimetableToGrid(process_timetable),
-            }
+    if unsolved:
+        # Every profile's candidates are scored in one matrix product over the shared footprint groups
+        before = time.perf_counter()
+        groups = [group_by_footprint(class_.times) for class_ in classes]
+        scores = score_groups(
+            groups, [problems[index]["timeslots"] for index in unsolved]
         )
+        stages["score"] = time.perf_counter() - before
 
-    return timetable_recommendation_response
+        time_limit = min(
+            SOLVER_TIME_LIMIT if body.get("timeLimit") is None else body["timeLimit"],
+            SOLVER_TIME_LIMIT,
+            BATCH_TIME_LIMIT / len(unsolved),
+        )
+        for index, profile_scores in zip(unsolved, scores):
+            problem = dict(problems[index], groups=groups, scores=profile_scores)
+            stats = SearchStats(detailed=SEARCH_COUNTERS)
+            profile_stages = {}
+            try:
+                best_timetables = solve_recommendation(
+                    problem, body, stats, profile_stages, time_limit=time_limit
+                )
+            except ValueError as e:
+                responses[index] = {"error": str(e)}
+                continue
+            responses[index] = finish_recommendation(
+                problem, best_timetables, stats, profile_stages
+            )
+
+    record_metrics(stages)
+    batch_response = {"profiles": responses}
+    if body.get("format") == "compact":
+        return json_response(batch_response)
+    return batch_response
+
+
+def json_response(payload: dict) -> Response:
+    """Serialise a response with orjson when it is installed, as compact responses are meant to be cheap to send."""
+    if orjson is not None:
+        data = orjson.dumps(payload)
+    else:
+        data = json.dumps(payload, separators=(",", ":"))
+    return Response(data, mimetype="application/json")
+
+
+@timetable_api.after_request
+def compress_response(response: Response) -> Response:
+    """Gzip large JSON responses for clients that accept it, leaving streamed responses to flow uncompressed."""
+    if (
+        response.is_streamed
+        or response.status_code != 200
+        or response.mimetype != "application/json"
+        or "Content-Encoding" in response.headers
+        or "gzip" not in request.headers.get("Accept-Encoding", "")
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@timetable_api.route("/recommend/stream", methods=["POST"])
+def recommend_timetable_stream():
+    """
+    Recommend timetables like /recommend, streaming newline delimited JSON events as the search improves.
+
+    Each line is one event:
+        {"event": "improvement", "recommendation": {score, conflicts, backups, grid}} whenever a timetable enters
+        the best recommendations found so far,
+        {"event": "complete", "recommendations": [...], "exhaustive": ..., "nodes": ...} with the final ranking, as
+        /recommend would respond, or
+        {"event": "error", "message": ...} if no timetable can be found.
+
+    Fetching course timetables still fails with a plain 500 response, and malformed courses, search limits or
+    preferences with a plain 400 response, before any event is sent.
+    """
+    body = request.get_json()
+    stages = {}
+
+    try:
+        problem = prepare_recommendation(body, stages)
+    except requests.exceptions.RequestException as e:
+        return f"Error fetching course timetable: {e}", 500
+    except ValueError as e:
+        return str(e), 400
+
+    cached = cached_recommendation(problem, stages)
+    if cached is not None:
+        return Response(
+            json.dumps({"event": "complete", **cached}) + "\n",
+            mimetype="application/x-ndjson",
+        )
+
+    events = queue.Queue()
+    disconnected = threading.Event()
+
+    def on_improvement(timetable: dict) -> None:
+        # Stops the search at its next improvement once nobody is listening, the budget stops it otherwise
+        if disconnected.is_set():
+            raise SearchInterrupted()
+        events.put(
+            {"event": "improvement", "recommendation": format_recommendation(timetable)}
+        )
+
+    def search() -> None:
+        stats = SearchStats(detailed=SEARCH_COUNTERS)
+        try:
+            best_timetables = solve_recommendation(
+                problem, body, stats, stages, on_improvement
+            )
+            response = finish_recommendation(problem, best_timetables, stats, stages)
+            events.put({"event": "complete", **response})
+        except ValueError as e:
+            events.put({"event": "error", "message": str(e)})
+        except SearchInterrupted:
+            pass
+        finally:
+            events.put(None)
+
+    def generate():
+        threading.Thread(target=search, daemon=True).start()
+        try:
+            while (event := events.get()) is not None:
+                yield json.dumps(event) + "\n"
+        finally:
+            disconnected.set()
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+def record_metrics(stages: dict, stats: SearchStats = None) -> None:
+    """
+    Add a recommendation's stage timings and search counters to the metrics histograms.
+
+    Args:
+        stages (dict): The seconds spent in each stage.
+        stats (SearchStats, optional): The search counters, None when the result came from the cache.
+    """
+    for stage, seconds in stages.items():
+        recommend_metrics.observe(f"stage.{stage}", seconds)
+    if stats is not None:
+        for name, value in stats.as_dict().items():
+            if value is not None and name != "exhaustive":
+                recommend_metrics.observe(f"search.{name}", value, COUNT_BUCKETS)
+
+
+@timetable_api.route("/cache/stats", methods=["GET"])
+def result_cache_stats():
+    """Report the result cache's hit rate, size and total seconds of searching saved."""
+    return result_cache.stats()
+
+
+@timetable_api.route("/metrics", methods=["GET"])
+def recommend_metrics_histograms():
+    """Report histograms of recent stage timings and search counters in this process."""
+    return recommend_metrics.as_dict()
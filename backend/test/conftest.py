@@ -0,0 +1,32 @@
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The backend modules import each other relative to the flaskr directory
+sys.path.insert(0, os.path.join(BACKEND_DIR, "flaskr"))
+
+# Keep the caches and snapshot the backend creates on import out of the source tree
+TEST_DATA_DIR = tempfile.mkdtemp()
+os.environ.setdefault("CACHE_PATH", os.path.join(TEST_DATA_DIR, "cache.sqlite3"))
+os.environ.setdefault("SNAPSHOT_PATH", os.path.join(TEST_DATA_DIR, "snapshot.sqlite3"))
+os.environ.setdefault("REQUEST_LOG_PATH", os.path.join(TEST_DATA_DIR, "requests.log"))
+
+
+@pytest.fixture
+def timetable_json():
+    """The raw upstream timetable response for MATH1051 in semester 2 at St Lucia."""
+    with open(os.path.join(BACKEND_DIR, "timetable.json")) as file:
+        return json.load(file)
+
+
+@pytest.fixture
+def client():
+    from main import app
+
+    app.config["TESTING"] = True
+    return app.test_client()
@@ -1,8 +1,13 @@
+import os
+import sys
 import time
 
-from algorithm import print_schedule, solve_timetable
-from classes import Class, Time
-from constants import ALWAYS_AVAILABLE, DAYS, NUMBER_OF_TIME_SLOTS
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "flaskr"))
+
+from models.Class import Class
+from models.constants import ALWAYS_AVAILABLE, DAYS, NUMBER_OF_TIME_SLOTS
+from models.Time import Time
+from recommendation.algorithm import print_schedule, solve_timetable
 
 
 def test_fully_fledged_case():
@@ -35,7 +40,7 @@ def test_fully_fledged_case():
     result = solve_timetable(ALWAYS_AVAILABLE, classes)
     after = time.time()
     print(f"Time taken: {after - before:.2f} seconds")
-    print_schedule(result)
+    print_schedule(result[0])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,454 @@
+import contextlib
+import itertools
+import random
+
+import pytest
+from models.Class import Class
+from models.constants import *
+from models.SearchStats import SearchStats
+from models.Time import Time
+from recommendation.algorithm import *
+from recommendation.batch import score_groups
+
+
+def make_classes():
+    """Two courses with overlapping candidate times across Monday and Tuesday."""
+    return [
+        Class(
+            "MATH1051",
+            "LEC",
+            "LEC1",
+            [Time("01", MON, 9.0, 2.0, 50), Time("02", TUE, 13.5, 2.0, 50)],
+        ),
+        Class(
+            "MATH1051",
+            "TUT",
+            "TUT1",
+            [
+                Time("01", MON, 10.0, 1.0, 50),
+                Time("02", MON, 11.0, 1.0, 50),
+                Time("03", TUE, 14.0, 1.0, 50),
+                Time("04", WED, 8.0, 1.0, 50),
+            ],
+        ),
+        Class(
+            "CSSE1001",
+            "PRA",
+            "PRA1",
+            [
+                Time("01", MON, 11.0, 2.0, 50),
+                Time("02", TUE, 15.0, 2.0, 50),
+                Time("03", WED, 8.5, 1.5, 50),
+            ],
+        ),
+    ]
+
+
+def make_time_slots():
+    time_slots = {day: [BAD] * NUMBER_OF_TIME_SLOTS for day in DAYS}
+    time_slots[MON][18:24] = [IDEAL] * 6
+    time_slots[TUE][26:34] = [OKAY] * 8
+    time_slots[WED] = [UNAVAILABLE] * NUMBER_OF_TIME_SLOTS
+    return time_slots
+
+
+def make_random_problem(seed, class_count=5, times_per_class=5):
+    """A random problem whose candidate durations vary within a class."""
+    rng = random.Random(seed)
+    classes = []
+    for index in range(class_count):
+        times = [
+            Time(
+                f"{number + 1:02d}",
+                rng.choice(DAYS),
+                8 + rng.randrange(20) / 2,
+                rng.choice([1.0, 1.5, 2.0]),
+                50,
+            )
+            for number in range(times_per_class)
+        ]
+        classes.append(Class(f"COUR{index:04d}", "TUT", "TUT1", times))
+    time_slots = {
+        day: [rng.choice(STANDARD_LEVELS + [0]) for _ in range(NUMBER_OF_TIME_SLOTS)]
+        for day in DAYS
+    }
+    return time_slots, classes
+
+
+def brute_force_scores(time_slots, classes):
+    """Scores of every clash-free combination, best first."""
+    scores = []
+    for times in itertools.product(*(class_.times for class_ in classes)):
+        slots = set()
+        clash = False
+        for time in times:
+            for slot in range(time.start_slot, time.end_slot):
+                clash = clash or (time.day, slot) in slots
+                slots.add((time.day, slot))
+        if not clash:
+            scores.append(sum(time_slots[day][slot] for day, slot in slots))
+    return sorted(scores, reverse=True)
+
+
+class TestTimeMask:
+    def test_half_hour_start_is_not_rounded_down(self):
+        time = Time("01", MON, 13.5, 1.0, 50)
+        assert (time.start_slot, time.end_slot) == (27, 29)
+        assert time.mask == 0b11 << 27
+
+    def test_days_do_not_share_bits(self):
+        monday = Time("01", MON, 9.0, 1.0, 50)
+        tuesday = Time("01", TUE, 9.0, 1.0, 50)
+        assert monday.mask & tuesday.mask == 0
+        assert tuesday.mask == monday.mask << NUMBER_OF_TIME_SLOTS
+
+    def test_overlapping_times_share_bits(self):
+        assert Time("01", MON, 9.0, 2.0, 50).mask & Time("02", MON, 10.5, 1.0, 50).mask
+
+    def test_times_at_the_same_slots_share_one_mask(self):
+        assert Time("01", WED, 9.0, 2.0, 50).mask is Time("02", WED, 9.0, 2.0, 50).mask
+
+
+class TestTime:
+    def test_equality_compares_activity_codes(self):
+        assert Time("01", MON, 9.0, 1.0, 50) == Time("01", MON, 9.0, 1.0, 50)
+        assert Time("01", MON, 9.0, 1.0, 50) != Time("02", MON, 9.0, 1.0, 50)
+        assert Time("01", MON, 9.0, 1.0, 50) != "01"
+
+    def test_times_and_classes_have_no_instance_dictionary(self):
+        time = Time("01", FRI, 9.0, 1.0, 50)
+        assert not hasattr(time, "__dict__")
+        assert not hasattr(Class("MATH1051", "TUT", "TUT1", [time]), "__dict__")
+
+
+class TestTimeScore:
+    def test_prefix_sums_match_slot_totals(self):
+        time_slots = make_time_slots()
+        prefix_sums = preference_prefix_sums(time_slots)
+        for class_ in make_classes():
+            for time in class_.times:
+                assert time_score(prefix_sums, time) == sum(
+                    time_slots[time.day][time.start_slot : time.end_slot]
+                )
+
+    def test_prefix_sums_cover_whole_day(self):
+        prefix_sums = preference_prefix_sums(ALWAYS_AVAILABLE)
+        assert prefix_sums[MON][0] == 0
+        assert prefix_sums[MON][NUMBER_OF_TIME_SLOTS] == IDEAL * NUMBER_OF_TIME_SLOTS
+
+
+class TestSolveTimetable:
+    def test_matches_brute_force_scores(self):
+        time_slots = make_time_slots()
+        expected = brute_force_scores(time_slots, make_classes())[:5]
+
+        result = solve_timetable(time_slots, make_classes())
+        assert [schedule["score"] for schedule in result] == expected
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_matches_brute_force_on_random_problems(self, seed):
+        time_slots, classes = make_random_problem(seed)
+        expected = brute_force_scores(time_slots, classes)[:5]
+
+        result = solve_timetable(time_slots, classes)
+        assert [schedule["score"] for schedule in result] == expected
+
+    def test_schedules_are_labelled_with_activity_codes(self):
+        result = solve_timetable(make_time_slots(), make_classes())
+        for schedule in result:
+            labels = [label for day in DAYS for label in schedule[day] if label]
+            assert {label.rsplit(" ", 1)[0] for label in labels} == {
+                "MATH1051 LEC1",
+                "MATH1051 TUT1",
+                "CSSE1001 PRA1",
+            }
+            assert len(labels) in (9, 10)  # LEC1 and TUT1 are fixed length, PRA1 is 1.5 or 2 hours
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_reports_each_improvement(self, workers):
+        time_slots, classes = make_random_problem(3, class_count=7, times_per_class=6)
+        improvements = []
+        schedules = solve_timetable(
+            time_slots, classes, workers=workers, on_improvement=improvements.append
+        )
+
+        assert len(improvements) >= len(schedules)
+        assert all(schedule in improvements for schedule in schedules)
+        assert max(improvement["score"] for improvement in improvements) == schedules[0]["score"]
+
+    def test_raises_when_no_timetable_fits(self):
+        classes = [
+            Class("MATH1051", "LEC", "LEC1", [Time("01", MON, 9.0, 2.0, 50)]),
+            Class("MATH1051", "TUT", "TUT1", [Time("01", MON, 10.0, 1.0, 50)]),
+        ]
+        with pytest.raises(ValueError):
+            solve_timetable(ALWAYS_AVAILABLE, classes)
+
+
+class TestHardConstraints:
+    def test_excludes_times_over_unavailable_slots(self):
+        unavailable_slots = {day: [False] * NUMBER_OF_TIME_SLOTS for day in DAYS}
+        unavailable_slots[MON][18] = True  # 9:00 on Monday
+
+        result = solve_timetable(
+            make_time_slots(), make_classes(), unavailable_slots=unavailable_slots
+        )
+        for schedule in result:
+            assert schedule[MON][18] == ""
+            assert all("LEC1 01" not in label for label in schedule[MON])
+
+    def test_forced_times_remove_clashing_candidates(self):
+        classes = make_classes()
+        candidates = [
+            [((time,), time.mask, 0) for time in class_.times] for class_ in classes
+        ]
+        candidates[0] = candidates[0][:1]  # LEC1 forced to Monday 9:00-11:00
+
+        propagate_forced_times(classes, candidates)
+        assert [times[0].activity_code for times, _, _ in candidates[1]] == ["02", "03", "04"]
+        assert len(candidates[2]) == 3  # PRA1 does not clash with LEC1 and TUT1 is not forced
+
+    def test_clashing_forced_times_are_named(self):
+        classes = [
+            Class("MATH1051", "LEC", "LEC1", [Time("01", MON, 9.0, 2.0, 50)]),
+            Class("MATH1051", "TUT", "TUT1", [Time("01", MON, 10.0, 1.0, 50)]),
+            Class("CSSE1001", "PRA", "PRA1", [Time("01", TUE, 10.0, 1.0, 50)]),
+        ]
+        with pytest.raises(ValueError, match="MATH1051TUT1.*MATH1051LEC1"):
+            solve_timetable(ALWAYS_AVAILABLE, classes)
+
+
+class TestFootprintGroups:
+    def make_parallel_classes(self):
+        return [
+            Class(
+                "MATH1051",
+                "LEC",
+                "LEC1",
+                [
+                    Time("01", TUE, 9.0, 1.0, 50),
+                    Time("01_Delayed", TUE, 9.0, 1.0, 50),
+                    Time("02", TUE, 11.0, 1.0, 50),
+                ],
+            ),
+            Class(
+                "MATH1051",
+                "TUT",
+                "TUT1",
+                [Time(f"{room:02d}", WED, 10.0, 1.0, 50) for room in range(1, 5)]
+                + [Time("05", THU, 10.0, 1.0, 50)],
+            ),
+        ]
+
+    def test_groups_times_with_the_same_slots(self):
+        groups = group_by_footprint(self.make_parallel_classes()[1].times)
+        assert [[time.activity_code for time in times] for times, _ in groups] == [
+            ["01", "02", "03", "04"],
+            ["05"],
+        ]
+
+    def test_results_are_distinct_timetables_with_backups(self):
+        result = solve_timetable(make_time_slots(), self.make_parallel_classes())
+        assert len(result) == 4  # 2 lecture footprints x 2 tutorial footprints
+
+        footprints = {
+            tuple(tuple(bool(label) for label in schedule[day]) for day in DAYS)
+            for schedule in result
+        }
+        assert len(footprints) == 4
+
+        for schedule in result:
+            if schedule[WED][20] == "MATH1051 TUT1 01":
+                assert schedule["backups"]["MATH1051 TUT1"] == ["02", "03", "04"]
+            else:
+                assert "MATH1051 TUT1" not in schedule["backups"]
+
+
+class TestParallelSearch:
+    @pytest.mark.parametrize("seed", range(3))
+    def test_matches_serial_solve(self, seed):
+        time_slots, classes = make_random_problem(seed, class_count=7, times_per_class=6)
+
+        serial = solve_timetable(time_slots, classes)
+        parallel = solve_timetable(time_slots, classes, workers=2)
+        assert parallel == serial
+
+    def test_splits_into_clash_free_subtrees(self):
+        candidates = [
+            [((time,), time.mask, 0) for time in class_.times] for class_ in make_classes()
+        ]
+        subtrees = split_search(candidates, 2)
+        # LEC1 Monday 9:00-11:00 clashes with TUT1 Monday 10:00, LEC1 Tuesday 13:30 with TUT1 Tuesday 14:00
+        assert [path for path, _, _ in subtrees] == [(0, 1), (0, 2), (0, 3), (1, 0), (1, 1), (1, 3)]
+
+    def test_a_killed_search_process_does_not_fail_searches(self):
+        time_slots, classes = make_random_problem(1, class_count=12, times_per_class=10)
+        serial = solve_timetable(time_slots, classes)
+
+        pool = search_pool(2)
+        process = next(iter(pool.executor._processes.values()))
+        process.kill()
+        process.join()
+
+        assert solve_timetable(time_slots, classes, workers=2) == serial
+        assert search_pool(2) is not pool
+        assert solve_timetable(time_slots, classes, workers=2) == serial
+
+    def test_does_little_more_work_than_a_serial_solve(self):
+        time_slots, classes = make_random_problem(1, class_count=12, times_per_class=10)
+        serial, parallel = SearchStats(), SearchStats()
+        solve_timetable(time_slots, classes, stats=serial)
+        solve_timetable(time_slots, classes, workers=2, stats=parallel)
+        assert parallel.nodes < 2 * serial.nodes
+
+    def test_searches_reuse_the_pool(self):
+        pool = search_pool(2)
+        for seed in range(3, 5):
+            time_slots, classes = make_random_problem(seed, class_count=7, times_per_class=6)
+            # A spent budget leaves the shared bound and nodes behind, which must not affect the next search
+            with contextlib.suppress(ValueError):  # Nothing may be found within the budget
+                solve_timetable(time_slots, classes, workers=2, node_limit=1)
+            assert solve_timetable(time_slots, classes, workers=2) == solve_timetable(time_slots, classes)
+        assert search_pool(2) is pool
+
+
+def make_candidates(time_slots, classes):
+    """Scored candidates of each class, best first, as solve_timetable hands them to the search."""
+    prefix_sums = preference_prefix_sums(time_slots)
+    candidates = [
+        [((time,), time.mask, time_score(prefix_sums, time)) for time in class_.times]
+        for class_ in classes
+    ]
+    return [sorted(class_candidates, key=lambda candidate: -candidate[2]) for class_candidates in candidates]
+
+
+class TestBranchAndBound:
+    def test_resumes_where_the_budget_ran_out(self):
+        candidates = make_candidates(*make_random_problem(3, class_count=10, times_per_class=8))
+        best_remaining = best_remaining_scores(candidates)
+        whole, whole_stats = ScheduleHeap(RECOMMENDATION_COUNT), SearchStats()
+        branch_and_bound(candidates, best_remaining, whole, stats=whole_stats)
+
+        resumed, stats = ScheduleHeap(RECOMMENDATION_COUNT), SearchStats()
+        stack, runs = None, 0
+        while stack is None or not stack.done:
+            stats.exhaustive = True
+            budget = SearchBudget(node_limit=BUDGET_CHECK_INTERVAL)
+            stack = branch_and_bound(candidates, best_remaining, resumed, budget=budget, stats=stats, stack=stack)
+            runs += 1
+
+        assert runs > 2 and stats.exhaustive
+        assert resumed.getBestEntries() == whole.getBestEntries()
+        assert (stats.nodes, stats.leaves) == (whole_stats.nodes, whole_stats.leaves)
+
+    def test_resumes_after_an_interrupted_improvement(self):
+        candidates = make_candidates(*make_random_problem(4, class_count=6, times_per_class=5))
+        best_remaining = best_remaining_scores(candidates)
+        whole = ScheduleHeap(RECOMMENDATION_COUNT)
+        branch_and_bound(candidates, best_remaining, whole)
+
+        def interrupt(score, found):
+            reported.append(found)
+            raise SearchInterrupted()
+
+        resumed, reported = ScheduleHeap(RECOMMENDATION_COUNT), []
+        stack = branch_and_bound(candidates, best_remaining, resumed, on_improvement=interrupt)
+        while not stack.done:
+            stack = branch_and_bound(candidates, best_remaining, resumed, on_improvement=interrupt, stack=stack)
+
+        assert len(reported) == len(set(reported)) == resumed.insertions
+        assert resumed.getBestEntries() == whole.getBestEntries()
+
+    def test_deep_searches_do_not_recurse(self):
+        class_count = 5000  # Well past the recursion limit
+        candidates = [[(None, 0, 1), (None, 0, 0)] for _ in range(class_count)]
+        schedule_heap = ScheduleHeap(RECOMMENDATION_COUNT)
+
+        branch_and_bound(candidates, best_remaining_scores(candidates), schedule_heap)
+        assert schedule_heap.getBestEntries()[0] == (class_count, (0,) * class_count)
+
+
+class TestSearchBudget:
+    def test_exhaustive_search_reports_nodes(self):
+        stats = SearchStats()
+        solve_timetable(make_time_slots(), make_classes(), stats=stats)
+        assert stats.exhaustive
+        assert stats.nodes > 0
+
+    def test_node_limit_returns_best_so_far(self):
+        time_slots, classes = make_random_problem(0, class_count=14, times_per_class=10)
+        stats = SearchStats()
+
+        result = solve_timetable(time_slots, classes, node_limit=1, stats=stats)
+        assert not stats.exhaustive
+        assert stats.nodes == BUDGET_CHECK_INTERVAL
+        assert 0 < len(result) <= RECOMMENDATION_COUNT
+        scores = [schedule["score"] for schedule in result]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_spent_time_limit_finds_nothing(self):
+        with pytest.raises(ValueError, match="search budget"):
+            solve_timetable(make_time_slots(), make_classes(), time_limit=0)
+
+    def test_parallel_search_shares_the_node_limit(self):
+        time_slots, classes = make_random_problem(0, class_count=14, times_per_class=10)
+        stats = SearchStats()
+
+        solve_timetable(time_slots, classes, workers=2, node_limit=1, stats=stats)
+        assert not stats.exhaustive
+        assert stats.nodes < 10 * BUDGET_CHECK_INTERVAL
+
+
+class TestSearchStats:
+    def test_detailed_counters_are_off_by_default(self):
+        stats = SearchStats()
+        solve_timetable(make_time_slots(), make_classes(), stats=stats)
+        counts = stats.as_dict()
+        assert counts["leaves"] > 0
+        assert counts["bound_prunes"] is None and counts["max_depth"] is None
+
+    def test_detailed_counters_describe_the_search(self):
+        time_slots, classes = make_random_problem(1, class_count=7, times_per_class=6)
+        stats = SearchStats(detailed=True)
+        solve_timetable(time_slots, classes, stats=stats)
+
+        assert stats.max_depth == len(classes)
+        assert stats.heap_insertions - stats.heap_evictions == RECOMMENDATION_COUNT
+        assert stats.leaves >= stats.heap_insertions
+        assert stats.bound_prunes > 0 and stats.clash_rejections > 0
+
+    def test_counting_does_not_change_the_search(self):
+        time_slots, classes = make_random_problem(2, class_count=7, times_per_class=6)
+        plain, detailed = SearchStats(), SearchStats(detailed=True)
+        assert solve_timetable(time_slots, classes, stats=plain) == solve_timetable(
+            time_slots, classes, stats=detailed
+        )
+        assert plain.nodes == detailed.nodes and plain.leaves == detailed.leaves
+
+    def test_parallel_counters_are_merged(self):
+        time_slots, classes = make_random_problem(1, class_count=7, times_per_class=6)
+        stats = SearchStats(detailed=True)
+        solve_timetable(time_slots, classes, workers=2, stats=stats)
+        assert stats.leaves > 0 and stats.max_depth == len(classes)
+
+
+class TestBatchScores:
+    def test_matches_prefix_sum_scores(self):
+        time_slots, classes = make_random_problem(1, class_count=7, times_per_class=6)
+        grids = [time_slots, make_random_problem(2)[0], ALWAYS_AVAILABLE]
+        groups = [group_by_footprint(class_.times) for class_ in classes]
+
+        for grid, scores in zip(grids, score_groups(groups, grids)):
+            prefix_sums = preference_prefix_sums(grid)
+            assert scores == [
+                [time_score(prefix_sums, times[0]) for times, _ in class_groups]
+                for class_groups in groups
+            ]
+
+    def test_precomputed_scores_give_the_same_schedules(self):
+        time_slots, classes = make_random_problem(3, class_count=7, times_per_class=6)
+        groups = [group_by_footprint(class_.times) for class_ in classes]
+        [scores] = score_groups(groups, [time_slots])
+        assert solve_timetable(None, classes, groups=groups, scores=scores) == solve_timetable(
+            time_slots, classes
+        )
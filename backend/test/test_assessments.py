@@ -0,0 +1,224 @@
+import os
+import time
+
+import assessments
+import pytest
+import requests
+
+FRONTEND_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "frontend"
+)
+ECP_URL = "https://course-profiles.uq.edu.au/course-profiles/CSSE2002-61152-7560"
+UPSTREAM_DELAY = {"seconds": 0}  # How long each fake upstream fetch takes
+
+
+def read_fixture(name):
+    with open(os.path.join(FRONTEND_DIR, name), encoding="utf-8") as file:
+        return file.read()
+
+
+class FakeResponse:
+    def __init__(self, text="", status_code=200, headers=None):
+        self.text = text
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Serve the checked-in course page and ECP, honouring conditional requests, and record every fetch."""
+    pages = {
+        assessments.COURSE_PAGE_URL.format(course_code="CSSE2002"): read_fixture("course-offering.html"),
+        ECP_URL: read_fixture("ecp.html"),
+    }
+    etags = {url: '"v1"' for url in pages}
+    calls = []
+
+    def get(url, headers=None, **kwargs):
+        calls.append((url, dict(headers or {})))
+        time.sleep(UPSTREAM_DELAY["seconds"])
+        if url not in pages:
+            return FakeResponse(status_code=404)
+        if (headers or {}).get("If-None-Match") == etags[url]:
+            return FakeResponse(status_code=304)
+        return FakeResponse(pages[url], headers={"ETag": etags[url]})
+
+    monkeypatch.setattr(assessments.session, "get", get)
+    assessments.assessment_cache.clear()
+    return pages, etags, calls
+
+
+class TestParseAssessments:
+    def test_finds_the_ecp_of_the_offering(self):
+        course_page = read_fixture("course-offering.html")
+        assert assessments.find_ecp_url(course_page, "S2", "STLUC") == ECP_URL
+        assert assessments.find_ecp_url(course_page, "S1", "GATTN") is None
+
+    def test_reads_the_assessment_summary(self):
+        result = assessments.parse_assessments(read_fixture("ecp.html"), "csse2002")
+        assert result
+        assert [assessment["id"] for assessment in result] == [str(i + 1) for i in range(len(result))]
+        assert {assessment["courseCode"] for assessment in result} == {"CSSE2002"}
+        assert {assessment["courseName"] for assessment in result} == {"Programming in the Large"}
+
+    def test_targeted_parsing_matches_a_full_parse(self, monkeypatch):
+        course_page, ecp = read_fixture("course-offering.html"), read_fixture("ecp.html")
+
+        def parse_all():
+            ecp_urls = [
+                assessments.find_ecp_url(course_page, semester, location)
+                for semester in assessments.SEMESTER_NAMES
+                for location in assessments.LOCATION_NAMES
+            ]
+            return ecp_urls, assessments.parse_assessments(ecp, "CSSE2002")
+
+        targeted = parse_all()
+        monkeypatch.setattr(assessments, "COURSE_PAGE_STRAINER", None)
+        monkeypatch.setattr(assessments, "ECP_STRAINER", None)
+        assert targeted == parse_all()
+
+
+class TestCourseAssessments:
+    def test_repeat_lookups_make_no_upstream_calls(self, upstream, monkeypatch):
+        _, _, calls = upstream
+        first = assessments.course_assessments("CSSE2002", "S2", "STLUC")
+        assert [url for url, _ in calls] == [
+            assessments.COURSE_PAGE_URL.format(course_code="CSSE2002"),
+            ECP_URL,
+        ]
+
+        monkeypatch.setattr(assessments, "parse_assessments", None)  # Fails if called
+        assert assessments.course_assessments("csse2002", "S2", "STLUC") == first
+        assert len(calls) == 2
+
+    def test_stale_entries_are_served_while_revalidating(self, upstream, monkeypatch):
+        _, _, calls = upstream
+        first = assessments.course_assessments("CSSE2002", "S2", "STLUC")
+        monkeypatch.setattr(assessments, "ASSESSMENT_FRESH_TTL", 0)
+        monkeypatch.setattr(assessments, "parse_assessments", None)
+
+        threads = []
+        revalidate = assessments.revalidate_in_background
+        monkeypatch.setattr(
+            assessments,
+            "revalidate_in_background",
+            lambda *args: threads.append(revalidate(*args)),
+        )
+        assert assessments.course_assessments("CSSE2002", "S2", "STLUC") == first
+        threads[0].join()
+
+        # Both pages were asked for conditionally, and neither had changed
+        assert [headers for _, headers in calls[2:]] == [{"If-None-Match": '"v1"'}] * 2
+        assert assessments.assessment_cache.stats()["not_modified"] == 2
+        assert assessments.course_assessments("CSSE2002", "S2", "STLUC") == first
+
+    def test_changed_pages_are_parsed_again(self, upstream, monkeypatch):
+        pages, etags, _ = upstream
+        assessments.course_assessments("CSSE2002", "S2", "STLUC")
+        entry = assessments.assessment_cache.get(("CSSE2002", "S2", "STLUC"))
+
+        pages[ECP_URL] = pages[ECP_URL].replace("Programming in the Large", "Programming at Scale")
+        etags[ECP_URL] = '"v2"'
+        entry = assessments.refresh_assessments("CSSE2002", "S2", "STLUC", entry)
+
+        assert {assessment["courseName"] for assessment in entry["assessments"]} == {"Programming at Scale"}
+        assert entry["ecp"]["etag"] == '"v2"'
+
+    def test_errors_are_not_cached(self, upstream):
+        pages, _, _ = upstream
+        del pages[ECP_URL]
+
+        with pytest.raises(assessments.AssessmentError) as error:
+            assessments.course_assessments("CSSE2002", "S2", "STLUC")
+        assert error.value.status == 500
+        assert assessments.assessment_cache.get(("CSSE2002", "S2", "STLUC")) is None
+
+
+class TestAssessmentForCourse:
+    def test_returns_assessments(self, upstream, client):
+        response = client.get("/assessment/assessment/CSSE2002?semester=S2&location=STLUC")
+        assert response.status_code == 200
+        assert response.get_json() == assessments.course_assessments("CSSE2002", "S2", "STLUC")
+
+    def test_missing_offering_is_not_found(self, upstream, client):
+        response = client.get("/assessment/assessment/CSSE2002?semester=S1&location=HERST")
+        assert response.status_code == 404
+
+    def test_rejects_unknown_semesters(self, client):
+        response = client.get("/assessment/assessment/CSSE2002?semester=S3&location=STLUC")
+        assert response.status_code == 400
+
+
+class TestAssessmentsForCourses:
+    def serve_courses(self, upstream, course_codes):
+        """Serve the CSSE2002 pages under other course codes too."""
+        pages, etags, _ = upstream
+        course_page = pages[assessments.COURSE_PAGE_URL.format(course_code="CSSE2002")]
+        for course_code in course_codes:
+            url = assessments.COURSE_PAGE_URL.format(course_code=course_code)
+            pages[url], etags[url] = course_page, '"v1"'
+
+    def test_merges_courses_and_reports_errors_per_course(self, upstream, client):
+        self.serve_courses(upstream, ["MATH1051"])
+        response = client.post(
+            "/assessment/batch",
+            json={"semester": "S2", "location": "STLUC", "courses": ["math1051", "ABCD1234", "CSSE2002"]},
+        )
+        assert response.status_code == 200
+
+        result = response.get_json()
+        single = assessments.course_assessments("CSSE2002", "S2", "STLUC")
+        assert result["assessments"] == [
+            dict(assessment, id=f"MATH1051-{assessment['id']}", courseCode="MATH1051") for assessment in single
+        ] + [dict(assessment, id=f"CSSE2002-{assessment['id']}") for assessment in single]
+        assert list(result["errors"]) == ["ABCD1234"]
+        assert result["errors"]["ABCD1234"]["status"] == 500
+
+    def test_unexpected_failures_are_reported_per_course(self, upstream, monkeypatch):
+        self.serve_courses(upstream, ["MATH1051"])
+
+        def parse_assessments(ecp, course_code):
+            if course_code == "MATH1051":
+                raise ValueError("unreadable ECP")
+            return []
+
+        monkeypatch.setattr(assessments, "parse_assessments", parse_assessments)
+        found, errors = assessments.course_assessments_many(["MATH1051", "CSSE2002"], "S2", "STLUC")
+        assert found == {"CSSE2002": []}
+        assert errors["MATH1051"].status == 500
+
+    def test_courses_are_fetched_concurrently(self, upstream, monkeypatch):
+        course_codes = ["MATH1051", "MATH1052", "STAT1201", "CSSE2002"]
+        self.serve_courses(upstream, course_codes)
+        monkeypatch.setitem(UPSTREAM_DELAY, "seconds", 0.2)
+
+        before = time.perf_counter()
+        found, errors = assessments.course_assessments_many(course_codes, "S2", "STLUC")
+        elapsed = time.perf_counter() - before
+
+        assert list(found) == course_codes and not errors
+        assert elapsed < 4 * 0.2  # Near one course's two fetches, not all eight one after another
+        assert all(course["courseCode"] == "STAT1201" for course in found["STAT1201"])
+
+    def test_cached_courses_are_not_fetched(self, upstream):
+        _, _, calls = upstream
+        assessments.course_assessments("CSSE2002", "S2", "STLUC")
+
+        found, errors = assessments.course_assessments_many(["CSSE2002"], "S2", "STLUC")
+        assert found["CSSE2002"] and not errors
+        assert len(calls) == 2
+
+    def test_rejects_bodies_that_are_not_objects(self, client):
+        response = client.post("/assessment/batch", json=[])
+        assert response.status_code == 400
+
+    def test_rejects_too_many_courses(self, client):
+        courses = [f"MATH{number:04d}" for number in range(assessments.ASSESSMENT_BATCH_MAX_COURSES + 1)]
+        response = client.post(
+            "/assessment/batch", json={"semester": "S2", "location": "STLUC", "courses": courses}
+        )
+        assert response.status_code == 400
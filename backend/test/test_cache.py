@@ -0,0 +1,66 @@
+import pytest
+from cache import SQLiteCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"), "test", max_entries=3, ttl=60)
+
+
+class TestSQLiteCache:
+    def test_round_trips_json_values(self, cache):
+        cache.set(("MATH1051", "S2", "STLUC"), {"activities": [1, 2]})
+        assert cache.get(("MATH1051", "S2", "STLUC")) == {"activities": [1, 2]}
+        assert cache.get(("MATH1051", "S1", "STLUC")) is None
+
+    def test_empty_values_are_hits(self, cache):
+        cache.set("missing", {})
+        assert cache.get("missing") == {}
+
+    def test_expired_entries_are_misses(self, cache):
+        cache.set("expired", [1], ttl=0)
+        assert cache.get("expired", "default") == "default"
+
+    def test_evicts_least_recently_used(self, cache):
+        cache.access_resolution = 0
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        cache.get("a")
+        cache.set("d", "d")
+
+        assert cache.get("b") is None
+        assert [cache.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+
+    def test_counts_hits_and_misses(self, cache):
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+        assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+    def test_recent_hits_do_not_write(self, cache):
+        cache.set("a", 1)
+        other = SQLiteCache(cache.path, "test", max_entries=3, ttl=60)
+        connection = cache._connection()
+        accessed_at = connection.execute("SELECT accessed_at FROM cache_entries").fetchone()[0]
+
+        assert cache.get("a") == 1
+        assert connection.execute("SELECT accessed_at FROM cache_entries").fetchone()[0] == accessed_at
+        assert connection.total_changes == 1  # Only the set wrote
+        assert other.stats()["hits"] == 0  # Held in memory until the counts are flushed
+
+        cache.flush_counters()
+        assert other.stats()["hits"] == 1
+
+    def test_processes_share_the_file(self, cache):
+        cache.set("shared", "value")
+        other = SQLiteCache(cache.path, "test", max_entries=3, ttl=60)
+        assert other.get("shared") == "value"
+
+    def test_namespaces_are_separate(self, cache):
+        cache.set("key", "value")
+        other = SQLiteCache(cache.path, "other", max_entries=3, ttl=60)
+        assert other.get("key") is None
@@ -0,0 +1,104 @@
+import base64
+
+import pytest
+from conversion import *
+from models.constants import *
+from timetable import parse_course_timetable
+
+
+class TestConvertForAlgorithmCourses:
+    def test_groups_activities_by_subclass(self, timetable_json):
+        course_info = parse_course_timetable(timetable_json, "MATH1051")
+        classes = convertForAlgorithmCourses(course_info, retrieveLectures=True)
+
+        assert [class_.subclass_type for class_ in classes] == ["APP1", "LEC1", "LEC2", "LEC3"]
+        assert sum(len(class_.times) for class_ in classes) == len(course_info)
+        assert {class_.subclass_type: len(class_.times) for class_ in classes} == {
+            "APP1": 28,
+            "LEC1": 4,
+            "LEC2": 4,
+            "LEC3": 4,
+        }
+
+    def test_converted_times_share_codes_and_values(self, timetable_json):
+        course_info = parse_course_timetable(timetable_json, "MATH1051")
+        first, second = (convertForAlgorithmCourses(course_info) for _ in range(2))
+
+        assert first[0].course_code is second[0].course_code
+        for first_time, second_time in zip(first[0].times, second[0].times):
+            assert first_time.activity_code is second_time.activity_code
+            assert first_time.start_time is second_time.start_time
+            assert first_time.mask is second_time.mask
+
+    def test_lectures_can_be_left_out(self, timetable_json):
+        course_info = parse_course_timetable(timetable_json, "MATH1051")
+        classes = convertForAlgorithmCourses(course_info, retrieveLectures=False)
+        assert [class_.subclass_type for class_ in classes] == ["APP1"]
+        assert classes[0].class_type == "APP"
+
+
+class TestConvertForAlgorithmUnavailableSlots:
+    def test_marks_only_unavailable_slots(self):
+        unavailable_slots = convertForAlgorithmUnavailableSlots(
+            {
+                "MON-9:00": {"preference": "unavailable", "rank": 5},
+                "MON-9:30": {"preference": "preferred", "rank": 4},
+                "FRI-13:30": {"preference": "unavailable", "rank": 5},
+            }
+        )
+        assert [slot for slot in range(NUMBER_OF_TIME_SLOTS) if unavailable_slots[MON][slot]] == [18]
+        assert [slot for slot in range(NUMBER_OF_TIME_SLOTS) if unavailable_slots[FRI][slot]] == [27]
+        assert not any(unavailable_slots[TUE])
+
+
+class TestPackedPreferences:
+    PREFERENCES = {
+        "MON-9:00": {"preference": "preferred", "rank": 1},
+        "MON-9:30": {"preference": "preferred", "rank": 3},
+        "WED-14:00": {"preference": "preferred", "rank": 4},
+        "FRI-13:30": {"preference": "unavailable", "rank": 5},
+    }
+
+    def packed_codes(self):
+        codes = bytearray(PACKED_GRID_SIZE)
+        codes[18] = 1
+        codes[19] = 3
+        codes[2 * NUMBER_OF_TIME_SLOTS + 28] = 4
+        codes[4 * NUMBER_OF_TIME_SLOTS + 27] = PACKED_UNAVAILABLE
+        return bytes(codes)
+
+    def test_base64_matches_keyed_preferences(self):
+        packed = base64.b64encode(self.packed_codes()).decode()
+        timeslots, unavailable_slots = convertPackedPreferences(decodePackedPreferences(packed))
+        assert timeslots == convertForAlgorithmTimeSlots(self.PREFERENCES)
+        assert unavailable_slots == convertForAlgorithmUnavailableSlots(self.PREFERENCES)
+
+    def test_day_lists_match_base64(self):
+        codes = self.packed_codes()
+        days = [
+            list(codes[day * NUMBER_OF_TIME_SLOTS : (day + 1) * NUMBER_OF_TIME_SLOTS])
+            for day in range(len(DAYS))
+        ]
+        assert decodePackedPreferences(days) == codes
+
+    def test_both_formats_pack_to_the_same_levels(self):
+        keyed = packPreferenceLevels(
+            convertForAlgorithmTimeSlots(self.PREFERENCES),
+            convertForAlgorithmUnavailableSlots(self.PREFERENCES),
+        )
+        assert packPreferenceLevels(*convertPackedPreferences(self.packed_codes())) == keyed
+
+    @pytest.mark.parametrize(
+        "packed",
+        [
+            base64.b64encode(bytes(PACKED_GRID_SIZE - 1)).decode(),
+            base64.b64encode(bytes([6]) + bytes(PACKED_GRID_SIZE - 1)).decode(),
+            "not base64!",
+            [[0] * NUMBER_OF_TIME_SLOTS] * (len(DAYS) - 1),
+            [[0] * NUMBER_OF_TIME_SLOTS] * (len(DAYS) - 1) + [[0] * (NUMBER_OF_TIME_SLOTS - 1) + [-1]],
+            {"MON": []},
+        ],
+    )
+    def test_rejects_malformed_grids(self, packed):
+        with pytest.raises(ValueError):
+            decodePackedPreferences(packed)
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import course_interface
+import pytest
+import requests
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Record upstream lookups, answering with whatever is queued for each course."""
+    responses = {}
+    calls = []
+
+    def post(url, data=None, **kwargs):
+        calls.append(data["search-term"])
+        return responses[data["search-term"]]
+
+    monkeypatch.setattr(course_interface.session, "post", post)
+    course_interface.course_cache.clear()
+    return responses, calls
+
+
+OPTIONS = {"semester": "S2", "location": "STLUC"}
+
+
+class TestCourseDetails:
+    def test_repeat_lookups_are_served_from_cache(self, upstream, timetable_json):
+        responses, calls = upstream
+        responses["MATH1051"] = FakeResponse(timetable_json)
+
+        assert course_interface.course_details("MATH1051", OPTIONS) == timetable_json
+        assert course_interface.course_details("math1051", OPTIONS) == timetable_json
+        assert calls == ["MATH1051"]
+
+    def test_not_found_is_cached_for_shorter(self, upstream, monkeypatch):
+        responses, calls = upstream
+        responses["ABCD1234"] = FakeResponse({})
+        monkeypatch.setattr(course_interface, "COURSE_NOT_FOUND_TTL", 0)
+
+        assert course_interface.course_details("ABCD1234", OPTIONS) == {}
+        assert course_interface.course_details("ABCD1234", OPTIONS) == {}
+        assert calls == ["ABCD1234", "ABCD1234"]
+
+    def test_upstream_errors_are_not_cached(self, upstream):
+        responses, calls = upstream
+        responses["MATH1051"] = FakeResponse({"error": "busy"}, status_code=503)
+
+        course_interface.course_details("MATH1051", OPTIONS)
+        course_interface.course_details("MATH1051", OPTIONS)
+        assert calls == ["MATH1051", "MATH1051"]
+
+    def test_refresh_fetches_cached_courses_again(self, upstream, timetable_json):
+        responses, calls = upstream
+        responses["MATH1051"] = FakeResponse({})
+        course_interface.course_details("MATH1051", OPTIONS)
+
+        responses["MATH1051"] = FakeResponse(timetable_json)
+        assert course_interface.course_details("MATH1051", OPTIONS, refresh=True) == timetable_json
+        assert course_interface.course_details("MATH1051", OPTIONS) == timetable_json
+        assert calls == ["MATH1051", "MATH1051"]
+
+    def test_cache_stats_endpoint(self, client, upstream, timetable_json):
+        responses, _ = upstream
+        responses["MATH1051"] = FakeResponse(timetable_json)
+        course_interface.course_details("MATH1051", OPTIONS)
+        course_interface.course_details("MATH1051", OPTIONS)
+
+        stats = client.get("/course/cache/stats").get_json()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+@pytest.fixture
+def stub_server(monkeypatch, timetable_json):
+    """A local upstream that answers every course after a delay, recording the connections it was sent on."""
+    state = {"delays": {}, "connections": set()}
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep connections alive between requests
+
+        def do_POST(self):
+            form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+            state["connections"].add(self.client_address)
+            time.sleep(state["delays"].get(form["search-term"][0], 0.2))
+
+            body = json.dumps(timetable_json).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.block_on_close = False  # Don't wait for requests that are still sleeping
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(
+        course_interface, "TIMETABLE_URL", f"http://127.0.0.1:{server.server_port}/"
+    )
+    course_interface.course_cache.clear()
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+class TestCourseDetailsMany:
+    def test_fetches_courses_concurrently(self, stub_server, timetable_json):
+        courses = ["MATH1051", "MATH1061", "CSSE1001", "INFS1200", "STAT1201"]
+
+        before = time.perf_counter()
+        timetables = course_interface.course_details_many(courses, OPTIONS)
+        elapsed = time.perf_counter() - before
+
+        assert list(timetables) == courses
+        assert all(timetable == timetable_json for timetable in timetables.values())
+        assert elapsed < 0.6  # One lookup takes 0.2s, five in a row would take 1s
+
+    def test_reuses_connections_between_lookups(self, stub_server):
+        for course in ["MATH1051", "MATH1061", "CSSE1001"]:
+            course_interface.course_details(course, OPTIONS)
+        assert len(stub_server["connections"]) == 1
+
+    def test_slow_course_times_out(self, stub_server, monkeypatch):
+        stub_server["delays"]["SLOW1234"] = 2
+        monkeypatch.setattr(course_interface, "UPSTREAM_TIMEOUT", 0.1)
+
+        with pytest.raises(requests.exceptions.RequestException):
+            course_interface.course_details_many(["MATH1051", "SLOW1234"], OPTIONS)
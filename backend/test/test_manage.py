@@ -0,0 +1,129 @@
+import argparse
+import json
+import time
+
+import assessments
+import course_interface
+import main
+import manage
+import pytest
+import requests
+from test_assessments import ECP_URL, FakeResponse, read_fixture
+
+
+@pytest.fixture
+def request_log(monkeypatch, tmp_path):
+    path = str(tmp_path / "requests.log")
+    monkeypatch.setattr(main, "REQUEST_LOG_PATH", path)
+    return path
+
+
+@pytest.fixture
+def upstream(monkeypatch, timetable_json):
+    """Serve MATH1051's timetable for any course, and the CSSE2002 course page and ECP for assessments."""
+    calls = []
+
+    def post(url, data=None, **kwargs):
+        calls.append(data["search-term"])
+        if data["search-term"] == "ABCD1234":
+            raise requests.exceptions.ConnectionError("upstream is down")
+        response = FakeResponse()
+        response.ok = True
+        response.json = lambda: timetable_json
+        return response
+
+    def get(url, headers=None, **kwargs):
+        calls.append(url)
+        if url == ECP_URL:
+            return FakeResponse(read_fixture("ecp.html"))
+        return FakeResponse(read_fixture("course-offering.html"))
+
+    monkeypatch.setattr(course_interface.session, "post", post)
+    monkeypatch.setattr(assessments.session, "get", get)
+    course_interface.course_cache.clear()
+    assessments.assessment_cache.clear()
+    return calls
+
+
+def warm_args(*courses, **options):
+    defaults = {
+        "courses": list(courses),
+        "semester": "S2",
+        "campus": "STLUC",
+        "top": 0,
+        "days": 14,
+        "log": None,
+        "interval": 0,
+        "skip_assessments": False,
+    }
+    return argparse.Namespace(**dict(defaults, **options))
+
+
+class TestRequestLog:
+    def test_logs_course_lookups(self, client, request_log, monkeypatch):
+        monkeypatch.setattr(assessments, "course_assessments", lambda *args: [])
+        client.get("/assessment/assessment/csse2002?semester=S2&location=STLUC")
+        client.get("/assessment/assessment/CSSE2002?semester=S3&location=STLUC")  # Rejected, so not logged
+
+        with open(request_log) as file:
+            entries = [json.loads(line) for line in file]
+        assert [(entry["courses"], entry["semester"], entry["location"]) for entry in entries] == [
+            (["CSSE2002"], "S2", "STLUC")
+        ]
+
+    def test_counts_the_most_looked_up_courses(self, request_log):
+        now = time.time()
+        lines = [
+            {"time": now, "courses": ["MATH1051", "CSSE2002"], "semester": "S2", "location": "STLUC"},
+            {"time": now, "courses": ["CSSE2002"], "semester": "S2", "location": "STLUC"},
+            {"time": now, "courses": ["STAT1201"] * 5, "semester": "S1", "location": "STLUC"},
+            {"time": now - 100, "courses": ["INFS1200"] * 5, "semester": "S2", "location": "STLUC"},
+        ]
+        with open(request_log, "w") as file:
+            file.writelines(json.dumps(line) + "\n" for line in lines)
+            file.write('{"time": ')  # Cut short
+
+        assert manage.popular_courses(request_log, "S2", "STLUC", 2, now - 10) == ["CSSE2002", "MATH1051"]
+        assert manage.popular_courses(request_log + ".missing", "S2", "STLUC", 2, 0) == []
+
+    def test_rotates_the_log_once_it_is_full(self, client, request_log, monkeypatch):
+        monkeypatch.setattr(assessments, "course_assessments", lambda *args: [])
+        monkeypatch.setattr(main, "REQUEST_LOG_MAX_BYTES", 300)
+        for course_code in ["CSSE2002"] * 4 + ["MATH1051"] * 3:
+            client.get(f"/assessment/assessment/{course_code}?semester=S2&location=STLUC")
+
+        # Each entry is about 130 bytes, so the log is rotated after every third, keeping only the last rotation
+        with open(request_log + ".1") as file:
+            assert len(file.readlines()) == 3
+        with open(request_log) as file:
+            assert len(file.readlines()) == 1
+        assert manage.popular_courses(request_log, "S2", "STLUC", 2, 0) == ["MATH1051", "CSSE2002"]
+
+
+class TestWarm:
+    def test_fills_the_caches(self, upstream, timetable_json, capsys):
+        manage.warm(warm_args("csse2002", "ABCD1234"))
+
+        report = capsys.readouterr().out
+        assert "CSSE2002: timetable" in report and "ABCD1234: upstream failed" in report
+        assert "Warmed 1 of 2 courses" in report
+
+        calls = len(upstream)
+        assert course_interface.course_details("CSSE2002", {"semester": "S2", "location": "STLUC"}) == timetable_json
+        assert assessments.course_assessments("CSSE2002", "S2", "STLUC")
+        assert len(upstream) == calls
+
+    def test_warms_the_top_courses_from_the_log(self, upstream, request_log, capsys):
+        with open(request_log, "w") as file:
+            file.write(json.dumps({"time": time.time(), "courses": ["MATH1051"], "semester": "S2", "location": "STLUC"}))
+
+        manage.warm(warm_args(top=5, log=request_log, skip_assessments=True))
+        assert upstream == ["MATH1051"]
+        assert "Warmed 1 of 1 courses" in capsys.readouterr().out
+
+    def test_skips_assessments_it_cannot_look_up(self, upstream, capsys):
+        manage.warm(warm_args("CSSE2002", semester="S3"))
+
+        report = capsys.readouterr().out
+        assert "Skipping assessments" in report and "Warmed 1 of 1 courses" in report
+        assert upstream == ["CSSE2002"]
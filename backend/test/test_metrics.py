@@ -0,0 +1,27 @@
+from metrics import Histogram, Metrics
+
+
+class TestHistogram:
+    def test_bucket_bounds_are_inclusive(self):
+        histogram = Histogram([1, 10])
+        for value in (0, 1, 5, 10, 11):
+            histogram.observe(value)
+
+        summary = histogram.as_dict()
+        assert summary["buckets"] == {"1": 2, "10": 2, "+inf": 1}
+        assert summary["count"] == 5 and summary["sum"] == 27
+        assert summary["max"] == 11
+
+    def test_empty_histogram_has_no_mean(self):
+        assert Histogram([1]).as_dict()["mean"] is None
+
+
+class TestMetrics:
+    def test_histograms_are_created_on_first_use(self):
+        metrics = Metrics()
+        metrics.observe("stage.solve", 0.003)
+        metrics.observe("search.nodes", 500, [10, 1000])
+
+        summary = metrics.as_dict()
+        assert list(summary) == ["search.nodes", "stage.solve"]
+        assert summary["search.nodes"]["buckets"] == {"10": 0, "1000": 1, "+inf": 0}
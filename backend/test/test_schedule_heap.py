@@ -0,0 +1,35 @@
+from models.ScheduleHeap import ScheduleHeap
+
+
+class TestScheduleHeap:
+    def test_keeps_the_best_entries(self):
+        heap = ScheduleHeap(2)
+        for score, schedule in [(3, (0,)), (5, (1,)), (1, (2,)), (4, (3,))]:
+            heap.newEntry(score, schedule)
+
+        assert heap.getBestEntries() == [(5, (1,)), (4, (3,))]
+        assert (heap.insertions, heap.evictions) == (3, 1)
+
+    def test_ties_go_to_the_earlier_entry(self):
+        heap = ScheduleHeap(2)
+        assert heap.newEntry(2, (0, 1))
+        assert heap.newEntry(2, (0, 2))
+        assert not heap.newEntry(2, (1, 0))
+        assert heap.newEntry(3, (1, 1))
+
+        assert heap.getBestEntries() == [(3, (1, 1)), (2, (0, 1))]
+
+    def test_only_the_best_entries_are_built(self):
+        heap = ScheduleHeap(2)
+        for score in range(10):
+            heap.newEntry(score, (score,))
+
+        built = []
+
+        def build(score, schedule):
+            built.append(schedule)
+            return {"score": score}
+
+        assert heap.getBestSchedules(build) == [{"score": 9}, {"score": 8}]
+        assert built == [(9,), (8,)]
+        assert heap.getBestSchedule(build) == {"score": 9}
@@ -0,0 +1,96 @@
+import time
+
+import course_interface
+import pytest
+import requests
+from snapshot import CatalogSnapshot, compact_course_timetable
+from timetable import parse_course_timetable
+
+OPTIONS = {"semester": "S2", "location": "STLUC"}
+
+
+@pytest.fixture
+def snapshot(monkeypatch, tmp_path):
+    snapshot = CatalogSnapshot(str(tmp_path / "snapshot.sqlite3"))
+    monkeypatch.setattr(course_interface, "catalog_snapshot", snapshot)
+    course_interface.course_cache.clear()
+    return snapshot
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Answer upstream lookups with the queued response, or fail when there is none."""
+    state = {"response": None, "calls": 0}
+
+    def post(url, data=None, **kwargs):
+        state["calls"] += 1
+        if state["response"] is None:
+            raise requests.exceptions.ConnectionError("upstream is down")
+        return state["response"]
+
+    monkeypatch.setattr(course_interface.session, "post", post)
+    return state
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+        self.ok = True
+
+    def json(self):
+        return self.body
+
+
+class TestCompactCourseTimetable:
+    def test_parses_the_same_as_the_full_response(self, timetable_json):
+        compact = compact_course_timetable(timetable_json)
+        assert parse_course_timetable(compact, "MATH1051") == parse_course_timetable(
+            timetable_json, "MATH1051"
+        )
+
+    def test_drops_unused_fields(self, timetable_json):
+        activities = compact_course_timetable(timetable_json)["MATH1051_S2_STLUC_IN"][
+            "activities"
+        ]
+        activity = activities["MATH1051_S2_STLUC_IN|APP1|01"]
+        assert "activitiesDays" not in activity and "location" not in activity
+
+
+class TestCatalogSnapshot:
+    def test_ingests_dump_by_course(self, snapshot, timetable_json):
+        assert snapshot.ingest(timetable_json) == [("MATH1051", "S2", "STLUC")]
+        assert snapshot.courses("S2", "STLUC") == ["MATH1051"]
+
+        stored, fetched_at = snapshot.get("math1051", "S2", "STLUC")
+        assert stored == compact_course_timetable(timetable_json)
+        assert fetched_at <= time.time()
+        assert snapshot.get("MATH1051", "S1", "STLUC") is None
+
+
+class TestCourseDetailsFromSnapshot:
+    def test_answers_without_upstream(self, snapshot, upstream, timetable_json):
+        snapshot.ingest(timetable_json)
+        assert course_interface.course_details(
+            "MATH1051", OPTIONS
+        ) == compact_course_timetable(timetable_json)
+        assert upstream["calls"] == 0
+
+    def test_refreshes_old_snapshot(self, snapshot, upstream, timetable_json):
+        snapshot.ingest(timetable_json, fetched_at=0)
+        upstream["response"] = FakeResponse(timetable_json)
+
+        assert course_interface.course_details("MATH1051", OPTIONS) == timetable_json
+        assert upstream["calls"] == 1
+        assert snapshot.get("MATH1051", "S2", "STLUC")[1] > 0
+
+    def test_serves_old_snapshot_when_upstream_is_down(
+        self, snapshot, upstream, timetable_json
+    ):
+        snapshot.ingest(timetable_json, fetched_at=0)
+        assert course_interface.course_details(
+            "MATH1051", OPTIONS
+        ) == compact_course_timetable(timetable_json)
+
+    def test_courses_outside_snapshot_still_fail(self, snapshot, upstream):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            course_interface.course_details("CSSE1001", OPTIONS)
@@ -0,0 +1,339 @@
+import base64
+import gzip
+import json
+
+import course_interface
+import pytest
+import timetable
+
+
+@pytest.fixture
+def upstream(monkeypatch, timetable_json):
+    """Serve every course lookup from the MATH1051 fixture."""
+    calls = []
+
+    def course_details(course_code, options):
+        calls.append((course_code, options["semester"], options["location"]))
+        return timetable_json
+
+    monkeypatch.setattr(course_interface, "course_details", course_details)
+    timetable.course_classes_memo.clear()
+    timetable.result_cache.clear()
+    return calls
+
+
+def recommend_body(**overrides):
+    body = {
+        "semester": "S2",
+        "location": "STLUC",
+        "courses": ["MATH1051"],
+        "timetablePreferences": {
+            "TUE-9:00": {"preference": "preferred", "rank": 1},
+            "TUE-10:00": {"preference": "unavailable", "rank": 5},
+            "TUE-10:30": {"preference": "unavailable", "rank": 5},
+        },
+        "attendLectures": True,
+    }
+    body.update(overrides)
+    return body
+
+
+class TestRecommendTimetable:
+    def test_returns_ranked_recommendations(self, client, upstream):
+        response = client.post("/timetable/recommend", json=recommend_body())
+        assert response.status_code == 200
+
+        recommendations = response.get_json()["recommendations"]
+        assert 0 < len(recommendations) <= 5
+        scores = [recommendation["score"] for recommendation in recommendations]
+        assert scores == sorted(scores, reverse=True)
+        assert len(recommendations[0]["grid"]) == 28
+        assert upstream == [("MATH1051", "S2", "STLUC")]
+
+    def test_repeat_requests_reuse_converted_classes(self, client, upstream):
+        first = client.post("/timetable/recommend", json=recommend_body())
+        second = client.post("/timetable/recommend", json=recommend_body())
+        assert first.get_json() == second.get_json()
+        assert upstream == [("MATH1051", "S2", "STLUC")]
+
+        client.post("/timetable/recommend", json=recommend_body(attendLectures=False))
+        assert len(upstream) == 2
+
+    def test_reports_search_progress(self, client, upstream):
+        body = client.post("/timetable/recommend", json=recommend_body()).get_json()
+        assert body["exhaustive"] is True
+        assert body["nodes"] > 0
+
+    def test_parallel_activities_are_listed_as_backups(self, client, upstream):
+        response = client.post("/timetable/recommend", json=recommend_body())
+        best = response.get_json()["recommendations"][0]
+        assert best["backups"]["MATH1051 LEC1"] in (["01_Delayed"], ["02_Delayed"])
+
+    def test_hard_constraints_keep_unavailable_slots_free(self, client, upstream):
+        response = client.post(
+            "/timetable/recommend", json=recommend_body(hardConstraints=True)
+        )
+        assert response.status_code == 200
+
+        for recommendation in response.get_json()["recommendations"]:
+            tuesday = [row[1] for row in recommendation["grid"]]
+            # The grid starts at 8:00, so 10:00 and 10:30 are rows 4 and 5
+            assert tuesday[4] == [] and tuesday[5] == []
+
+    def test_infeasible_hard_constraints_are_rejected(self, client, upstream):
+        preferences = {
+            f"{day}-{hour}:{minute}": {"preference": "unavailable", "rank": 5}
+            for day in ("MON", "TUE", "WED", "THU", "FRI")
+            for hour in range(8, 22)
+            for minute in ("00", "30")
+        }
+        response = client.post(
+            "/timetable/recommend",
+            json=recommend_body(timetablePreferences=preferences, hardConstraints=True),
+        )
+        assert response.status_code == 400
+        assert b"MATH1051" in response.data
+
+    def test_debug_block_reports_counters_and_stages(self, client, upstream):
+        body = client.post("/timetable/recommend", json=recommend_body(debug=True)).get_json()
+        debug = body["debug"]
+        assert debug["cached"] is False
+        assert set(debug["stages"]) == {"fetch", "parse", "convert", "solve", "grid"}
+        assert debug["search"]["nodes"] == body["nodes"]
+        assert debug["search"]["bound_prunes"] is not None
+
+        assert "debug" not in client.post("/timetable/recommend", json=recommend_body()).get_json()
+
+    def test_metrics_aggregate_recent_requests(self, client, upstream):
+        timetable.recommend_metrics.clear()
+        client.post("/timetable/recommend", json=recommend_body())
+        client.post("/timetable/recommend", json=recommend_body())
+
+        metrics = client.get("/timetable/metrics").get_json()
+        assert metrics["stage.fetch"]["count"] == 2
+        # The second request is answered from the result cache without searching
+        assert metrics["search.nodes"]["count"] == 1
+
+    def test_packed_grid_shares_results_with_keyed_preferences(self, client, upstream):
+        keyed = client.post("/timetable/recommend", json=recommend_body(hardConstraints=True))
+
+        codes = bytearray(240)
+        codes[48 + 18] = 1  # TUE-9:00 preferred
+        codes[48 + 20] = codes[48 + 21] = 5  # TUE-10:00 and TUE-10:30 unavailable
+        body = recommend_body(hardConstraints=True, timetableGrid=base64.b64encode(codes).decode())
+        del body["timetablePreferences"]
+        packed = client.post("/timetable/recommend", json=body)
+
+        assert packed.get_json() == keyed.get_json()
+        assert client.get("/timetable/cache/stats").get_json()["hits"] == 1
+
+    def test_malformed_packed_grid_is_rejected_before_fetching(self, client, upstream):
+        response = client.post("/timetable/recommend", json=recommend_body(timetableGrid="AAAA"))
+        assert response.status_code == 400
+        assert upstream == []
+
+    def test_zero_time_limit_takes_effect(self, client, upstream):
+        response = client.post("/timetable/recommend", json=recommend_body(timeLimit=0))
+        assert response.status_code == 400
+        assert b"search budget" in response.data
+
+        body = recommend_body(profiles=[{"timetablePreferences": {}}], timeLimit=0)
+        profiles = client.post("/timetable/recommend/batch", json=body).get_json()["profiles"]
+        assert "search budget" in profiles[0]["error"]
+
+    @pytest.mark.parametrize(
+        "limits", [{"nodeLimit": "abc"}, {"timeLimit": "5"}, {"nodeLimit": -1}, {"timeLimit": True}]
+    )
+    def test_malformed_search_limits_are_rejected(self, client, upstream, limits):
+        response = client.post("/timetable/recommend", json=recommend_body(**limits))
+        assert response.status_code == 400
+        assert upstream == []
+
+        body = recommend_body(profiles=[{"timetablePreferences": {}}], **limits)
+        assert client.post("/timetable/recommend/batch", json=body).status_code == 400
+
+
+class TestRecommendTimetableBatch:
+    def test_profiles_match_single_recommendations(self, client, upstream):
+        profiles = [
+            {"timetablePreferences": recommend_body()["timetablePreferences"]},
+            {"timetablePreferences": {"MON-9:00": {"preference": "preferred", "rank": 1}}},
+            {"timetableGrid": base64.b64encode(bytes([1] * 240)).decode()},
+        ]
+        body = recommend_body(profiles=profiles)
+        del body["timetablePreferences"]
+        batch = client.post("/timetable/recommend/batch", json=body).get_json()["profiles"]
+        assert upstream == [("MATH1051", "S2", "STLUC")]
+
+        timetable.result_cache.clear()
+        for profile, response in zip(profiles, batch):
+            single = client.post("/timetable/recommend", json=recommend_body(**profile))
+            assert response == single.get_json()
+
+    def test_failing_profiles_report_errors(self, client, upstream):
+        unavailable = {
+            f"{day}-{hour}:{minute}": {"preference": "unavailable", "rank": 5}
+            for day in ("MON", "TUE", "WED", "THU", "FRI")
+            for hour in range(8, 22)
+            for minute in ("00", "30")
+        }
+        profiles = [{"timetablePreferences": unavailable}, {"timetablePreferences": {}}]
+        body = recommend_body(profiles=profiles, hardConstraints=True)
+        batch = client.post("/timetable/recommend/batch", json=body).get_json()["profiles"]
+        assert "MATH1051" in batch[0]["error"]
+        assert batch[1]["recommendations"]
+
+    def test_profile_count_is_limited(self, client, upstream):
+        response = client.post("/timetable/recommend/batch", json=recommend_body(profiles=[]))
+        assert response.status_code == 400
+
+    def test_profiles_that_are_not_objects_are_rejected(self, client, upstream):
+        response = client.post("/timetable/recommend/batch", json=recommend_body(profiles=["x"]))
+        assert response.status_code == 400
+        assert upstream == []
+
+    def test_profiles_without_preferences_are_rejected(self, client, upstream):
+        profiles = [{"timetablePreferences": {}}, {}]
+        response = client.post("/timetable/recommend/batch", json=recommend_body(profiles=profiles))
+        assert response.status_code == 400
+        assert b"Profile 1" in response.data
+        assert upstream == []
+
+    @pytest.mark.parametrize("courses", [None, "MATH1051", [], [1051]])
+    def test_malformed_courses_are_rejected(self, client, upstream, courses):
+        body = recommend_body(profiles=[{"timetablePreferences": {}}], courses=courses)
+        assert client.post("/timetable/recommend/batch", json=body).status_code == 400
+        assert client.post("/timetable/recommend", json=recommend_body(courses=courses)).status_code == 400
+        assert upstream == []
+
+
+class TestCompactFormat:
+    def test_assignments_match_the_grid(self, client, upstream):
+        grid_body = client.post("/timetable/recommend", json=recommend_body()).get_json()
+        compact_body = client.post(
+            "/timetable/recommend", json=recommend_body(format="compact")
+        ).get_json()
+        assert compact_body["format"] == "compact"
+        strings = compact_body["strings"]
+
+        for grid_recommendation, recommendation in zip(
+            grid_body["recommendations"], compact_body["recommendations"]
+        ):
+            assert recommendation["score"] == grid_recommendation["score"]
+            labels = set()
+            for course, subclass, activity, day, start, duration, backups in recommendation["assignments"]:
+                label = f"{strings[course]} {strings[subclass]} {strings[activity]}"
+                labels.add(label)
+                # The grid starts at 8:00, which is half-hour slot 16
+                for row in range(start - 16, start - 16 + duration):
+                    assert grid_recommendation["grid"][row][day][0]["course_code"] == label
+                assert [strings[backup] for backup in backups] == grid_recommendation["backups"].get(
+                    f"{strings[course]} {strings[subclass]}", []
+                )
+
+            grid_labels = {
+                cell[0]["course_code"] for row in grid_recommendation["grid"] for cell in row if cell
+            }
+            assert labels == grid_labels
+
+    def test_large_responses_are_gzipped(self, client, upstream):
+        response = client.post(
+            "/timetable/recommend",
+            json=recommend_body(),
+            headers={"Accept-Encoding": "gzip, deflate"},
+        )
+        assert response.headers["Content-Encoding"] == "gzip"
+        recommendations = json.loads(gzip.decompress(response.data))["recommendations"]
+        assert len(recommendations[0]["grid"]) == 28
+
+        uncompressed = client.post("/timetable/recommend", json=recommend_body())
+        assert "Content-Encoding" not in uncompressed.headers
+
+
+def stream_events(client, body):
+    response = client.post("/timetable/recommend/stream", json=body)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    return [json.loads(line) for line in response.data.splitlines()]
+
+
+class TestRecommendTimetableStream:
+    def test_streams_improvements_then_the_final_ranking(self, client, upstream):
+        events = stream_events(client, recommend_body())
+        improvements, complete = events[:-1], events[-1]
+
+        assert improvements and all(event["event"] == "improvement" for event in improvements)
+        assert complete["event"] == "complete"
+        best = complete["recommendations"][0]
+        assert max(event["recommendation"]["score"] for event in improvements) == best["score"]
+        assert best["grid"] in [event["recommendation"]["grid"] for event in improvements]
+
+        timetable.result_cache.clear()
+        expected = client.post("/timetable/recommend", json=recommend_body()).get_json()
+        assert complete["recommendations"] == expected["recommendations"]
+
+    def test_cached_results_complete_at_once(self, client, upstream):
+        client.post("/timetable/recommend", json=recommend_body())
+        events = stream_events(client, recommend_body())
+        assert [event["event"] for event in events] == ["complete"]
+
+    def test_infeasible_requests_end_with_an_error(self, client, upstream):
+        preferences = {
+            f"{day}-{hour}:{minute}": {"preference": "unavailable", "rank": 5}
+            for day in ("MON", "TUE", "WED", "THU", "FRI")
+            for hour in range(8, 22)
+            for minute in ("00", "30")
+        }
+        events = stream_events(
+            client, recommend_body(timetablePreferences=preferences, hardConstraints=True)
+        )
+        assert events[-1]["event"] == "error"
+        assert "MATH1051" in events[-1]["message"]
+
+
+class TestResultCache:
+    def test_identical_requests_skip_the_search(self, client, upstream, monkeypatch):
+        first = client.post("/timetable/recommend", json=recommend_body())
+
+        def solve_timetable(*args, **kwargs):
+            raise AssertionError("the cached result should have been used")
+
+        monkeypatch.setattr(timetable, "solve_timetable", solve_timetable)
+        body = recommend_body(courses=["math1051", "MATH1051"], timeLimit=1)
+        second = client.post("/timetable/recommend", json=body)
+        assert second.get_json() == first.get_json()
+
+        stats = client.get("/timetable/cache/stats").get_json()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["time_saved"] > 0
+
+    def test_preference_changes_are_solved_again(self, client, upstream):
+        client.post("/timetable/recommend", json=recommend_body())
+        client.post(
+            "/timetable/recommend",
+            json=recommend_body(
+                timetablePreferences={"MON-9:00": {"preference": "preferred", "rank": 1}}
+            ),
+        )
+        assert client.get("/timetable/cache/stats").get_json()["hits"] == 0
+
+    def test_course_data_changes_invalidate_results(self, client, upstream, timetable_json):
+        client.post("/timetable/recommend", json=recommend_body())
+
+        activities = next(iter(timetable_json.values()))["activities"]
+        activities.pop(next(iter(activities)))
+        timetable.course_classes_memo.clear()
+        client.post("/timetable/recommend", json=recommend_body())
+        assert client.get("/timetable/cache/stats").get_json()["hits"] == 0
+
+    def test_interrupted_searches_are_not_cached(self, client, upstream, monkeypatch):
+        solve_timetable = timetable.solve_timetable
+
+        def interrupted_solve_timetable(*args, stats, **kwargs):
+            best_timetables = solve_timetable(*args, stats=stats, **kwargs)
+            stats.exhaustive = False
+            return best_timetables
+
+        monkeypatch.setattr(timetable, "solve_timetable", interrupted_solve_timetable)
+        client.post("/timetable/recommend", json=recommend_body())
+        assert client.get("/timetable/cache/stats").get_json()["entries"] == 0
@@ -86,12 +86,28 @@ export default function AssessmentCalendar() {
         semester
       }
 
-      setCourses([...courses, newCourse])
-      
-      const assessmentResponse = await fetch(`https://uqcoursecraft.onrender.com/assessment/${courseCode}?semester=${semester}&location=${location}`)
+      const updatedCourses = [...courses, newCourse]
+      setCourses(updatedCourses)
+
+      // Every course is looked up in one request, which takes about as long as the slowest course. The others are
+      // usually cached, and the ids it returns are unique across courses
+      const assessmentResponse = await fetch("https://uqcoursecraft.onrender.com/assessment/batch", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ semester, location, courses: updatedCourses.map(course => course.code) })
+      })
       if (assessmentResponse.ok) {
-        const newAssessments = await assessmentResponse.json()
-        setAssessments(prev => [...prev, ...newAssessments])
+        const result: { assessments: Assessment[], errors: Record<string, { error: string, status: number }> } =
+          await assessmentResponse.json()
+        setAssessments(result.assessments)
+        const failedCourses = Object.keys(result.errors)
+        if (failedCourses.length > 0) {
+          console.error("Could not fetch assessments for", failedCourses)
+          setAlertTitle("Assessments Not Found")
+          setAlertDescription(`Could not retrieve assessments for ${failedCourses.join(", ")}.`)
+          setShowAlert(true)
+          setTimeout(() => setShowAlert(false), 3000)
+        }
       } else {
         console.error("Could not fetch assessments for", courseCode)
         setAlertTitle("Assessments Not Found")